@@ -1,7 +1,7 @@
 # api.py
 import sys
 from flask_cors import CORS
-from flask import Flask
+from flask import Flask, g, request
 from routes.transcribe_route import transcribe_bp
 from routes.auth_routes import auth_bp
 from routes.spendings_route import spending_bp
@@ -10,10 +10,23 @@ from routes.execute_route import execute_bp
 from routes.projects_route import projects_bp
 from routes.fixed_bills_route import fixed_bills_bp  # Nova importação
 from routes.summary_route import summary_bp  # Nova importação 
+from routes.metrics_route import metrics_bp
+from services.metrics import (
+    start_request_timing,
+    finish_request_timing,
+    server_timing_header,
+)
 from db.mongo import client 
+from utils.load_file import prompt_registry
+from utils.audio_upload import AudioUploadRequest
 
 app = Flask(__name__) 
+# Arquivos do multipart em memória até AUDIO_SPOOL_MAX_MEMORY_BYTES
+app.request_class = AudioUploadRequest
 CORS(app) 
+
+# Carrega os prompts em memória uma única vez
+prompt_registry.preload("prompts")
  
 try:
     client.admin.command("ping") 
@@ -30,6 +43,33 @@ app.register_blueprint(config_bp)
 app.register_blueprint(projects_bp) 
 app.register_blueprint(fixed_bills_bp) 
 app.register_blueprint(summary_bp)
+app.register_blueprint(metrics_bp)
+
+
+@app.before_request
+def start_metrics():
+    g.request_started = start_request_timing()
+
+
+@app.after_request
+def add_server_timing(response):
+    # Tempo de cada etapa da requisição (intent, mongo, analyser...) no header
+    started = g.get("request_started")
+    if started is None:
+        return response
+
+    endpoint = request.endpoint or "unknown"
+    if response.is_streamed:
+        # Etapas do stream (analyser, chart) terminam depois deste hook: o
+        # header só leva as etapas até aqui e o total é registrado no fim
+        header = server_timing_header()
+        response.call_on_close(lambda: finish_request_timing(started, endpoint))
+    else:
+        header = finish_request_timing(started, endpoint)
+    if header:
+        response.headers["Server-Timing"] = header
+    return response
+
 
 if __name__ == "__main__": 
     app.run(debug=True, host="0.0.0.0", port=6002) 
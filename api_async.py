@@ -0,0 +1,72 @@
+# api_async.py
+# Servidor ASGI (Quart) com as rotas pesadas em LLM: /execute-query e /transcribe.
+# Roda ao lado do api.py; as demais rotas continuam apenas no servidor Flask.
+#
+#   hypercorn api_async:app --bind 0.0.0.0:6003
+import sys
+from quart import Quart, Response, g, jsonify, request
+from routes.async_routes import async_bp
+from db.mongo_async import async_client
+from services.openai_client import close_async_openai_client
+from services.metrics import (
+    metrics,
+    metrics_authorized,
+    start_request_timing,
+    finish_request_timing,
+)
+from utils.load_file import prompt_registry
+from utils.audio_upload import AUDIO_MAX_UPLOAD_BYTES
+from utils.async_audio_upload import AsyncAudioUploadRequest
+
+app = Quart(__name__)
+# Este servidor só recebe áudio e JSON pequeno: o limite vale para tudo
+app.config["MAX_CONTENT_LENGTH"] = AUDIO_MAX_UPLOAD_BYTES
+app.request_class = AsyncAudioUploadRequest
+
+# Carrega os prompts em memória uma única vez
+prompt_registry.preload("prompts")
+
+app.register_blueprint(async_bp)
+
+
+@app.before_request
+async def start_metrics():
+    g.request_started = start_request_timing()
+
+
+@app.after_request
+async def add_server_timing(response):
+    started = g.get("request_started")
+    if started is not None:
+        header = finish_request_timing(started, request.endpoint or "unknown")
+        if header:
+            response.headers["Server-Timing"] = header
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+async def get_metrics():
+    # Métricas deste processo; o api.py expõe as do servidor Flask
+    if not metrics_authorized(request.headers.get("Authorization")):
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.before_serving
+async def check_mongo():
+    try:
+        await async_client.admin.command("ping")
+        print("✅ Conexão com o MongoDB estabelecida com sucesso.")
+    except Exception as e:
+        print("❌ Erro ao conectar ao MongoDB:", e)
+        sys.exit(1)
+
+
+@app.after_serving
+async def close_clients():
+    await close_async_openai_client()
+    await async_client.close()
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=6003)
@@ -0,0 +1,130 @@
+"""
+Compara a vazão do /execute-query síncrono (Flask, threads fixas) com o
+assíncrono (Quart/hypercorn) contra o servidor falso da OpenAI.
+
+    python -m bench.bench_async --requests 400 --concurrency 200 --latency-ms 800
+
+Cache de intenções e parser local são desligados para que toda requisição
+chegue ao "modelo". As frases são saudações, então o MongoDB não é usado.
+Gerador de carga, servidor falso e API rodam na mesma máquina: com poucos
+núcleos, o resultado do modo assíncrono fica limitado pela CPU.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import httpx
+from bench.harness import latency_summary, start_module, stop, wait_ready
+
+FAKE_PORT = 8100
+SYNC_PORT = 8200
+ASYNC_PORT = 8201
+
+
+def _server_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("MONGO", "mongodb://localhost:27017")
+    env.setdefault("API_KEY_OPENAI", "sk-bench")
+    env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{FAKE_PORT}/v1"
+    env["OPENAI_MAX_RETRIES"] = "0"
+    env["INTENT_CACHE_MAX_ENTRIES"] = "0"
+    env["FAST_PARSER_ENABLED"] = "False"
+    return env
+
+
+async def _run_load(url: str, token: str, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+
+        async def one(n: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        url,
+                        json={"transcribedText": f"bom dia #{n}", "context": []},
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return latency_summary(latencies, errors, elapsed)
+
+
+async def _bench_mode(mode: str, port: int, server_args, args, token: str) -> dict:
+    process = start_module(
+        ["bench.servers", mode, "--port", str(port), *server_args], _server_env()
+    )
+    try:
+        await wait_ready(f"http://127.0.0.1:{port}/")
+        url = f"http://127.0.0.1:{port}/execute-query"
+        # Aquecimento: abre conexões e carrega os prompts
+        await _run_load(url, token, min(20, args.requests), min(20, args.concurrency))
+        return await _run_load(url, token, args.requests, args.concurrency)
+    finally:
+        stop(process)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=int, default=800)
+    parser.add_argument("--jitter-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    from services.token_service import TokenService
+
+    token = TokenService.generate_token({"user": {"id": "bench-user"}})
+
+    fake = start_module(
+        [
+            "bench.fake_openai_server",
+            "--port",
+            str(FAKE_PORT),
+            "--latency-ms",
+            str(args.latency_ms),
+            "--jitter-ms",
+            str(args.jitter_ms),
+        ],
+        _server_env(),
+    )
+    try:
+        await wait_ready(f"http://127.0.0.1:{FAKE_PORT}/")
+        results = {
+            f"sync ({args.threads} threads)": await _bench_mode(
+                "sync", SYNC_PORT, ["--threads", str(args.threads)], args, token
+            ),
+            "async": await _bench_mode("async", ASYNC_PORT, [], args, token),
+        }
+    finally:
+        stop(fake)
+
+    print(
+        f"\n{args.requests} requisições, concorrência {args.concurrency}, "
+        f"latência do modelo {args.latency_ms}±{args.jitter_ms} ms\n"
+    )
+    for mode, result in results.items():
+        print(
+            f"{mode:<20} {result['throughput_rps']:>7} req/s  "
+            f"p50 {result['p50_ms']:>6} ms  p99 {result['p99_ms']:>6} ms  "
+            f"erros {result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,271 @@
+"""
+Servidor falso compatível com a API da OpenAI, usado nos benchmarks.
+
+Responde /v1/chat/completions (com e sem stream) e /v1/audio/transcriptions
+depois de uma latência configurável, simulando o tempo de resposta do modelo.
+
+    python -m bench.fake_openai_server --port 8100 --latency-ms 800 --jitter-ms 200
+
+Com --recordings, devolve as respostas gravadas (veja bench/recordings.py);
+frases sem gravação recebem as respostas fixas abaixo. Com
+--latency-mode recorded, cada resposta espera o tempo que levou na gravação
+(multiplicado por --latency-scale).
+
+Para gravar, aponte o servidor para a OpenAI de verdade; as respostas são
+repassadas à API e acrescentadas ao arquivo:
+
+    python -m bench.fake_openai_server --recordings bench/recordings/sample.jsonl \\
+        --upstream https://api.openai.com/v1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+import httpx
+from quart import Quart, Response, request, jsonify
+from bench.recordings import RecordingStore, audio_key, classify_chat
+
+app = Quart(__name__)
+app.config["LATENCY_MS"] = 800
+app.config["JITTER_MS"] = 200
+app.config["LATENCY_MODE"] = "fixed"
+app.config["LATENCY_SCALE"] = 1.0
+app.config["UPSTREAM"] = None
+app.config["RECORDINGS"] = RecordingStore()
+
+GREETING_INTENT = {
+    "gpt_answer": "Bom dia! Como posso ajudar com suas finanças hoje?",
+    "prompt": "",
+    "greeting": True,
+    "consult": False,
+}
+ANALYSER_ANSWER = {"gpt_answer": "Você gastou R$ 150,00 este mês.", "chart_data": False}
+CHART_ANSWER = {"chartType": "pie", "data": [{"value": 150.0, "label": "Alimentação"}]}
+TRANSCRIPTION_TEXT = "bom dia"
+
+
+async def _simulate_latency(recording: dict = None):
+    if (
+        recording is not None
+        and app.config["LATENCY_MODE"] == "recorded"
+        and recording.get("latency_ms") is not None
+    ):
+        await asyncio.sleep(
+            recording["latency_ms"] * app.config["LATENCY_SCALE"] / 1000
+        )
+        return
+
+    latency = app.config["LATENCY_MS"]
+    jitter = app.config["JITTER_MS"]
+    delay = max(0, latency + random.uniform(-jitter, jitter)) / 1000
+    await asyncio.sleep(delay)
+
+
+def _answer_for(body: dict) -> str:
+    messages = body.get("messages", [])
+    if body.get("model") == "o4-mini":
+        return json.dumps(ANALYSER_ANSWER, ensure_ascii=False)
+
+    # A chamada de intenção termina com a mensagem do usuário
+    if messages and messages[-1].get("role") == "user":
+        intent = dict(GREETING_INTENT, prompt=messages[-1].get("content", ""))
+        return json.dumps(intent, ensure_ascii=False)
+    return json.dumps(CHART_ANSWER)
+
+
+def _usage(content: str, recorded: dict = None) -> dict:
+    if recorded:
+        return recorded
+    return {
+        "prompt_tokens": 100,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": 100 + len(content) // 4,
+    }
+
+
+def _completion(body: dict, content: str, usage: dict = None) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": _usage(content, usage),
+    }
+
+
+def _stream_chunks(body: dict, content: str, usage: dict = None, size: int = 8):
+    base = {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+    }
+    for i in range(0, len(content), size):
+        delta = {"content": content[i : i + size]}
+        chunk = dict(base, choices=[{"index": 0, "delta": delta}])
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    done = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+    yield f"data: {json.dumps(done)}\n\n"
+    if (body.get("stream_options") or {}).get("include_usage"):
+        last = dict(base, choices=[], usage=_usage(content, usage))
+        yield f"data: {json.dumps(last)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def _upstream_headers() -> dict:
+    return {"Authorization": request.headers.get("Authorization", "")}
+
+
+async def _record_chat(body: dict, stage: str, key: str) -> dict:
+    """Repassa a chamada para a OpenAI (sem stream) e grava a resposta"""
+    upstream_body = {
+        k: v for k, v in body.items() if k not in ("stream", "stream_options")
+    }
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=120) as client:
+        response = await client.post(
+            f"{app.config['UPSTREAM']}/chat/completions",
+            json=upstream_body,
+            headers=_upstream_headers(),
+        )
+    response.raise_for_status()
+    data = response.json()
+    entry = {
+        "stage": stage,
+        "key": key,
+        "model": body.get("model"),
+        "content": data["choices"][0]["message"]["content"],
+        "usage": data.get("usage"),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    app.config["RECORDINGS"].record(entry)
+    return entry
+
+
+async def _record_transcription(files, form, data: bytes, key: str) -> dict:
+    upload = files["file"]
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=120) as client:
+        response = await client.post(
+            f"{app.config['UPSTREAM']}/audio/transcriptions",
+            data=dict(form),
+            files={"file": (upload.filename, data, upload.content_type)},
+            headers=_upstream_headers(),
+        )
+    response.raise_for_status()
+    payload = response.json()
+    entry = {
+        "stage": "transcription",
+        "key": key,
+        "text": payload.get("text", ""),
+        "usage": payload.get("usage"),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    app.config["RECORDINGS"].record(entry)
+    return entry
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+async def chat_completions():
+    body = await request.get_json()
+    stage, key = classify_chat(body)
+
+    if app.config["UPSTREAM"]:
+        recording = await _record_chat(body, stage, key)
+    else:
+        recording = app.config["RECORDINGS"].lookup(stage, key)
+        await _simulate_latency(recording)
+
+    if recording is not None:
+        content, usage = recording["content"], recording.get("usage")
+    else:
+        content, usage = _answer_for(body), None
+
+    if body.get("stream"):
+
+        async def generate():
+            for chunk in _stream_chunks(body, content, usage):
+                yield chunk
+                await asyncio.sleep(0.005)
+
+        return Response(generate(), mimetype="text/event-stream")
+
+    return jsonify(_completion(body, content, usage))
+
+
+@app.route("/v1/audio/transcriptions", methods=["POST"])
+async def transcriptions():
+    files = await request.files
+    form = await request.form
+    data = files["file"].read() if "file" in files else b""
+    key = audio_key(data)
+
+    if app.config["UPSTREAM"]:
+        recording = await _record_transcription(files, form, data, key)
+    else:
+        recording = app.config["RECORDINGS"].lookup("transcription", key)
+        await _simulate_latency(recording)
+
+    if recording is None:
+        return jsonify({"text": TRANSCRIPTION_TEXT})
+    answer = {"text": recording["text"]}
+    if recording.get("usage"):
+        answer["usage"] = recording["usage"]
+    return jsonify(answer)
+
+
+@app.route("/_stats", methods=["GET"])
+async def stats():
+    """Quantas chamadas encontraram gravação (hits) e quantas não (misses)"""
+    return jsonify(app.config["RECORDINGS"].stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=int, default=800)
+    parser.add_argument("--jitter-ms", type=int, default=200)
+    parser.add_argument(
+        "--latency-mode", choices=["fixed", "recorded"], default="fixed"
+    )
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--recordings", help="arquivo JSONL com respostas gravadas")
+    parser.add_argument(
+        "--upstream", help="URL da API real; grava as respostas em --recordings"
+    )
+    args = parser.parse_args()
+
+    if args.upstream and not args.recordings:
+        parser.error("--upstream precisa de --recordings para gravar as respostas")
+
+    app.config["LATENCY_MS"] = args.latency_ms
+    app.config["JITTER_MS"] = args.jitter_ms
+    app.config["LATENCY_MODE"] = args.latency_mode
+    app.config["LATENCY_SCALE"] = args.latency_scale
+    app.config["UPSTREAM"] = (args.upstream or "").rstrip("/") or None
+    app.config["RECORDINGS"] = RecordingStore(args.recordings)
+
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"{args.host}:{args.port}"]
+    config.accesslog = None
+    asyncio.run(serve(app, config))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Funções comuns dos benchmarks: subprocessos dos servidores, espera até o
+servidor responder e estatísticas de latência.
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Resumo de uma rodada: latências em segundos, duração total em segundos"""
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000),
+        "p99_ms": round(percentile(latencies, 99) * 1000),
+    }
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Lê o header Server-Timing ("intent;dur=812.3, total;dur=830.1")"""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name or not params.startswith("dur="):
+            continue
+        try:
+            stages[name] = float(params[4:])
+        except ValueError:
+            continue
+    return stages
+
+
+def start_module(args, env, log=None) -> subprocess.Popen:
+    """Roda "python -m <args>" com o ambiente informado"""
+    return subprocess.Popen(
+        [sys.executable, "-m", *args],
+        env=env,
+        stdout=log or subprocess.DEVNULL,
+        stderr=log or subprocess.DEVNULL,
+    )
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    process.wait()
+
+
+async def wait_ready(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {url}")
@@ -0,0 +1,124 @@
+"""
+Respostas gravadas da OpenAI para o servidor falso.
+
+Cada linha do arquivo JSONL é uma resposta:
+
+    {"stage": "intent", "key": "quanto gastei em maio", "model": "gpt-4o-mini",
+     "content": "{...}", "usage": {...}, "latency_ms": 812.4}
+    {"stage": "transcription", "key": "<sha256 do áudio>", "text": "...",
+     "latency_ms": 1430.0}
+
+A chave é o texto do usuário normalizado (chat) ou o hash do arquivo de
+áudio (transcrição), para que a mesma frase encontre a resposta gravada
+mesmo com outra data ou outro contexto no prompt.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Prefixo usado pelo gpt_analyser e pelo gpt_chart para repetir a pergunta
+_REQUEST_PREFIX = "A solicitação do usuário é: "
+
+
+def normalize_key(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def audio_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        # Formato com partes ({"type": "text", "text": ...})
+        return " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return content if isinstance(content, str) else ""
+
+
+def classify_chat(body: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Identifica a etapa (intent, analyser, chart ou chat) e a chave de uma
+    chamada de chat completions, pelo formato das mensagens de cada serviço.
+    """
+    messages = body.get("messages") or []
+    request_text = None
+    for message in messages:
+        text = _message_text(message)
+        if text.startswith(_REQUEST_PREFIX):
+            request_text = text[len(_REQUEST_PREFIX) :]
+            break
+
+    if body.get("model") == "o4-mini":
+        stage = "analyser"
+    elif request_text is not None:
+        stage = "chart"
+    elif messages and messages[-1].get("role") == "user":
+        stage = "intent"
+        request_text = _message_text(messages[-1])
+    else:
+        stage = "chat"
+
+    if request_text is None:
+        # Outras chamadas: chave pelo conteúdo completo das mensagens
+        raw = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+        return stage, hashlib.sha256(raw.encode()).hexdigest()
+    return stage, normalize_key(request_text)
+
+
+class RecordingStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        # Próxima gravação de cada chave (gravações repetidas são alternadas)
+        self._cursor: Dict[Tuple[str, str], int] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def load(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: JSON inválido ({e})")
+                self._add(entry)
+
+    def _add(self, entry: Dict[str, Any]):
+        stage = entry["stage"]
+        key = entry["key"] if stage == "transcription" else normalize_key(entry["key"])
+        self._entries.setdefault((stage, key), []).append(entry)
+
+    def lookup(self, stage: str, key: str) -> Optional[Dict[str, Any]]:
+        entries = self._entries.get((stage, key))
+        if not entries:
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            return None
+        cursor = self._cursor.get((stage, key), 0)
+        self._cursor[(stage, key)] = cursor + 1
+        self.hits[stage] = self.hits.get(stage, 0) + 1
+        return entries[cursor % len(entries)]
+
+    def record(self, entry: Dict[str, Any]):
+        """Guarda uma resposta nova e a acrescenta ao arquivo de gravações"""
+        self._add(entry)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def stats(self) -> dict:
+        return {
+            "recordings": len(self),
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+        }
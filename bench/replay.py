@@ -0,0 +1,306 @@
+"""
+Reproduz um trace de requisições gravadas contra a API (Flask ou Quart),
+com a OpenAI substituída pelo servidor falso tocando as respostas gravadas.
+
+    python -m bench.replay --trace bench/traces/sample.jsonl \\
+        --recordings bench/recordings/sample.jsonl --repeat 20 --concurrency 16
+
+Cada linha do trace é uma requisição:
+
+    {"endpoint": "/execute-query", "transcribedText": "...", "context": []}
+    {"endpoint": "/execute-query/stream", "transcribedText": "...", "offset_ms": 350}
+    {"endpoint": "/transcribe", "audio": "audio/bom_dia.m4a"}
+
+Por padrão as requisições são enviadas em malha fechada (--concurrency
+simultâneas). Com --pace, cada uma sai no instante offset_ms do trace
+(dividido por --speed), reproduzindo a chegada original.
+
+Consultas e registros acessam o MongoDB de MONGO (padrão
+mongodb://localhost:27017, banco VoiceTask): use uma instância descartável,
+pois os registros do trace são gravados. O /transcribe precisa do ffmpeg
+para formatos que a API não aceita (caf, mov) e o /execute-query/stream só
+existe no modo sync.
+Com --latency-mode recorded, o modelo responde no tempo da gravação.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List
+import httpx
+from bench.harness import (
+    latency_summary,
+    parse_server_timing,
+    percentile,
+    start_module,
+    stop,
+    wait_ready,
+)
+
+FAKE_PORT = 8110
+APP_PORT = 8210
+TRACE_ENDPOINTS = ("/execute-query", "/execute-query/stream", "/transcribe")
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    base_dir = os.path.dirname(os.path.abspath(path))
+    trace = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line)
+            endpoint = entry.setdefault("endpoint", "/execute-query")
+            if endpoint not in TRACE_ENDPOINTS:
+                raise ValueError(f"{path}:{number}: endpoint desconhecido {endpoint}")
+            if endpoint == "/transcribe":
+                audio_path = os.path.join(base_dir, entry["audio"])
+                with open(audio_path, "rb") as audio:
+                    entry["_audio"] = (os.path.basename(audio_path), audio.read())
+            entry["offset_ms"] = float(entry.get("offset_ms", 0))
+            trace.append(entry)
+    if not trace:
+        raise ValueError(f"{path}: trace vazio")
+    return trace
+
+
+def expand_trace(trace: List[Dict[str, Any]], repeat: int) -> List[Dict[str, Any]]:
+    """Repete o trace; cada repetição começa depois do fim da anterior"""
+    span = max(entry["offset_ms"] for entry in trace) + 1000
+    return [
+        dict(entry, offset_ms=entry["offset_ms"] + n * span)
+        for n in range(repeat)
+        for entry in trace
+    ]
+
+
+def _server_env(args) -> dict:
+    env = dict(os.environ)
+    env.setdefault("MONGO", "mongodb://localhost:27017")
+    env.setdefault("API_KEY_OPENAI", "sk-bench")
+    env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{FAKE_PORT}/v1"
+    env["OPENAI_MAX_RETRIES"] = "0"
+    if args.no_shortcuts:
+        # Toda frase chega ao "modelo", como no bench_async
+        env["INTENT_CACHE_MAX_ENTRIES"] = "0"
+        env["FAST_PARSER_ENABLED"] = "False"
+        env["LOCAL_ANSWER_ENABLED"] = "False"
+        env["CHART_BUILDER_ENABLED"] = "False"
+    return env
+
+
+async def _send(client: httpx.AsyncClient, url: str, entry: Dict[str, Any], token):
+    """Envia uma requisição do trace. Retorna (ok, etapas do Server-Timing)"""
+    headers = {"Authorization": f"Bearer {token}"}
+    endpoint = entry["endpoint"]
+
+    if endpoint == "/transcribe":
+        response = await client.post(
+            url + endpoint, files={"file": entry["_audio"]}, headers=headers
+        )
+        return response.status_code == 200, parse_server_timing(
+            response.headers.get("Server-Timing")
+        )
+
+    body = {
+        "transcribedText": entry.get("transcribedText"),
+        "context": entry.get("context", []),
+    }
+    if endpoint == "/execute-query":
+        response = await client.post(url + endpoint, json=body, headers=headers)
+        return response.status_code == 200, parse_server_timing(
+            response.headers.get("Server-Timing")
+        )
+
+    # Stream: o Server-Timing sai antes do corpo, então mede o primeiro evento
+    started = time.perf_counter()
+    stages = {}
+    async with client.stream(
+        "POST", url + endpoint, json=body, headers=headers
+    ) as response:
+        ok = response.status_code == 200
+        async for line in response.aiter_lines():
+            if "ttfb" not in stages and line.startswith("event:"):
+                stages["ttfb"] = (time.perf_counter() - started) * 1000
+            if line.strip() == "event: error":
+                ok = False
+    return ok, stages
+
+
+async def run_trace(
+    url: str, token: str, trace: List[Dict[str, Any]], args
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: Dict[str, List[float]] = {}
+    stages: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+
+        async def one(entry: Dict[str, Any]):
+            endpoint = entry["endpoint"]
+            if args.pace:
+                delay = started + entry["offset_ms"] / 1000 / args.speed
+                await asyncio.sleep(max(0, delay - time.perf_counter()))
+            async with semaphore:
+                request_started = time.perf_counter()
+                try:
+                    ok, timings = await _send(client, url, entry, token)
+                except httpx.HTTPError:
+                    ok, timings = False, {}
+                elapsed = time.perf_counter() - request_started
+
+            latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                errors[endpoint] = errors.get(endpoint, 0) + 1
+            for stage, duration in timings.items():
+                stages.setdefault(stage, []).append(duration)
+
+        await asyncio.gather(*(one(entry) for entry in trace))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "total": latency_summary(all_latencies, sum(errors.values()), elapsed),
+        "endpoints": {
+            endpoint: latency_summary(values, errors.get(endpoint, 0), elapsed)
+            for endpoint, values in sorted(latencies.items())
+        },
+        "stages_ms": {
+            stage: {
+                "count": len(values),
+                "avg": round(sum(values) / len(values), 1),
+                "p50": round(percentile(values, 50), 1),
+                "p99": round(percentile(values, 99), 1),
+            }
+            for stage, values in sorted(stages.items())
+        },
+    }
+
+
+def _print_report(result: Dict[str, Any], args, requests: int):
+    total = result["total"]
+    print(
+        f"\n{requests} requisições ({args.mode}), concorrência {args.concurrency}"
+        f"{', ritmo do trace' if args.pace else ''}\n"
+    )
+    print(
+        f"{'total':<24} {total['throughput_rps']:>7} req/s  "
+        f"p50 {total['p50_ms']:>6} ms  p99 {total['p99_ms']:>6} ms  "
+        f"erros {total['errors']}"
+    )
+    for endpoint, summary in result["endpoints"].items():
+        print(
+            f"{endpoint:<24} {summary['requests']:>7} req    "
+            f"p50 {summary['p50_ms']:>6} ms  p99 {summary['p99_ms']:>6} ms  "
+            f"erros {summary['errors']}"
+        )
+
+    if result["stages_ms"]:
+        print("\nEtapas (Server-Timing, ms):")
+        for stage, summary in result["stages_ms"].items():
+            print(
+                f"  {stage:<22} n={summary['count']:<6} média {summary['avg']:>8}  "
+                f"p50 {summary['p50']:>8}  p99 {summary['p99']:>8}"
+            )
+
+    recordings = result.get("recordings")
+    if recordings:
+        print(
+            f"\nGravações: {recordings['recordings']}  "
+            f"hits {recordings['hits']}  misses {recordings['misses']}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--trace", default="bench/traces/sample.jsonl")
+    parser.add_argument("--recordings", default="bench/recordings/sample.jsonl")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="repetições descartadas")
+    parser.add_argument("--pace", action="store_true")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--latency-ms", type=int, default=800)
+    parser.add_argument("--jitter-ms", type=int, default=200)
+    parser.add_argument(
+        "--latency-mode", choices=["fixed", "recorded"], default="fixed"
+    )
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument(
+        "--no-shortcuts",
+        action="store_true",
+        help="desliga cache de intenções, parser local, respostas e gráficos locais",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="imprime o resultado em JSON"
+    )
+    parser.add_argument("--log", help="arquivo para a saída dos servidores")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    env = _server_env(args)
+
+    from services.token_service import TokenService
+
+    token = TokenService.generate_token({"user": {"id": "bench-user"}})
+    log = open(args.log, "ab") if args.log else None
+
+    fake_args = [
+        "bench.fake_openai_server",
+        "--port",
+        str(FAKE_PORT),
+        "--latency-ms",
+        str(args.latency_ms),
+        "--jitter-ms",
+        str(args.jitter_ms),
+        "--latency-mode",
+        args.latency_mode,
+        "--latency-scale",
+        str(args.latency_scale),
+    ]
+    if args.recordings and os.path.exists(args.recordings):
+        fake_args += ["--recordings", args.recordings]
+    fake = start_module(fake_args, env, log)
+
+    server_args = ["bench.servers", args.mode, "--port", str(APP_PORT)]
+    if args.mode == "sync":
+        server_args += ["--threads", str(args.threads)]
+    app = start_module(server_args, env, log)
+
+    try:
+        await wait_ready(f"http://127.0.0.1:{FAKE_PORT}/")
+        await wait_ready(f"http://127.0.0.1:{APP_PORT}/")
+        url = f"http://127.0.0.1:{APP_PORT}"
+
+        if args.warmup:
+            await run_trace(url, token, expand_trace(trace, args.warmup), args)
+        requests = expand_trace(trace, args.repeat)
+        result = await run_trace(url, token, requests, args)
+
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"http://127.0.0.1:{FAKE_PORT}/_stats")
+            result["recordings"] = response.json()
+    finally:
+        stop(app)
+        stop(fake)
+        if log:
+            log.close()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        _print_report(result, args, len(requests))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
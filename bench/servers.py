@@ -0,0 +1,104 @@
+"""
+Sobe o /execute-query e o /transcribe em um dos dois modos, sem as checagens
+de inicialização do MongoDB (saudações não acessam o banco). As respostas
+trazem o header Server-Timing, como no api.py.
+
+    python -m bench.servers sync --port 8200 --threads 16
+    python -m bench.servers async --port 8201
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI com número fixo de threads, como um worker gunicorn gthread"""
+
+    def __init__(self, host, port, app, threads: int):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+        # Fila de conexões pendentes do socket
+        self.socket.listen(1024)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+
+def serve_sync(host: str, port: int, threads: int):
+    from flask import Flask, g, request
+    from routes.execute_route import execute_bp
+    from routes.transcribe_route import transcribe_bp
+    from services.metrics import start_request_timing, finish_request_timing
+
+    app = Flask(__name__)
+    app.register_blueprint(execute_bp)
+    app.register_blueprint(transcribe_bp)
+
+    @app.before_request
+    def start_metrics():
+        g.request_started = start_request_timing()
+
+    @app.after_request
+    def add_server_timing(response):
+        header = finish_request_timing(g.request_started, request.endpoint or "unknown")
+        if header:
+            response.headers["Server-Timing"] = header
+        return response
+
+    PooledWSGIServer(host, port, app, threads).serve_forever()
+
+
+def serve_async(host: str, port: int):
+    from quart import Quart, g, request
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    from routes.async_routes import async_bp
+    from services.metrics import start_request_timing, finish_request_timing
+
+    app = Quart(__name__)
+    app.register_blueprint(async_bp)
+
+    @app.before_request
+    async def start_metrics():
+        g.request_started = start_request_timing()
+
+    @app.after_request
+    async def add_server_timing(response):
+        header = finish_request_timing(g.request_started, request.endpoint or "unknown")
+        if header:
+            response.headers["Server-Timing"] = header
+        return response
+
+    config = Config()
+    config.bind = [f"{host}:{port}"]
+    config.accesslog = None
+    config.backlog = 1024
+    asyncio.run(serve(app, config))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("mode", choices=["sync", "async"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.mode == "sync":
+        serve_sync(args.host, args.port, args.threads)
+    else:
+        serve_async(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,3 +8,4 @@ spending_collection = db["spending"]
 user_collection = db["users"]
 password_resets = db["password_resets"]
 profile_config_collection = db["profile_config"]
+transcription_cache_collection = db["transcription_cache"]
@@ -0,0 +1,9 @@
+from pymongo import AsyncMongoClient
+from config import MONGO_URI
+
+# Cliente assíncrono usado apenas pelo servidor ASGI (api_async.py)
+async_client = AsyncMongoClient(MONGO_URI)
+async_db = async_client["VoiceTask"]
+
+async_spending_collection = async_db["spending"]
+async_profile_config_collection = async_db["profile_config"]
@@ -0,0 +1,137 @@
+import json
+from quart import Blueprint, request, jsonify, g
+from services.async_pipeline import execute_command_async_coalesced
+from services.transcribe import transcribe_async
+from services.profile_prefetch import profile_prefetch_async
+from db.mongo_async import async_profile_config_collection
+from services.metrics import timed
+from services.llm_guard import LLM_RETRY_AFTER_SECONDS, LLMUnavailableError
+from services.transcode_pool import TRANSCODE_RETRY_AFTER_SECONDS, TranscodeBusyError
+from services.audio_convert import sniff_container
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from utils.async_auth_decorator import async_token_required
+from utils.audio_upload import AUDIO_MAX_UPLOAD_BYTES
+from typing import List, Dict, Any
+
+async_bp = Blueprint("async-routes", __name__)
+
+
+@async_bp.route("/execute-query", methods=["POST"])
+@async_token_required
+async def execute():
+    data = await request.get_json()
+    transcribed_text = data.get("transcribedText")
+    context: List[Dict[str, Any]] = data.get("context", [])
+
+    payload, status = await execute_command_async_coalesced(
+        transcribed_text, context, g.logged_user
+    )
+    if status == 503:
+        return jsonify(payload), status, {"Retry-After": str(LLM_RETRY_AFTER_SECONDS)}
+    return jsonify(payload), status
+
+
+def _too_large():
+    limit_mb = AUDIO_MAX_UPLOAD_BYTES // (1024 * 1024)
+    return jsonify({"error": f"Arquivo maior que o limite de {limit_mb} MB"}), 413
+
+
+def _unsupported():
+    return jsonify({"error": "Formato de áudio não suportado"}), 415
+
+
+async def _read_audio():
+    """Lê o arquivo do multipart: (bytes, None) ou (None, resposta de erro)"""
+    # O limite de tamanho vem do MAX_CONTENT_LENGTH do app (api_async.py)
+    try:
+        with timed("upload"):
+            files = await request.files
+    except RequestEntityTooLarge:
+        return None, _too_large()
+    except UnsupportedMediaType:
+        return None, _unsupported()
+    if "file" not in files:
+        return None, (jsonify({"error": "No file part"}), 400)
+
+    file = files["file"]
+    if file.filename == "":
+        return None, (jsonify({"error": "No selected file"}), 400)
+
+    with timed("upload"):
+        audio_data = file.read()
+    if sniff_container(audio_data) is None:
+        return None, _unsupported()
+    return audio_data, None
+
+
+async def _transcribe_or_error(audio_data: bytes):
+    """Transcreve: (texto, None) ou (None, resposta de erro)"""
+    try:
+        transcribed_text = await transcribe_async(audio_data)
+
+        if transcribed_text == None:
+            return None, (jsonify({"erro": "Erro ao transcrever o áudio"}), 400)
+
+    except ValueError as ve:
+        return None, (jsonify({"error": str(ve)}), 400)
+
+    except LLMUnavailableError:
+        # Transcrição não tem alternativa local: o app tenta de novo depois
+        return None, (
+            jsonify({"error": "Serviço de transcrição indisponível no momento"}),
+            503,
+            {"Retry-After": str(LLM_RETRY_AFTER_SECONDS)},
+        )
+
+    except TranscodeBusyError:
+        # Muitos áudios sendo convertidos: recusa rápido em vez de enfileirar
+        return None, (
+            jsonify({"error": "Servidor ocupado convertendo áudios, tente novamente"}),
+            503,
+            {"Retry-After": str(TRANSCODE_RETRY_AFTER_SECONDS)},
+        )
+
+    return transcribed_text, None
+
+
+@async_bp.route("/transcribe", methods=["POST"])
+@async_token_required
+async def transcribe_audio():
+    audio_data, error = await _read_audio()
+    if error is not None:
+        return error
+
+    transcribed_text, error = await _transcribe_or_error(audio_data)
+    if error is not None:
+        return error
+
+    return jsonify({"transcribed_text": transcribed_text}), 200
+
+
+@async_bp.route("/transcribe-and-execute", methods=["POST"])
+@async_token_required
+async def transcribe_and_execute():
+    """Versão assíncrona do /transcribe-and-execute (routes/transcribe_route.py)"""
+    audio_data, error = await _read_audio()
+    if error is not None:
+        return error
+
+    form = await request.form
+    try:
+        context = json.loads(form.get("context") or "[]")
+    except ValueError:
+        return jsonify({"error": "Campo 'context' não é um JSON válido"}), 400
+
+    user = g.logged_user
+    async with profile_prefetch_async(async_profile_config_collection, user.get("id")):
+        transcribed_text, error = await _transcribe_or_error(audio_data)
+        if error is not None:
+            return error
+
+        payload, status = await execute_command_async_coalesced(
+            transcribed_text, context, user
+        )
+    body = {"transcribed_text": transcribed_text, **payload}
+    if status == 503:
+        return jsonify(body), status, {"Retry-After": str(LLM_RETRY_AFTER_SECONDS)}
+    return jsonify(body), status
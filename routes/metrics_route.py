@@ -0,0 +1,19 @@
+from flask import Blueprint, Response, jsonify, request
+from services.metrics import metrics, metrics_authorized
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Histogramas de latência por etapa, uso de tokens dos LLMs e contadores
+    dos serviços. Formato Prometheus por padrão, ou JSON com ?format=json
+    """
+    if not metrics_authorized(request.headers.get("Authorization")):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if request.args.get("format") == "json":
+        return jsonify(metrics.snapshot()), 200
+
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
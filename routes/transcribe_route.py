@@ -1,11 +1,17 @@
-import os
-import tempfile
-from flask import Blueprint, request, jsonify
-from werkzeug.utils import secure_filename
+import json
+from flask import Blueprint, request, jsonify, g
 from services.spending_service import SpendingService
 from services.transcribe import transcribe
+from services.execute_pipeline import execute_command_coalesced
+from services.profile_prefetch import profile_prefetch
+from services.metrics import timed
+from services.llm_guard import LLM_RETRY_AFTER_SECONDS, LLMUnavailableError
+from services.transcode_pool import TRANSCODE_RETRY_AFTER_SECONDS, TranscodeBusyError
+from services.audio_convert import sniff_container
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 from db.mongo import spending_collection, profile_config_collection
 from utils.auth_decorator import token_required
+from utils.audio_upload import AUDIO_MAX_UPLOAD_BYTES
 from services.profile_config_service import ProfileConfigService
 
 transcribe_bp = Blueprint("transcribe", __name__)
@@ -14,34 +20,117 @@ spending_service = SpendingService(spending_collection)
 profile_config_service = ProfileConfigService(profile_config_collection)
 
 
-@transcribe_bp.route("/transcribe", methods=["POST"])
-@token_required
-def transcribe_audio():
-    if "file" not in request.files:
-        return jsonify({"error": "No file part"}), 400
+def _too_large():
+    limit_mb = AUDIO_MAX_UPLOAD_BYTES // (1024 * 1024)
+    return jsonify({"error": f"Arquivo maior que o limite de {limit_mb} MB"}), 413
+
+
+def _unsupported():
+    return jsonify({"error": "Formato de áudio não suportado"}), 415
+
+
+def _read_audio():
+    """Lê o arquivo do multipart: (bytes, None) ou (None, resposta de erro)"""
+    # Limite aplicado enquanto o corpo chega, não depois de tudo em memória
+    request.max_content_length = AUDIO_MAX_UPLOAD_BYTES
 
-    file = request.files["file"]
+    # O corpo multipart é lido no primeiro acesso a request.files; o arquivo
+    # fica em memória (AudioSpool) e o formato é conferido nos primeiros bytes
+    try:
+        with timed("upload"):
+            files = request.files
+    except RequestEntityTooLarge:
+        return None, _too_large()
+    except UnsupportedMediaType:
+        return None, _unsupported()
+
+    if "file" not in files:
+        return None, (jsonify({"error": "No file part"}), 400)
+
+    file = files["file"]
     if file.filename == "":
-        return jsonify({"error": "No selected file"}), 400
+        return None, (jsonify({"error": "No selected file"}), 400)
+
+    # O áudio fica em memória: a conversão usa pipes do ffmpeg
+    with timed("upload"):
+        audio_data = file.read()
+    # Arquivos curtos demais para a checagem durante o upload
+    if sniff_container(audio_data) is None:
+        return None, _unsupported()
+    return audio_data, None
 
-    filename = secure_filename(file.filename)
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=os.path.splitext(filename)[1]
-    ) as tmp:
-        file.save(tmp.name)
-        temp_filepath = tmp.name
 
+def _transcribe_or_error(audio_data: bytes):
+    """Transcreve: (texto, None) ou (None, resposta de erro)"""
     try:
-        transcribed_text = transcribe(temp_filepath)
+        transcribed_text = transcribe(audio_data)
 
         if transcribed_text == None:
-            return jsonify({"erro": "Erro ao transcrever o áudio"}), 400
+            return None, (jsonify({"erro": "Erro ao transcrever o áudio"}), 400)
 
     except ValueError as ve:
-        return jsonify({"error": str(ve)}), 400
+        return None, (jsonify({"error": str(ve)}), 400)
+
+    except LLMUnavailableError:
+        # Transcrição não tem alternativa local: o app tenta de novo depois
+        return None, (
+            jsonify({"error": "Serviço de transcrição indisponível no momento"}),
+            503,
+            {"Retry-After": str(LLM_RETRY_AFTER_SECONDS)},
+        )
+
+    except TranscodeBusyError:
+        # Muitos áudios sendo convertidos: recusa rápido em vez de enfileirar
+        return None, (
+            jsonify({"error": "Servidor ocupado convertendo áudios, tente novamente"}),
+            503,
+            {"Retry-After": str(TRANSCODE_RETRY_AFTER_SECONDS)},
+        )
+
+    return transcribed_text, None
 
-    finally:
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
+
+@transcribe_bp.route("/transcribe", methods=["POST"])
+@token_required
+def transcribe_audio():
+    audio_data, error = _read_audio()
+    if error is not None:
+        return error
+
+    transcribed_text, error = _transcribe_or_error(audio_data)
+    if error is not None:
+        return error
 
     return jsonify({"transcribed_text": transcribed_text}), 200
+
+
+@transcribe_bp.route("/transcribe-and-execute", methods=["POST"])
+@token_required
+def transcribe_and_execute():
+    """
+    /transcribe seguido do /execute-query na mesma requisição: o app economiza
+    uma ida e volta e o token é verificado uma vez só.
+
+    Multipart com "file" (áudio) e "context" (opcional, o mesmo JSON do
+    /execute-query). Responde com transcribed_text e o corpo do /execute-query.
+    O profile_config do usuário é lido enquanto o áudio é transcrito.
+    """
+    audio_data, error = _read_audio()
+    if error is not None:
+        return error
+
+    try:
+        context = json.loads(request.form.get("context") or "[]")
+    except ValueError:
+        return jsonify({"error": "Campo 'context' não é um JSON válido"}), 400
+
+    with profile_prefetch(profile_config_collection, g.logged_user.get("id")):
+        transcribed_text, error = _transcribe_or_error(audio_data)
+        if error is not None:
+            return error
+
+        payload, status = execute_command_coalesced(transcribed_text, context)
+    body = {"transcribed_text": transcribed_text, **payload}
+    if status == 503:
+        return jsonify(body), status, {"Retry-After": str(LLM_RETRY_AFTER_SECONDS)}
+    return jsonify(body), status
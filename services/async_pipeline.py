@@ -0,0 +1,304 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from flask import Flask, g
+from services.gpt import ask_gpt_async
+from services.gpt_analyser import analyse_result_async
+from services.gpt_chart import build_chart_async
+from services.local_answer import build_degraded_answer, build_local_answer
+from services.llm_guard import LLMUnavailableError
+from services.result_compactor import compact_query_result
+from services.metrics import metrics, timed
+from services.context_manager import compact_context
+from services.speculative_query import (
+    SPECULATIVE_QUERY_ENABLED,
+    AsyncSpeculativeQuery,
+)
+from services.single_flight import (
+    SINGLE_FLIGHT_ENABLED,
+    SINGLE_FLIGHT_LINGER_SECONDS,
+    AsyncSingleFlight,
+    flight_key,
+)
+from services.spending_service import (
+    build_consult_query,
+    build_spending_docs,
+    stringify_ids,
+    validate_spending_data,
+)
+from services.batch_registration import (
+    build_batch_answer,
+    is_batch,
+    prepare_batch_operations,
+)
+from services.execute_pipeline import (
+    Response,
+    llm_unavailable_response,
+    transcription_response,
+    early_response,
+    run_registration,
+    final_response,
+    spending_service,
+    profile_config_service,
+)
+from db.mongo_async import async_spending_collection, async_profile_config_collection
+from services.profile_prefetch import find_profile_config_async
+from utils.json_stream import loads_model_json
+
+# Os serviços síncronos leem o usuário de flask.g; este app serve apenas para
+# criar esse contexto quando o caminho assíncrono precisa delegar a eles
+_sync_bridge_app = Flask(__name__)
+
+
+def _call_with_user(user: Dict[str, Any], fn, *args):
+    with _sync_bridge_app.app_context():
+        g.logged_user = user
+        return fn(*args)
+
+
+async def run_sync(user: Dict[str, Any], fn, *args):
+    """Executa código dos serviços síncronos em uma thread, com o usuário em flask.g"""
+    return await asyncio.to_thread(_call_with_user, user, fn, *args)
+
+
+async def consult_spending_async(data: Dict[str, Any], user: Dict[str, Any]):
+    # Consulta de projeto depende da busca/criação de projeto do serviço síncrono
+    if data.get("operation") == "CONSULT_PROJECT":
+        return await run_sync(user, spending_service.consult_spending, data)
+
+    query = build_consult_query(data, user.get("id"))
+
+    if "pipeline" in query:
+        cursor = await async_spending_collection.aggregate(query["pipeline"])
+        return await cursor.to_list()
+
+    cursor = async_spending_collection.find(query["filter"])
+    if query.get("sort"):
+        cursor = cursor.sort(query["sort"])
+    if query.get("limit"):
+        cursor = cursor.limit(query["limit"])
+    return stringify_ids(await cursor.to_list())
+
+
+async def consult_profile_config_async(
+    data: Dict[str, Any], user: Dict[str, Any]
+) -> Dict[str, Any]:
+    config_field = data.get("config_field")
+    if config_field in ("project_consulting", "fixed_bills") or not config_field:
+        return await run_sync(user, profile_config_service.consult_profile_config, data)
+
+    strategy_doc = await find_profile_config_async(
+        async_profile_config_collection, user.get("id")
+    )
+    return {"config_field": config_field, "profile-config": strategy_doc}
+
+
+async def fetch_query_results_async(
+    json_data: Dict[str, Any], user: Dict[str, Any]
+) -> Dict[str, Any]:
+    collections_needed = json_data.get("collections_needed", [])
+    result = {}
+
+    # As coleções são consultadas em paralelo
+    tasks = {}
+    if "spendings" in collections_needed:
+        tasks["spendings"] = consult_spending_async(json_data, user)
+    if "profile_config" in collections_needed:
+        tasks["profile_config"] = consult_profile_config_async(json_data, user)
+
+    values = await asyncio.gather(*tasks.values())
+    for key, value in zip(tasks.keys(), values):
+        result[key] = value
+    return result
+
+
+async def run_consult_async(
+    json_data: Dict[str, Any],
+    text: str,
+    user: Dict[str, Any],
+    speculation: Optional[AsyncSpeculativeQuery] = None,
+):
+    query_result = None
+    if speculation is not None:
+        query_result = await speculation.result_for(json_data)
+    if query_result is None:
+        with timed("mongo"):
+            query_result = await fetch_query_results_async(json_data, user)
+    spendings = query_result.get("spendings", [])
+
+    # Analisador de resposta e de gráfico rodam juntos quando o gráfico é provável
+    chart_task = None
+    if json_data.get("chart_data") is True:
+        chart_task = asyncio.create_task(build_chart_async(spendings, text))
+
+    with timed("analyser"):
+        local_answer = build_local_answer(json_data, query_result, text)
+        if local_answer is not None:
+            json_data.update(local_answer)
+        else:
+            try:
+                analyser_result = await analyse_result_async(
+                    compact_query_result(query_result), text
+                )
+                json_data.update(loads_model_json(analyser_result))
+            except LLMUnavailableError:
+                json_data.update(build_degraded_answer(json_data, query_result, text))
+            except Exception:
+                if chart_task is not None:
+                    chart_task.cancel()
+                raise
+    json_data["consult_results"] = []
+
+    if json_data.get("chart_data") is True:
+        if chart_task is None:
+            chart_task = asyncio.create_task(build_chart_async(spendings, text))
+        json_data["chart_data"] = await chart_task
+    elif chart_task is not None:
+        # O analisador decidiu que não há gráfico: descarta o resultado
+        chart_task.cancel()
+
+    if json_data.get("config_field") != "monthly_limit":
+        json_data["consult_results"] = spendings
+
+
+def _is_simple_spending(json_data: Dict[str, Any]) -> bool:
+    return (
+        json_data.get("type") not in ("PROJECT_CREATION", "FIXED_BILL")
+        and not json_data.get("projectName")
+        and int(json_data.get("installments", 1) or 1) == 1
+    )
+
+
+async def run_batch_registration_async(
+    json_data: Dict[str, Any], user: Dict[str, Any]
+) -> Optional[Response]:
+    try:
+        operations = prepare_batch_operations(json_data)
+    except ValueError as ve:
+        return transcription_response(str(ve), json_data.get("prompt"))
+
+    # Lotes com projeto atualizam o profile_config pelo fluxo síncrono
+    if any(op.get("projectName") for op in operations):
+        return await run_sync(user, run_registration, json_data)
+
+    docs_per_operation = [build_spending_docs(op, user.get("id")) for op in operations]
+    await async_spending_collection.insert_many(
+        [doc for docs in docs_per_operation for doc in docs], ordered=True
+    )
+    json_data["gpt_answer"] = build_batch_answer(operations)
+    json_data["consult_results"] = [docs[0] for docs in docs_per_operation]
+    return None
+
+
+async def run_registration_async(json_data: Dict[str, Any], user: Dict[str, Any]):
+    if is_batch(json_data):
+        return await run_batch_registration_async(json_data, user)
+
+    # Projetos, contas fixas e parcelados continuam no fluxo síncrono
+    if not _is_simple_spending(json_data):
+        return await run_sync(user, run_registration, json_data)
+
+    try:
+        _, base_date = validate_spending_data(json_data)
+    except ValueError as ve:
+        return transcription_response(str(ve), json_data.get("prompt"))
+
+    doc = {
+        "userId": user.get("id"),
+        "description": json_data["description"],
+        "value": float(json_data["value"]),
+        "type": json_data["type"],
+        "category": json_data["category"],
+        "date": base_date.strftime("%Y-%m-%d"),
+    }
+    await async_spending_collection.insert_one(doc)
+    json_data["consult_results"] = [doc]
+    return None
+
+
+async def execute_command_async(
+    transcribed_text: str, context: List[Dict[str, Any]], user: Dict[str, Any]
+) -> Response:
+    """Versão assíncrona do execute_command (services/execute_pipeline.py)"""
+    if not transcribed_text:
+        return transcription_response(
+            "Texto não identificado no áudio", with_results=True
+        )
+
+    # Consulta ao Mongo antecipada enquanto o modelo escreve o resto da intenção
+    speculation = None
+    if SPECULATIVE_QUERY_ENABLED:
+        speculation = AsyncSpeculativeQuery(
+            lambda data: fetch_query_results_async(data, user)
+        )
+    try:
+        return await _execute_intent_async(transcribed_text, context, user, speculation)
+    finally:
+        if speculation is not None:
+            speculation.discard()
+
+
+async def _execute_intent_async(
+    transcribed_text: str,
+    context: List[Dict[str, Any]],
+    user: Dict[str, Any],
+    speculation: Optional[AsyncSpeculativeQuery],
+) -> Response:
+    # Converter context para string (últimos turnos + resumo, com tamanho limitado)
+    context_str = compact_context(context)
+
+    on_partial = speculation.observe if speculation is not None else None
+    try:
+        with timed("intent"):
+            gpt_response = await ask_gpt_async(
+                transcribed_text, context_str, on_partial
+            )
+    except LLMUnavailableError:
+        return llm_unavailable_response()
+    if not gpt_response:
+        return transcription_response(
+            "Erro ao processar a solicitação", with_results=True
+        )
+
+    json_data = loads_model_json(gpt_response)
+
+    try:
+        response = early_response(json_data)
+        if response is not None:
+            return response
+
+        if json_data.get("consult") is True:
+            try:
+                await run_consult_async(json_data, transcribed_text, user, speculation)
+            except Exception as e:
+                return {"error": str(e)}, 400
+        else:
+            with timed("registration"):
+                response = await run_registration_async(json_data, user)
+            if response is not None:
+                return response
+
+    except Exception as e:
+        print(str(e))
+        return transcription_response(
+            "Ocorreu um erro desconhecido", json_data.get("prompt")
+        )
+
+    return final_response(json_data)
+
+
+async_execute_flight = AsyncSingleFlight(
+    SINGLE_FLIGHT_LINGER_SECONDS, should_linger=lambda response: response[1] == 200
+)
+metrics.register_source("single_flight_async", async_execute_flight.stats)
+
+
+async def execute_command_async_coalesced(
+    transcribed_text: str, context: List[Dict[str, Any]], user: Dict[str, Any]
+) -> Response:
+    """execute_command_async com coalescência de requisições idênticas simultâneas"""
+    if not SINGLE_FLIGHT_ENABLED:
+        return await execute_command_async(transcribed_text, context, user)
+    key = flight_key(user.get("id"), transcribed_text, context)
+    return await async_execute_flight.do(
+        key, execute_command_async, transcribed_text, context, user
+    )
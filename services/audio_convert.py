@@ -0,0 +1,289 @@
+import io
+import os
+import subprocess
+import tempfile
+import wave
+from typing import List, Optional, Tuple
+from decouple import config
+from services.chunked_transcription import (
+    CHUNKED_TRANSCRIPTION_ENABLED,
+    CHUNKED_TRANSCRIPTION_MIN_SECONDS,
+    TRANSCRIPTION_CHUNK_MAX_SECONDS,
+    TRANSCRIPTION_CHUNK_OVERLAP_MS,
+    TRANSCRIPTION_CHUNK_SECONDS,
+)
+from services.metrics import metrics, note_request_value
+from services.transcode_pool import transcode_pool
+from services.vad import BYTES_PER_SAMPLE, chunk_bounds, trim_silence
+
+FFMPEG_BIN = config("FFMPEG_BIN", default="ffmpeg")
+# Saída compacta para a transcrição: mono, 16 kHz, Opus em Ogg
+AUDIO_SAMPLE_RATE = config("AUDIO_SAMPLE_RATE", default=16000, cast=int)
+AUDIO_OPUS_BITRATE = config("AUDIO_OPUS_BITRATE", default="24k")
+# Envia direto, sem ffmpeg, os formatos que a API de transcrição já aceita
+AUDIO_PASSTHROUGH_ENABLED = config("AUDIO_PASSTHROUGH_ENABLED", default=True, cast=bool)
+# Corta o silêncio do começo e do fim antes de enviar para a transcrição
+VAD_TRIM_ENABLED = config("VAD_TRIM_ENABLED", default=True, cast=bool)
+# Também encurta pausas longas no meio da fala
+VAD_COMPRESS_PAUSES = config("VAD_COMPRESS_PAUSES", default=False, cast=bool)
+# Abaixo disso o corte não compensa reencodar: o arquivo original segue
+VAD_TRIM_MIN_SECONDS = config("VAD_TRIM_MIN_SECONDS", default=0.5, cast=float)
+# Uploads menores que isso (≈ 40 s a 32 kbps) não são decodificados para o
+# corte e a divisão: seguem como vieram ou passam por um único ffmpeg
+AUDIO_DECODE_MIN_BYTES = config("AUDIO_DECODE_MIN_BYTES", default=160 * 1024, cast=int)
+# Um ffmpeg travado não pode segurar um worker do pool para sempre
+TRANSCODE_TIMEOUT_SECONDS = config(
+    "TRANSCODE_TIMEOUT_SECONDS", default=30.0, cast=float
+)
+
+# Formatos aceitos pela API de transcrição (extensão usada no upload)
+ACCEPTED_CONTAINERS = ("flac", "m4a", "mp3", "mp4", "ogg", "wav", "webm")
+# Marcas do cabeçalho ftyp tratadas como m4a/mp4 (.mov e .3gp são convertidos)
+_MP4_BRANDS = {
+    b"M4A ": "m4a",
+    b"M4B ": "m4a",
+    b"mp41": "mp4",
+    b"mp42": "mp4",
+    b"isom": "mp4",
+    b"iso2": "mp4",
+    b"dash": "mp4",
+}
+
+
+class AudioConversionError(ValueError):
+    """O ffmpeg não conseguiu ler o áudio enviado"""
+
+
+def sniff_container(data: bytes) -> Optional[str]:
+    """Identifica o formato pelos primeiros bytes (None se desconhecido)"""
+    head = data[:16]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"caff":
+        return "caf"
+    if head[:5] == b"#!AMR":
+        return "amr"
+    if head[:4] == b"FORM" and head[8:11] == b"AIF":
+        return "aiff"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[4:8] == b"ftyp":
+        return _MP4_BRANDS.get(head[8:12], "mov")
+    if head[:3] == b"ID3" or (
+        len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+    ):
+        return "mp3"
+    return None
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Envolve PCM 16 bits mono em um WAV (aceito pela API sem conversão)"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+# Saída Opus em Ogg e saída PCM 16 bits (para o corte de silêncio)
+_OPUS_OUTPUT = [
+    "-c:a",
+    "libopus",
+    "-b:a",
+    AUDIO_OPUS_BITRATE,
+    "-application",
+    "voip",
+    "-f",
+    "ogg",
+]
+_PCM_OUTPUT = ["-f", "s16le"]
+
+
+def _ffmpeg_command(input_arg: str, output_args, input_args=()):
+    return [
+        FFMPEG_BIN,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        *input_args,
+        "-i",
+        input_arg,
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(AUDIO_SAMPLE_RATE),
+        *output_args,
+        "pipe:1",
+    ]
+
+
+def _needs_conversion(container: Optional[str]) -> bool:
+    return not AUDIO_PASSTHROUGH_ENABLED or container not in ACCEPTED_CONTAINERS
+
+
+def _conversion_error(returncode: int, stderr: bytes) -> AudioConversionError:
+    message = stderr.decode("utf-8", "replace").strip().splitlines()
+    detail = message[-1] if message else f"código {returncode}"
+    return AudioConversionError(f"Não foi possível converter o áudio: {detail}")
+
+
+def _write_temp(data: bytes, container: Optional[str]) -> str:
+    with tempfile.NamedTemporaryFile(
+        delete=False, suffix=f".{container or 'bin'}"
+    ) as tmp:
+        tmp.write(data)
+        return tmp.name
+
+
+def _run_ffmpeg(command, data: Optional[bytes] = None):
+    try:
+        return subprocess.run(
+            command,
+            input=data,
+            stdin=None if data is not None else subprocess.DEVNULL,
+            capture_output=True,
+            timeout=TRANSCODE_TIMEOUT_SECONDS,
+        )
+    except subprocess.TimeoutExpired:
+        raise AudioConversionError("Conversão do áudio excedeu o tempo limite")
+
+
+def _ffmpeg_transcode(data: bytes, container: Optional[str], output_args) -> bytes:
+    result = _run_ffmpeg(_ffmpeg_command("pipe:0", output_args), data)
+    if result.returncode != 0 or not result.stdout:
+        input_path = _write_temp(data, container)
+        try:
+            result = _run_ffmpeg(_ffmpeg_command(input_path, output_args))
+        finally:
+            os.remove(input_path)
+        if result.returncode != 0 or not result.stdout:
+            raise _conversion_error(result.returncode, result.stderr)
+    return result.stdout
+
+
+def _encode_pcm(pcm: bytes, sample_rate: int) -> bytes:
+    input_args = ["-f", "s16le", "-ar", str(sample_rate), "-ac", "1"]
+    result = _run_ffmpeg(_ffmpeg_command("pipe:0", _OPUS_OUTPUT, input_args), pcm)
+    if result.returncode != 0 or not result.stdout:
+        raise _conversion_error(result.returncode, result.stderr)
+    return result.stdout
+
+
+def _read_pcm(data: bytes, container: Optional[str]) -> Tuple[bytes, int]:
+    """PCM 16 bits mono do áudio: WAV simples é lido direto, o resto pelo ffmpeg"""
+    if container == "wav":
+        try:
+            with wave.open(io.BytesIO(data)) as wav:
+                if wav.getnchannels() == 1 and wav.getsampwidth() == 2:
+                    return wav.readframes(wav.getnframes()), wav.getframerate()
+        except (wave.Error, EOFError):
+            pass
+    return _ffmpeg_transcode(data, container, _PCM_OUTPUT), AUDIO_SAMPLE_RATE
+
+
+def _encode_trimmed(pcm: bytes, sample_rate: int, container: Optional[str]):
+    try:
+        return "audio.ogg", _encode_pcm(pcm, sample_rate)
+    except (AudioConversionError, OSError):
+        if container != "wav":
+            raise
+        # WAV lido sem ffmpeg: segue cortado, mesmo sem a compressão
+        return "audio.wav", pcm16_to_wav(pcm, sample_rate)
+
+
+def _split(pcm: bytes, sample_rate: int) -> List[Tuple[int, int]]:
+    seconds = len(pcm) / BYTES_PER_SAMPLE / sample_rate
+    if (
+        not CHUNKED_TRANSCRIPTION_ENABLED
+        or seconds <= CHUNKED_TRANSCRIPTION_MIN_SECONDS
+    ):
+        return [(0, len(pcm))]
+    return chunk_bounds(
+        pcm,
+        sample_rate,
+        TRANSCRIPTION_CHUNK_SECONDS,
+        TRANSCRIPTION_CHUNK_MAX_SECONDS,
+        TRANSCRIPTION_CHUNK_OVERLAP_MS,
+    )
+
+
+def _decode_needed(data: bytes) -> bool:
+    if not (VAD_TRIM_ENABLED or CHUNKED_TRANSCRIPTION_ENABLED):
+        return False
+    # Áudio curto não chega a ser dividido, e o pouco silêncio cortado não
+    # paga um ffmpeg a mais (nem a perda do envio direto)
+    return len(data) >= AUDIO_DECODE_MIN_BYTES
+
+
+def _prepare_audio(data: bytes, container: Optional[str]) -> List[Tuple[str, bytes]]:
+    """Trabalho feito no pool: corte de silêncio, divisão e conversão para Opus"""
+    if not _decode_needed(data):
+        return [("audio.ogg", _ffmpeg_transcode(data, container, _OPUS_OUTPUT))]
+
+    try:
+        pcm, sample_rate = _read_pcm(data, container)
+    except (AudioConversionError, OSError):
+        # Formato aceito pela API: sem o corte, o original ainda serve
+        if _needs_conversion(container):
+            raise
+        return [(f"audio.{container}", data)]
+
+    removed = 0.0
+    if VAD_TRIM_ENABLED:
+        pcm, removed = trim_silence(pcm, sample_rate, VAD_COMPRESS_PAUSES)
+        # Segundos de áudio que deixaram de ir para a transcrição
+        metrics.observe("vad_removed_ms", removed * 1000)
+        metrics.inc("vad_removed_seconds_total", removed)
+        note_request_value("vad_removed", removed * 1000)
+
+    bounds = _split(pcm, sample_rate)
+    if len(bounds) > 1:
+        return [
+            _encode_trimmed(pcm[start:end], sample_rate, container)
+            for start, end in bounds
+        ]
+    if removed < VAD_TRIM_MIN_SECONDS and not _needs_conversion(container):
+        return [(f"audio.{container}", data)]
+    return [_encode_trimmed(pcm, sample_rate, container)]
+
+
+def _skip_pool(data: bytes, container: Optional[str]) -> bool:
+    # Sem corte nem divisão, formatos aceitos não precisam do ffmpeg
+    return not _decode_needed(data) and not _needs_conversion(container)
+
+
+def transcode_audio(data: bytes) -> List[Tuple[str, bytes]]:
+    """
+    Prepara o áudio para a transcrição e devolve [(nome do arquivo, bytes)].
+
+    A partir de AUDIO_DECODE_MIN_BYTES o áudio é decodificado para PCM, o
+    silêncio das pontas é cortado (VAD_TRIM_ENABLED) e o resultado vai em
+    Opus mono 16 kHz. Gravações longas voltam em vários trechos, cortados nas
+    pausas e com sobreposição, para serem transcritas em paralelo. Áudio
+    curto, ou com corte pequeno, segue como veio se a API aceitar o formato;
+    os demais (caf, mov...) passam pelo ffmpeg via stdin/stdout.
+
+    Tudo roda no pool limitado de conversão (TranscodeBusyError se a fila
+    estiver cheia). Se o formato não puder ser lido de um pipe (mp4 com o
+    índice no fim), a entrada vai para um arquivo temporário e só a saída
+    continua em memória.
+    """
+    container = sniff_container(data)
+    if _skip_pool(data, container):
+        return [(f"audio.{container}", data)]
+    return transcode_pool.run(_prepare_audio, data, container)
+
+
+async def transcode_audio_async(data: bytes) -> List[Tuple[str, bytes]]:
+    """Versão assíncrona do transcode_audio (mesmo pool de conversão)"""
+    container = sniff_container(data)
+    if _skip_pool(data, container):
+        return [(f"audio.{container}", data)]
+    return await transcode_pool.run_async(_prepare_audio, data, container)
@@ -0,0 +1,81 @@
+from typing import Any, Dict, List
+from decouple import config
+from services.spending_service import validate_spending_data
+from utils.format_utils import format_brl, format_category
+
+# Máximo de registros aceitos em uma única frase
+BATCH_MAX_OPERATIONS = config("BATCH_MAX_OPERATIONS", default=20, cast=int)
+
+# Campos da intenção principal herdados pelas operações que não os informam
+_INHERITED_FIELDS = ("date", "type", "projectName")
+_BATCH_TYPES = ("SPENDING", "REVENUE")
+
+
+def is_batch(json_data: Dict[str, Any]) -> bool:
+    return json_data.get("batch") is True and isinstance(
+        json_data.get("operations"), list
+    )
+
+
+def prepare_batch_operations(json_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Valida as operações de um comando em lote ("gastei 20 no café, 150 no
+    mercado e 60 de uber"). Lança ValueError, sem registrar nada, se alguma
+    operação for inválida.
+    """
+    operations = [op for op in json_data["operations"] if isinstance(op, dict)]
+    if not operations:
+        raise ValueError("Nenhum registro identificado no comando")
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise ValueError(f"Registre no máximo {BATCH_MAX_OPERATIONS} itens por comando")
+
+    prepared = []
+    for number, op in enumerate(operations, start=1):
+        op = dict(op)
+        for field in _INHERITED_FIELDS:
+            if not op.get(field) and json_data.get(field):
+                op[field] = json_data[field]
+        op.setdefault("type", "SPENDING")
+        label = op.get("description") or f"item {number}"
+
+        if op["type"] not in _BATCH_TYPES:
+            raise ValueError(
+                f"Item {number} ({label}): apenas gastos e receitas podem ser registrados em lote"
+            )
+        try:
+            validate_spending_data(op)
+        except ValueError as ve:
+            raise ValueError(f"Item {number} ({label}): {ve}")
+        prepared.append(op)
+    return prepared
+
+
+def build_batch_answer(operations: List[Dict[str, Any]]) -> str:
+    """Confirmação única para todos os registros do lote"""
+    lines = []
+    spent = 0.0
+    received = 0.0
+    for op in operations:
+        value = float(op["value"])
+        if op["type"] == "REVENUE":
+            received += value
+        else:
+            spent += value
+        installments = int(op.get("installments", 1) or 1)
+        parcels = f" em {installments}x" if installments > 1 else ""
+        project = f" · projeto {op['projectName']}" if op.get("projectName") else ""
+        lines.append(
+            f"• {op['description']}: {format_brl(value)}{parcels} "
+            f"({format_category(op['category'])}){project}"
+        )
+
+    totals = []
+    if spent:
+        totals.append(f"💰 **Total gasto:** {format_brl(spent)}")
+    if received:
+        totals.append(f"💵 **Total recebido:** {format_brl(received)}")
+
+    answer = f"✅ **{len(operations)} registros salvos!**\n\n" + "\n".join(lines)
+    if totals:
+        answer += "\n\n" + "\n".join(totals)
+    return answer
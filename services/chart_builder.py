@@ -0,0 +1,105 @@
+import threading
+from typing import Any, Dict, List, Optional
+from decouple import config
+from services.metrics import metrics
+from utils.date_utils import month_sort_key
+from utils.format_utils import CATEGORY_LABELS_PT, MONTH_NAMES_PT
+
+CHART_BUILDER_ENABLED = config("CHART_BUILDER_ENABLED", default=True, cast=bool)
+# A partir de quantos meses a evolução vira gráfico de linha em vez de barras
+CHART_LINE_MIN_POINTS = config("CHART_LINE_MIN_POINTS", default=6, cast=int)
+
+
+def _category_label(category: Any) -> str:
+    if not category:
+        return "Outros"
+    return CATEGORY_LABELS_PT.get(str(category).upper(), str(category))
+
+
+def _month_label(month: str) -> str:
+    # O pipeline de COMPARATIVE devolve "MM/YYYY"
+    try:
+        mm, yyyy = month.split("/")
+        return f"{MONTH_NAMES_PT[int(mm) - 1][:3]}/{yyyy}"
+    except (ValueError, IndexError, AttributeError):
+        return str(month)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _category_chart(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "chartType": "pie",
+        "data": [
+            {"value": round(r["value"], 2), "label": _category_label(r.get("label"))}
+            for r in rows
+        ],
+    }
+
+
+def _month_chart(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # O $sort do pipeline compara "MM/YYYY" como texto: "01/2025" < "12/2024"
+    rows = sorted(rows, key=lambda r: month_sort_key(r.get("month")))
+    chart_type = "line" if len(rows) >= CHART_LINE_MIN_POINTS else "bar"
+    return {
+        "chartType": chart_type,
+        "data": [
+            {"value": round(r["total"], 2), "label": _month_label(r.get("month"))}
+            for r in rows
+        ],
+    }
+
+
+def build_chart_data(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Monta o chart_data diretamente das agregações do SpendingService.
+
+    CATEGORY ({label, value}) vira pizza e COMPARATIVE ({month, total}) vira
+    barras, ou linha quando há muitos meses. Retorna None para outros formatos.
+    """
+    if not rows or not all(isinstance(r, dict) for r in rows):
+        return None
+
+    if all(set(r) == {"label", "value"} and _is_number(r["value"]) for r in rows):
+        return _category_chart(rows)
+
+    if all(set(r) == {"month", "total"} and _is_number(r["total"]) for r in rows):
+        return _month_chart(rows)
+
+    return None
+
+
+class ChartBuilderStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.built = 0
+
+    def record(self, built: bool):
+        with self._lock:
+            self.attempts += 1
+            if built:
+                self.built += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "chart_calls_avoided": self.built,
+                "llm_fallbacks": self.attempts - self.built,
+            }
+
+
+chart_builder_stats = ChartBuilderStats()
+metrics.register_source("chart_builder", chart_builder_stats.snapshot)
+
+
+def try_build_chart(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Retorna o gráfico montado localmente, ou None se for preciso chamar o modelo"""
+    if not CHART_BUILDER_ENABLED:
+        return None
+    chart = build_chart_data(rows)
+    chart_builder_stats.record(chart is not None)
+    return chart
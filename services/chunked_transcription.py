@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Tuple
+from decouple import config
+from services.metrics import metrics
+
+# Gravações mais longas que isso são transcritas em trechos paralelos
+CHUNKED_TRANSCRIPTION_ENABLED = config(
+    "CHUNKED_TRANSCRIPTION_ENABLED", default=True, cast=bool
+)
+CHUNKED_TRANSCRIPTION_MIN_SECONDS = config(
+    "CHUNKED_TRANSCRIPTION_MIN_SECONDS", default=40.0, cast=float
+)
+# Tamanho alvo e máximo de cada trecho (o corte procura uma pausa entre os dois)
+TRANSCRIPTION_CHUNK_SECONDS = config(
+    "TRANSCRIPTION_CHUNK_SECONDS", default=20.0, cast=float
+)
+TRANSCRIPTION_CHUNK_MAX_SECONDS = config(
+    "TRANSCRIPTION_CHUNK_MAX_SECONDS", default=30.0, cast=float
+)
+# Áudio repetido no começo de cada trecho; o texto repetido é removido no merge
+TRANSCRIPTION_CHUNK_OVERLAP_MS = config(
+    "TRANSCRIPTION_CHUNK_OVERLAP_MS", default=1500, cast=int
+)
+# Trechos transcritos ao mesmo tempo (no processo todo, no servidor síncrono)
+TRANSCRIPTION_CHUNK_WORKERS = config("TRANSCRIPTION_CHUNK_WORKERS", default=4, cast=int)
+# Maior sobreposição de palavras procurada entre dois trechos
+_MAX_OVERLAP_WORDS = 15
+
+AudioFile = Tuple[str, bytes]
+
+# Pool próprio: o llm_executor já roda transcrições do streaming, e esperar
+# nele por trechos submetidos ao mesmo pool poderia travar tudo
+chunk_executor = ThreadPoolExecutor(
+    max_workers=TRANSCRIPTION_CHUNK_WORKERS, thread_name_prefix="chunk"
+)
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+def _overlap(left: List[str], right: List[str]) -> Optional[Tuple[int, int]]:
+    """
+    Procura o fim de left repetido no começo de right. Aceita uma palavra
+    truncada em cada ponta (o corte pode pegar uma palavra no meio).
+    Retorna (palavras mantidas de left, palavras descartadas de right).
+    """
+    a = [_normalize(w) for w in left]
+    b = [_normalize(w) for w in right]
+    best = None
+    for skip_left in (0, 1):
+        for skip_right in (0, 1):
+            end = len(a) - skip_left
+            limit = min(_MAX_OVERLAP_WORDS, end, len(b) - skip_right)
+            for size in range(limit, 0, -1):
+                if a[end - size : end] != b[skip_right : skip_right + size]:
+                    continue
+                # Uma palavra curta igual ("de", "e") não prova sobreposição, e
+                # uma só palavra depois de pular outra ("primeiro trecho" /
+                # "segundo trecho") também não
+                if size == 1 and (skip_left or skip_right or len(a[end - 1]) < 4):
+                    break
+                if best is None or size > best[0]:
+                    best = (size, end, skip_right + size)
+                break
+    return None if best is None else best[1:]
+
+
+def merge_chunk_texts(texts: List[str]) -> str:
+    """Junta os textos dos trechos removendo as palavras da sobreposição"""
+    words: List[str] = []
+    for text in texts:
+        current = (text or "").split()
+        match = _overlap(words, current) if words else None
+        if match is not None:
+            keep, drop = match
+            words = words[:keep] + current[drop:]
+            metrics.inc("transcription_chunk_overlap_total", outcome="merged")
+        else:
+            if words:
+                metrics.inc("transcription_chunk_overlap_total", outcome="none")
+            words += current
+    return " ".join(words)
+
+
+def transcribe_chunks(
+    files: List[AudioFile], transcribe_file: Callable[[AudioFile], str]
+) -> str:
+    """
+    Transcreve os trechos em paralelo no chunk_executor. A latência fica a do
+    trecho mais lento; o erro do primeiro trecho que falhar chega a quem chama.
+    """
+    futures = [
+        chunk_executor.submit(contextvars.copy_context().run, transcribe_file, audio)
+        for audio in files
+    ]
+    metrics.inc("transcription_chunks_total", len(files))
+    try:
+        texts = [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+    return merge_chunk_texts(texts)
+
+
+async def transcribe_chunks_async(
+    files: List[AudioFile], transcribe_file: Callable[[AudioFile], Awaitable[str]]
+) -> str:
+    """Versão assíncrona: no máximo TRANSCRIPTION_CHUNK_WORKERS por requisição"""
+    semaphore = asyncio.Semaphore(TRANSCRIPTION_CHUNK_WORKERS)
+
+    async def run(audio: AudioFile) -> str:
+        async with semaphore:
+            return await transcribe_file(audio)
+
+    metrics.inc("transcription_chunks_total", len(files))
+    texts = await asyncio.gather(*(run(audio) for audio in files))
+    return merge_chunk_texts(list(texts))
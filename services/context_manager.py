@@ -0,0 +1,138 @@
+from typing import Any, Dict, List, Optional
+from decouple import config
+from services.fast_parser import extract_entities
+from utils.token_budget import estimate_tokens, to_compact_json
+
+# Turnos mais recentes enviados ao modelo sem alteração
+CONTEXT_RECENT_TURNS = config("CONTEXT_RECENT_TURNS", default=6, cast=int)
+# Teto (tokens estimados) do contexto enviado ao ask_gpt
+CONTEXT_TOKEN_BUDGET = config("CONTEXT_TOKEN_BUDGET", default=800, cast=int)
+# Tamanho máximo de cada texto mantido nos turnos recentes
+CONTEXT_MAX_TEXT_CHARS = config("CONTEXT_MAX_TEXT_CHARS", default=400, cast=int)
+# Quantos turnos antigos (os mais novos deles) são lidos para montar o resumo
+CONTEXT_SUMMARY_MAX_TURNS = config("CONTEXT_SUMMARY_MAX_TURNS", default=50, cast=int)
+
+# Campos estruturados (intenções anteriores) que resumem a conversa
+_ENTITY_FIELDS = {
+    "date": "periodo",
+    "date_range": "intervalo",
+    "category": "categoria",
+    "projectName": "projeto",
+    "targetValue": "meta",
+    "type": "tipo",
+    "operation": "operacao",
+    "config_field": "config",
+}
+# Campos de texto falados pelo usuário
+_USER_TEXT_FIELDS = ("prompt", "transcribedText", "text", "message")
+# Resultados de consultas não ajudam a interpretar a próxima frase
+_HEAVY_FIELDS = {"consult_results", "chart_data", "results", "_id", "userId"}
+
+
+def _user_texts(turn: Any) -> List[str]:
+    if isinstance(turn, str):
+        return [turn]
+    if not isinstance(turn, dict):
+        return []
+    texts = [turn[k] for k in _USER_TEXT_FIELDS if isinstance(turn.get(k), str)]
+    if isinstance(turn.get("content"), str) and turn.get("role") != "assistant":
+        texts.append(turn["content"])
+    return texts
+
+
+def _structured_fields(turn: Any, found: Dict[str, Any]):
+    """Procura os campos de intenção no turno (inclusive em dicts aninhados)"""
+    if isinstance(turn, dict):
+        for key, value in turn.items():
+            if key in _HEAVY_FIELDS:
+                continue
+            if key in _ENTITY_FIELDS and isinstance(value, (str, int, float)):
+                found[_ENTITY_FIELDS[key]] = value
+            elif isinstance(value, (dict, list)):
+                _structured_fields(value, found)
+    elif isinstance(turn, list):
+        for item in turn:
+            _structured_fields(item, found)
+
+
+def _absorb(turn: Any, entities: Dict[str, Any]):
+    for text in _user_texts(turn):
+        mentioned = extract_entities(text)
+        if "date" in mentioned:
+            entities["periodo"] = mentioned["date"]
+        if "category" in mentioned:
+            entities["categoria"] = mentioned["category"]
+        if "value" in mentioned:
+            entities["valor_mencionado"] = mentioned["value"]
+    _structured_fields(turn, entities)
+
+
+def _summary(turn_count: int, entities: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not turn_count:
+        return None
+    summary = {"turnos_resumidos": turn_count}
+    if entities:
+        summary["entidades"] = dict(entities)
+    return {"resumo_da_conversa": summary}
+
+
+def _trim(value: Any, max_chars: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + "…"
+    if isinstance(value, dict):
+        return {
+            k: _trim(v, max_chars) for k, v in value.items() if k not in _HEAVY_FIELDS
+        }
+    if isinstance(value, list):
+        return [_trim(v, max_chars) for v in value]
+    return value
+
+
+def compact_context(
+    context: Optional[List[Any]],
+    recent_turns: int = None,
+    token_budget: int = None,
+) -> str:
+    """
+    Serializa o contexto da conversa para o ask_gpt com tamanho limitado.
+
+    Os últimos turnos vão quase sem alteração (sem resultados de consultas e
+    com textos longos encurtados); os anteriores viram um resumo das entidades.
+    Se ainda passar do orçamento, os turnos mais antigos entram no resumo.
+    """
+    if not context:
+        return ""
+    if not isinstance(context, list):
+        context = [context]
+    if recent_turns is None:
+        recent_turns = CONTEXT_RECENT_TURNS
+    if token_budget is None:
+        token_budget = CONTEXT_TOKEN_BUDGET
+
+    split = max(len(context) - recent_turns, 0)
+    entities: Dict[str, Any] = {}
+    for turn in context[max(split - CONTEXT_SUMMARY_MAX_TURNS, 0) : split]:
+        _absorb(turn, entities)
+
+    # O turno mais recente sempre vai inteiro; os anteriores entram no resumo
+    # enquanto o contexto passar do orçamento
+    while True:
+        recent = context[split:]
+        summary = _summary(split, entities)
+        compacted = ([summary] if summary else []) + [
+            _trim(turn, CONTEXT_MAX_TEXT_CHARS) for turn in recent
+        ]
+        if estimate_tokens(compacted) <= token_budget or len(recent) <= 1:
+            break
+        _absorb(context[split], entities)
+        split += 1
+
+    # Turnos enormes: encurta os textos até caber
+    max_chars = CONTEXT_MAX_TEXT_CHARS
+    while estimate_tokens(compacted) > token_budget and max_chars > 20:
+        max_chars //= 2
+        compacted = ([summary] if summary else []) + [
+            _trim(turn, max_chars) for turn in recent
+        ]
+
+    return to_compact_json(compacted)
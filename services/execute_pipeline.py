@@ -0,0 +1,484 @@
+from typing import Any, Dict, List, Optional, Tuple
+from flask import g
+from services.gpt import ask_gpt
+from services.gpt_analyser import analyse_result, stream_analyse_result
+from services.gpt_chart import build_chart
+from services.spending_service import SpendingService
+from services.profile_config_service import ProfileConfigService
+from services.query_orchestrator import QueryOrchestrator
+from services.llm_executor import submit_in_context
+from services.metrics import metrics, timed
+from services.context_manager import compact_context
+from services.local_answer import build_degraded_answer, build_local_answer
+from services.llm_guard import LLMUnavailableError
+from services.result_compactor import compact_query_result
+from services.batch_registration import (
+    build_batch_answer,
+    is_batch,
+    prepare_batch_operations,
+)
+from services.speculative_query import SPECULATIVE_QUERY_ENABLED, SpeculativeQuery
+from services.single_flight import (
+    SINGLE_FLIGHT_ENABLED,
+    SINGLE_FLIGHT_LINGER_SECONDS,
+    SingleFlight,
+    flight_key,
+)
+from db.mongo import spending_collection, profile_config_collection
+from utils.convert_utils import convert_object_ids
+from utils.json_stream import JsonStringFieldStreamer, loads_model_json
+
+spending_service = SpendingService(spending_collection)
+profile_config_service = ProfileConfigService(profile_config_collection)
+
+Response = Tuple[Dict[str, Any], int]
+
+
+def transcription_response(
+    gpt_answer: Optional[str],
+    description: Optional[str] = None,
+    status: int = 400,
+    with_results: bool = False,
+) -> Response:
+    """Monta a resposta padrão do /execute-query sem resultados de consulta"""
+    transcription = {
+        "gpt_answer": gpt_answer,
+        "description": description,
+        "consult_results": None,
+        "chart_data": None,
+    }
+    if with_results:
+        transcription["results"] = None
+    return {"transcription": transcription}, status
+
+
+LLM_UNAVAILABLE_MESSAGE = (
+    "⚠️ **Estou com instabilidade para entender comandos agora.**\n\n"
+    "Tente novamente em alguns instantes. Registros simples como "
+    '*"gastei 50 no mercado"* continuam funcionando.'
+)
+
+
+def llm_unavailable_response() -> Response:
+    """Modelo fora do ar e frase não reconhecida pelo parser local"""
+    return transcription_response(
+        LLM_UNAVAILABLE_MESSAGE, status=503, with_results=True
+    )
+
+
+def parse_intent(
+    transcribed_text: str,
+    context: List[Dict[str, Any]],
+    speculation: Optional[SpeculativeQuery] = None,
+):
+    """
+    Etapa 1: interpreta o texto e devolve o JSON de intenção (ou None).
+
+    Com speculation, a intenção é lida em streaming e a consulta ao Mongo
+    começa assim que os campos da busca estão completos.
+    """
+    # Converter context para string (últimos turnos + resumo, com tamanho limitado)
+    context_str = compact_context(context)
+
+    on_partial = speculation.observe if speculation is not None else None
+    with timed("intent"):
+        gpt_response = ask_gpt(transcribed_text, context_str, on_partial)
+    if not gpt_response:
+        return None
+    return loads_model_json(gpt_response)
+
+
+def early_response(json_data: Dict[str, Any]) -> Optional[Response]:
+    """Respostas que não precisam de banco: pergunta bloqueada e saudação"""
+    if json_data.get("answer_blocked") is True:
+        return transcription_response(
+            json_data.get("gpt_answer"), status=200, with_results=True
+        )
+
+    if json_data.get("greeting") is True:
+        return transcription_response(
+            json_data.get("gpt_answer"),
+            json_data.get("prompt"),
+            status=200,
+            with_results=True,
+        )
+    return None
+
+
+def query_orchestrator() -> QueryOrchestrator:
+    return QueryOrchestrator(
+        spending_collection,
+        profile_config_collection,
+        g.logged_user.get("id"),
+    )
+
+
+def start_speculation() -> Optional[SpeculativeQuery]:
+    """Consulta antecipada para usar com parse_intent (None se desativada)"""
+    if not SPECULATIVE_QUERY_ENABLED:
+        return None
+    return SpeculativeQuery(lambda data: query_orchestrator().execute_queries(data))
+
+
+def fetch_query_results(
+    json_data: Dict[str, Any], speculation: Optional[SpeculativeQuery] = None
+) -> Dict[str, Any]:
+    """Etapa 2: executa as consultas no Mongo descritas pela intenção"""
+    if speculation is not None:
+        query_result = speculation.result_for(json_data)
+        if query_result is not None:
+            return query_result
+    with timed("mongo"):
+        return query_orchestrator().execute_queries(json_data)
+
+
+def start_chart(json_data: Dict[str, Any], query_result: Dict[str, Any], text: str):
+    # Quando o gráfico é provável, ele é montado em paralelo com o
+    # analisador da resposta
+    if json_data.get("chart_data") is not True:
+        return None
+    return submit_in_context(build_chart, query_result.get("spendings", []), text)
+
+
+def run_analyser(json_data: Dict[str, Any], query_result: Dict[str, Any], text: str):
+    """Etapa 3: gera a resposta em linguagem natural a partir dos resultados"""
+    # Totais, rankings e status são formatados localmente; o analisador fica
+    # para as perguntas abertas
+    with timed("analyser"):
+        local_answer = build_local_answer(json_data, query_result, text)
+        if local_answer is not None:
+            json_data.update(local_answer)
+        else:
+            try:
+                analyser_result = analyse_result(
+                    compact_query_result(query_result), text
+                )
+                json_data.update(loads_model_json(analyser_result))
+            except LLMUnavailableError:
+                json_data.update(build_degraded_answer(json_data, query_result, text))
+    json_data["consult_results"] = []
+
+
+def stream_analyser(json_data: Dict[str, Any], query_result: Dict[str, Any], text: str):
+    """Igual ao run_analyser, mas vai devolvendo o texto do gpt_answer conforme o modelo gera"""
+    local_answer = build_local_answer(json_data, query_result, text)
+    if local_answer is not None:
+        json_data.update(local_answer)
+        json_data["consult_results"] = []
+        yield local_answer["gpt_answer"]
+        return
+
+    streamer = JsonStringFieldStreamer("gpt_answer")
+    chunks = []
+    with timed("analyser"):
+        try:
+            for chunk in stream_analyse_result(
+                compact_query_result(query_result), text
+            ):
+                chunks.append(chunk)
+                delta = streamer.feed(chunk)
+                if delta:
+                    yield delta
+        except LLMUnavailableError:
+            # Só dá para trocar a resposta se nada foi enviado ainda
+            if chunks:
+                raise
+            degraded = build_degraded_answer(json_data, query_result, text)
+            json_data.update(degraded)
+            json_data["consult_results"] = []
+            yield degraded["gpt_answer"]
+            return
+
+    json_data.update(loads_model_json("".join(chunks)))
+    json_data["consult_results"] = []
+
+
+def finish_chart(
+    json_data: Dict[str, Any], query_result: Dict[str, Any], text: str, chart_future
+):
+    """Etapa 4: resolve o gráfico se o analisador manteve chart_data"""
+    if json_data.get("chart_data") is True:
+        if chart_future is not None:
+            json_data["chart_data"] = chart_future.result()
+        else:
+            json_data["chart_data"] = build_chart(
+                query_result.get("spendings", []), text
+            )
+    elif chart_future is not None:
+        # O analisador decidiu que não há gráfico: descarta o resultado
+        chart_future.cancel()
+
+    if json_data.get("config_field") != "monthly_limit":
+        json_data["consult_results"] = query_result.get("spendings", [])
+
+
+def run_consult(
+    json_data: Dict[str, Any],
+    text: str,
+    speculation: Optional[SpeculativeQuery] = None,
+):
+    query_result = fetch_query_results(json_data, speculation)
+    chart_future = start_chart(json_data, query_result, text)
+    run_analyser(json_data, query_result, text)
+    finish_chart(json_data, query_result, text, chart_future)
+
+
+def resolve_batch_projects(operations: List[Dict[str, Any]]):
+    """Busca cada projeto citado no lote uma única vez e preenche o projectId"""
+    projects = {}
+    for op in operations:
+        name = op.get("projectName")
+        if not name:
+            continue
+        if name.lower() not in projects:
+            projects[name.lower()] = profile_config_service.get_project_by_name(name)
+        project = projects[name.lower()]
+        if not project:
+            raise ValueError(
+                f"❌ Projeto '{name}' não encontrado. Por favor, crie o projeto primeiro ou verifique o nome."
+            )
+        op["projectId"] = project["projectId"]
+        op["projectName"] = project["projectName"]
+
+
+def run_batch_registration(json_data: Dict[str, Any]) -> Optional[Response]:
+    """Registra todas as operações de um comando em lote com um único insert_many"""
+    try:
+        operations = prepare_batch_operations(json_data)
+        resolve_batch_projects(operations)
+        documents = spending_service.insert_spendings(operations)
+    except ValueError as ve:
+        return transcription_response(str(ve), json_data.get("prompt"))
+
+    json_data["gpt_answer"] = build_batch_answer(operations)
+    json_data["consult_results"] = documents
+    return None
+
+
+def run_registration(json_data: Dict[str, Any]) -> Optional[Response]:
+    """Registra gasto, projeto ou conta fixa. Retorna uma resposta apenas em caso de erro"""
+    # Vários registros na mesma frase
+    if is_batch(json_data):
+        return run_batch_registration(json_data)
+
+    try:
+        # Verifica se é criação de projeto
+        if json_data.get("type") == "PROJECT_CREATION":
+            # Validações
+            required_fields = ["projectName", "targetValue"]
+            field_names_pt = {
+                "projectName": "nome do projeto",
+                "targetValue": "valor alvo",
+            }
+            missing = [field for field in required_fields if not json_data.get(field)]
+            if missing:
+                missing_pt = [field_names_pt.get(field, field) for field in missing]
+                return transcription_response(
+                    f"🏗️ **Para criar seu projeto, preciso de mais informações:**\n\n❓ **Faltam:** {', '.join(missing_pt)}\n\nExemplo: *\"Criar projeto reforma da casa com meta de 50 mil reais\"*",
+                    json_data.get("prompt"),
+                )
+
+            # Verifica se já existe um projeto com esse nome
+            existing_project = profile_config_service.get_project_by_name(
+                json_data["projectName"]
+            )
+            if existing_project:
+                return transcription_response(
+                    f"❌ **Projeto já existe!**\n\nJá existe um projeto chamado \"{json_data['projectName']}\". Escolha outro nome ou use o projeto existente.",
+                    json_data.get("prompt"),
+                )
+
+            # Cria o projeto
+            project = profile_config_service.create_project(
+                name=json_data["projectName"],
+                description="",
+                target_value=float(json_data["targetValue"]),
+            )
+
+            # Atualiza a resposta para confirmar a criação
+            description_text = (
+                f"📝 **Descrição:** {project['description']}\n"
+                if project.get("description")
+                else ""
+            )
+            json_data["gpt_answer"] = (
+                f"🏗️ **Projeto criado com sucesso!**\n\n"
+                f"✅ **Nome:** {project['projectName']}\n"
+                f"🎯 **Meta:** R$ {project['targetValue']:.2f}\n"
+                f"{description_text}"
+                f"Agora você pode vincular gastos a este projeto! 📊"
+            )
+
+            # Para projetos, adapta para o formato ConsultResult
+            project_result = {
+                "_id": project["projectId"],
+                "category": project["projectName"],
+                "description": "Novo projeto criado",
+                "date": json_data.get("date", ""),
+                "value": float(project["targetValue"]),
+                "type": "PROJECT_CREATION",
+            }
+            json_data["consult_results"] = [project_result]
+
+        # Verifica se é criação de conta fixa
+        elif json_data.get("type") == "FIXED_BILL":
+            # Validações
+            required_fields = ["name", "amount", "dueDay"]
+            # Mapeamento dos campos para nomes em português
+            field_names_pt = {
+                "name": "nome",
+                "amount": "valor",
+                "dueDay": "dia de vencimento",
+            }
+            missing = [field for field in required_fields if not json_data.get(field)]
+            if missing:
+                missing_pt = [field_names_pt.get(field, field) for field in missing]
+                return transcription_response(
+                    f"Faltam informações para criar a conta fixa: {', '.join(missing_pt)}",
+                    json_data.get("prompt"),
+                    status=200,
+                )
+
+            # Cria a conta fixa
+            bill = profile_config_service.create_fixed_bill(
+                name=json_data["name"],
+                amount=float(json_data["amount"]),
+                due_day=int(json_data["dueDay"]),
+                description=json_data.get("description", ""),
+                category=json_data.get("category", "OTHER"),
+                autopay=json_data.get("autopay", False),
+                reminder=json_data.get("reminder", True),
+            )
+
+            # Atualiza a resposta para confirmar a criação
+            json_data["gpt_answer"] = (
+                f"✅ **Conta fixa criada com sucesso!**\n\n📝 {bill['name']}\n💰 Valor: R$ {bill['amount']:.2f}\n📅 Vencimento: Todo dia {bill['dueDay']}\n\nA conta será lembrada todos os meses!"
+            )
+
+        # Se não for projeto nem conta fixa, é um gasto normal
+        else:
+            # Verifica se há menção a projeto
+            if json_data.get("projectName"):
+                project_name = json_data["projectName"]
+
+                # Busca o projeto pelo nome
+                project = profile_config_service.get_project_by_name(project_name)
+
+                if project:
+                    # Adiciona o projectId ao json_data
+                    json_data["projectId"] = project["projectId"]
+                    profile_config_service.update_project_spending(
+                        project["projectId"], json_data.get("value", 0)
+                    )
+
+                    # Atualiza a mensagem de resposta com o nome do projeto
+                    json_data["gpt_answer"] = (
+                        f"✅ **Gasto registrado no projeto '{project['projectName']}'!**\n\n💰 Valor: R$ {json_data.get('value', 0):.2f}\n📝 {json_data.get('description', '')}"
+                    )
+                else:
+                    # Se o projeto não existir, retorna erro
+                    return transcription_response(
+                        f"❌ Projeto '{project_name}' não encontrado. Por favor, crie o projeto primeiro ou verifique o nome.",
+                        json_data.get("prompt"),
+                    )
+
+            # Só insere gasto se não for criação de projeto
+            if json_data.get("type") != "PROJECT_CREATION":
+                added_document = spending_service.insert_spending(json_data)
+                json_data["consult_results"] = [added_document]
+
+    except ValueError as ve:
+        return transcription_response(str(ve), json_data.get("prompt"))
+
+    return None
+
+
+def final_response(json_data: Dict[str, Any]) -> Response:
+    return (
+        {
+            "transcription": {
+                "gpt_answer": json_data.get("gpt_answer"),
+                "description": json_data.get("prompt"),
+                "consult_results": convert_object_ids(json_data.get("consult_results")),
+                "chart_data": convert_object_ids(json_data.get("chart_data", False)),
+            }
+        },
+        200,
+    )
+
+
+def execute_command(transcribed_text: str, context: List[Dict[str, Any]]) -> Response:
+    """Executa o pipeline completo do /execute-query para um texto transcrito"""
+    if not transcribed_text:
+        return transcription_response(
+            "Texto não identificado no áudio", with_results=True
+        )
+
+    speculation = start_speculation()
+    try:
+        return _execute_intent(transcribed_text, context, speculation)
+    finally:
+        if speculation is not None:
+            # Intenção final não era consulta (ou deu erro): descarta a busca
+            speculation.discard()
+
+
+def _execute_intent(
+    transcribed_text: str,
+    context: List[Dict[str, Any]],
+    speculation: Optional[SpeculativeQuery],
+) -> Response:
+    try:
+        json_data = parse_intent(transcribed_text, context, speculation)
+    except LLMUnavailableError:
+        return llm_unavailable_response()
+    if not json_data:
+        return transcription_response(
+            "Erro ao processar a solicitação", with_results=True
+        )
+
+    try:
+        response = early_response(json_data)
+        if response is not None:
+            return response
+
+        if json_data.get("consult") is True:
+            try:
+                run_consult(json_data, transcribed_text, speculation)
+            except Exception as e:
+                return {"error": str(e)}, 400
+        else:
+            with timed("registration"):
+                response = run_registration(json_data)
+            if response is not None:
+                return response
+
+    except Exception as e:
+        print(str(e))
+        return transcription_response(
+            "Ocorreu um erro desconhecido", json_data.get("prompt")
+        )
+
+    return final_response(json_data)
+
+
+def _is_success(response: Response) -> bool:
+    return response[1] == 200
+
+
+# Cópias da mesma frase (retry do app, toque duplo) esperam a primeira
+execute_flight = SingleFlight(SINGLE_FLIGHT_LINGER_SECONDS, should_linger=_is_success)
+metrics.register_source("single_flight", execute_flight.stats)
+
+
+def execute_command_coalesced(
+    transcribed_text: str, context: List[Dict[str, Any]]
+) -> Response:
+    """
+    execute_command com coalescência por usuário + texto + contexto: chamadas
+    idênticas simultâneas fazem uma única chamada ao LLM e um único registro.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return execute_command(transcribed_text, context)
+    key = flight_key(g.logged_user.get("id"), transcribed_text, context)
+    return execute_flight.do(key, execute_command, transcribed_text, context)
@@ -0,0 +1,433 @@
+import re
+import threading
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+from dateutil.relativedelta import relativedelta
+from decouple import config
+from services.metrics import metrics
+from utils.format_utils import (
+    MONTH_NAMES_PT,
+    format_brl,
+    format_category,
+    format_date_pt,
+)
+
+FAST_PARSER_ENABLED = config("FAST_PARSER_ENABLED", default=True, cast=bool)
+FAST_PARSER_MIN_CONFIDENCE = config(
+    "FAST_PARSER_MIN_CONFIDENCE", default=0.8, cast=float
+)
+
+# Palavra-chave (sem acento) -> categoria usada pelo agent_consulting
+CATEGORY_KEYWORDS = {
+    "FOOD": [
+        "mercado",
+        "supermercado",
+        "comida",
+        "alimentacao",
+        "almoco",
+        "jantar",
+        "lanche",
+        "restaurante",
+        "ifood",
+        "padaria",
+        "cafe",
+        "pizza",
+        "hamburguer",
+        "acougue",
+        "feira",
+        "hortifruti",
+    ],
+    "FUEL": [
+        "gasolina",
+        "combustivel",
+        "posto",
+        "etanol",
+        "alcool",
+        "diesel",
+        "abastecer",
+        "abasteci",
+    ],
+    "LEISURE": [
+        "lazer",
+        "cinema",
+        "bar",
+        "balada",
+        "show",
+        "festa",
+        "cerveja",
+        "teatro",
+        "passeio",
+        "jogo",
+    ],
+    "PHARMACY": ["farmacia", "remedio", "remedios", "medicamento", "drogaria"],
+    "HOSPITAL": ["hospital", "medico", "exame", "exames", "dentista", "clinica"],
+    "TRAVEL": ["viagem", "passagem", "hotel", "pousada", "hospedagem", "aeroporto"],
+    "CLOTHING": [
+        "roupa",
+        "roupas",
+        "camisa",
+        "camiseta",
+        "calca",
+        "tenis",
+        "sapato",
+        "vestido",
+        "blusa",
+    ],
+    "PERSONAL_CARE": [
+        "cabelo",
+        "cabeleireiro",
+        "barbeiro",
+        "barbearia",
+        "manicure",
+        "salao",
+        "perfume",
+        "maquiagem",
+        "estetica",
+    ],
+}
+
+_KEYWORD_TO_CATEGORY = {
+    keyword: category
+    for category, keywords in CATEGORY_KEYWORDS.items()
+    for keyword in keywords
+}
+
+# Termos que o parser local não sabe tratar (contas fixas, projetos, parcelas...)
+_FALLBACK_TERMS = re.compile(
+    r"\b(projeto|parcela\w*|parcelad\w*|vezes|conta|contas|fixa|fixas|boleto|"
+    r"aluguel|luz|agua|gas|internet|telefone|celular|academia|escola|faculdade|"
+    r"curso|mensalidade|netflix|spotify|amazon|streaming|assinatura|seguro|"
+    r"plano|financiamento|prestacao|limite|estrategia|meta|orcamento|"
+    r"nao|cancela\w*|remove\w*|apaga\w*|exclui\w*|grafico|evolucao|historico)\b"
+)
+
+_SPENDING_VERBS = re.compile(r"\b(gastei|paguei|comprei|torrei)\b")
+_REVENUE_VERBS = re.compile(r"\b(recebi|ganhei)\b")
+_CONSULT_START = re.compile(
+    r"^(quanto|qual|quais)\b.*\b(gastei|gasto|gastos|recebi|ganhei|gastando)\b"
+)
+_VALUE = re.compile(
+    r"(?:r\$\s*)?(?<![\w.,])(\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)"
+    r"(\s*mil\b)?"
+    r"(?=\s*(?:reais|real|conto|contos|pila|r\$)?\b)"
+)
+_MONTH_NAMES = [
+    unicodedata.normalize("NFKD", m).encode("ascii", "ignore").decode()
+    for m in MONTH_NAMES_PT
+]
+_MONTH_PATTERN = re.compile(
+    r"\b(?:em|de|no mes de)\s+(" + "|".join(_MONTH_NAMES) + r")(?:\s+de\s+(\d{4}))?\b"
+)
+
+# Datas que o parser entende; qualquer outra referência de tempo vai para o LLM
+_KNOWN_TIME = re.compile(
+    r"\b(anteontem|ontem|hoje|mes passado|ultimo mes|"
+    r"(esse|este|neste|nesse|deste|desse) mes|no mes)\b"
+)
+_TIME_WORDS = re.compile(
+    r"\b(dia|dias|semana|semanas|ano|anos|mes|meses|amanha|segunda|terca|quarta|"
+    r"quinta|sexta|sabado|domingo|feriado|passad[oa]s?|retrasad[oa]s?|atras|"
+    r"proxim[oa]s?|anterior|" + "|".join(_MONTH_NAMES) + r")\b|\d{1,2}/\d{1,2}"
+)
+
+# Palavras de uma consulta que o parser entende; qualquer outra (pessoa, meio
+# de pagamento, estabelecimento...) seria um filtro ignorado
+_CONSULT_WORDS = re.compile(
+    r"\b(quanto|quanta|quantos|qual|quais|foi|foram|e|eu|ja|ate|agora|o|a|os|as|"
+    r"um|uma|meu|meus|minha|minhas|de|do|da|dos|das|em|no|na|nos|nas|com|para|pra|"
+    r"gastei|gasto|gastos|gastando|estou|to|recebi|ganhei|maior|menor|por|"
+    r"categoria|categorias|total|valor|tudo|todo|reais|dinheiro|\d{4})\b"
+)
+
+
+class ParseResult(NamedTuple):
+    intent: Optional[Dict[str, Any]]
+    confidence: float
+
+
+def _strip_accents(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _original_word(original: str, keyword: str) -> str:
+    """Recupera a palavra como foi dita (com acentos) a partir da forma normalizada"""
+    for word in re.findall(r"\w+", original):
+        if _strip_accents(word) == keyword:
+            return word.lower()
+    return keyword
+
+
+def _today() -> date:
+    return datetime.now(ZoneInfo("America/Sao_Paulo")).date()
+
+
+def _parse_value(match: re.Match) -> float:
+    raw, thousand = match.group(1), match.group(2)
+    if "," in raw:
+        raw = raw.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", raw):
+        raw = raw.replace(".", "")
+    value = float(raw)
+    return value * 1000 if thousand else value
+
+
+def _category_keywords(text: str):
+    return {
+        (_KEYWORD_TO_CATEGORY[word], word)
+        for word in re.findall(r"\w+", text)
+        if word in _KEYWORD_TO_CATEGORY
+    }
+
+
+def _find_category(text: str):
+    found = _category_keywords(text)
+    categories = {category for category, _ in found}
+    if len(categories) != 1:
+        return None, None
+    category = categories.pop()
+    keyword = sorted(word for cat, word in found if cat == category)[0]
+    return category, keyword
+
+
+def _find_day(text: str, today: date) -> Optional[str]:
+    if re.search(r"\banteontem\b", text):
+        return (today - timedelta(days=2)).isoformat()
+    if re.search(r"\bontem\b", text):
+        return (today - timedelta(days=1)).isoformat()
+    if re.search(r"\bhoje\b", text):
+        return today.isoformat()
+    match = re.search(r"\bdia (\d{1,2})\b", text)
+    if match:
+        return _day_of_month(today, match.group(1))
+    return None
+
+
+def _day_of_month(today: date, day: str) -> Optional[str]:
+    try:
+        return today.replace(day=int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def _has_unknown_time(text: str, today: date) -> bool:
+    """Sobrou alguma referência de tempo que _find_day/_find_month não tratam?"""
+    rest = _KNOWN_TIME.sub(" ", _MONTH_PATTERN.sub(" ", text))
+    # "dia 31" em um mês de 30 dias também não é entendido
+    rest = re.sub(
+        r"\bdia (\d{1,2})\b",
+        lambda m: " " if _day_of_month(today, m.group(1)) else m.group(0),
+        rest,
+    )
+    return bool(_TIME_WORDS.search(rest))
+
+
+def _has_unknown_words(text: str) -> bool:
+    """Sobrou alguma palavra da consulta além de data, categoria e conectivos?"""
+    rest = _KNOWN_TIME.sub(" ", _MONTH_PATTERN.sub(" ", text))
+    rest = re.sub(r"\bdia \d{1,2}\b|\bmes\b", " ", rest)
+    rest = _CONSULT_WORDS.sub(" ", rest)
+    words = [w for w in re.findall(r"\w+", rest) if w not in _KEYWORD_TO_CATEGORY]
+    return bool(words)
+
+
+def _find_month(text: str, today: date) -> Optional[str]:
+    # Mês pelo nome antes de "no mês", senão "no mês de maio" vira o mês atual
+    match = _MONTH_PATTERN.search(text)
+    if match:
+        month = _MONTH_NAMES.index(match.group(1)) + 1
+        year = int(match.group(2)) if match.group(2) else today.year
+        return f"{year:04d}-{month:02d}"
+    if re.search(r"\bmes passado\b|\bultimo mes\b", text):
+        return (today - relativedelta(months=1)).strftime("%Y-%m")
+    if re.search(r"\b(esse|este|neste|nesse|deste|desse) mes\b|\bno mes\b", text):
+        return today.strftime("%Y-%m")
+    return None
+
+
+def _parse_registration(text: str, original: str, today: date) -> ParseResult:
+    values = list(_VALUE.finditer(text))
+    # Mais de um valor (lote, parcelas, "dia 5"...) fica com o LLM
+    day_numbers = {m.group(1) for m in re.finditer(r"\bdia (\d{1,2})\b", text)}
+    values = [v for v in values if v.group(1) not in day_numbers]
+    if len(values) != 1:
+        return ParseResult(None, 0.0)
+
+    value = _parse_value(values[0])
+    if value <= 0:
+        return ParseResult(None, 0.0)
+
+    is_revenue = bool(_REVENUE_VERBS.search(text))
+    confidence = 1.0
+
+    category, keyword = _find_category(text)
+    if category is None:
+        if not is_revenue:
+            return ParseResult(None, 0.4)
+        category = "OTHER"
+
+    if _has_unknown_time(text, today):
+        return ParseResult(None, 0.5)
+
+    day = _find_day(text, today)
+    if day is None:
+        if _find_month(text, today) is not None:
+            return ParseResult(None, 0.5)
+        # Sem data explícita o agente assume hoje
+        day = today.isoformat()
+        confidence -= 0.1
+
+    if is_revenue:
+        description = f"Recebimento de {format_brl(value)}"
+        answer = (
+            f"💰 **Receita registrada!**\n\n"
+            f"💵 Valor: {format_brl(value)}\n"
+            f"📅 Data: {format_date_pt(day)}"
+        )
+    else:
+        description = f"Gasto com {_original_word(original, keyword)}"
+        answer = (
+            f"✅ **Gasto registrado!**\n\n"
+            f"💰 Valor: {format_brl(value)}\n"
+            f"🏷️ Categoria: {format_category(category)}\n"
+            f"📅 Data: {format_date_pt(day)}"
+        )
+
+    intent = {
+        "gpt_answer": answer,
+        "prompt": original,
+        "type": "REVENUE" if is_revenue else "SPENDING",
+        "description": description,
+        "value": value,
+        "category": category,
+        "total_value": value,
+        "date": day,
+        "consult": False,
+        "collections_needed": ["spendings"],
+    }
+    return ParseResult(intent, confidence)
+
+
+def _parse_consult(text: str, original: str, today: date) -> ParseResult:
+    if _VALUE.search(re.sub(r"\b(dia \d{1,2}|\d{4})\b", "", text)):
+        return ParseResult(None, 0.3)
+
+    is_revenue = bool(re.search(r"\b(recebi|ganhei)\b", text))
+    operation = "SUM"
+    if re.search(r"\bmaior\b", text):
+        operation = "MAX"
+    elif re.search(r"\bmenor\b", text):
+        operation = "MIN"
+    elif re.search(r"\bpor categoria\b", text):
+        operation = "CATEGORY"
+
+    period = _find_day(text, today) or _find_month(text, today)
+    if period is None or _has_unknown_time(text, today):
+        return ParseResult(None, 0.5)
+
+    # "de uber", "com o João", "no cartão": filtro que o parser não monta
+    if _has_unknown_words(text):
+        return ParseResult(None, 0.4)
+
+    category, keyword = _find_category(text)
+    if category is None and _category_keywords(text):
+        # Mais de uma categoria ("mercado e farmácia")
+        return ParseResult(None, 0.4)
+    if operation == "CATEGORY" and category is not None:
+        return ParseResult(None, 0.4)
+
+    intent = {
+        "gpt_answer": "📊 **Consultando seus registros...**",
+        "prompt": original,
+        "type": "REVENUE" if is_revenue else "SPENDING",
+        "description": original,
+        "operation": operation,
+        "date": period,
+        "consult": True,
+        "collections_needed": ["spendings"],
+    }
+    if category:
+        intent["category"] = category
+    if operation == "CATEGORY":
+        intent["chart_data"] = True
+    return ParseResult(intent, 1.0)
+
+
+def extract_entities(text: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """Período, categoria e valor mencionados em uma frase (sem montar a intenção)"""
+    today = today or _today()
+    normalized = re.sub(r"\s+", " ", _strip_accents(text)).strip(" .!?")
+
+    entities = {}
+    period = _find_day(normalized, today) or _find_month(normalized, today)
+    if period:
+        entities["date"] = period
+    category, _ = _find_category(normalized)
+    if category:
+        entities["category"] = category
+    match = _VALUE.search(re.sub(r"\b(dia \d{1,2}|\d{4})\b", "", normalized))
+    if match:
+        entities["value"] = _parse_value(match)
+    return entities
+
+
+def parse_utterance(text: str, today: Optional[date] = None) -> ParseResult:
+    """Interpreta frases simples de registro/consulta sem chamar o LLM"""
+    today = today or _today()
+    normalized = re.sub(r"\s+", " ", _strip_accents(text)).strip(" .!?")
+
+    # Referências ao contexto ("e ontem?") e termos especiais ficam com o LLM
+    if not normalized or normalized.startswith("e ") or "?" in normalized[:-1]:
+        return ParseResult(None, 0.0)
+    if _FALLBACK_TERMS.search(normalized):
+        return ParseResult(None, 0.0)
+
+    if _CONSULT_START.search(normalized):
+        return _parse_consult(normalized, text, today)
+    if _SPENDING_VERBS.search(normalized) or _REVENUE_VERBS.search(normalized):
+        return _parse_registration(normalized, text, today)
+    return ParseResult(None, 0.0)
+
+
+class FastParserStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.parsed = 0
+        self.parsed_by_kind = {"registration": 0, "consult": 0}
+
+    def record(self, intent: Optional[Dict[str, Any]]):
+        with self._lock:
+            self.attempts += 1
+            if intent is not None:
+                self.parsed += 1
+                kind = "consult" if intent.get("consult") else "registration"
+                self.parsed_by_kind[kind] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "parsed": self.parsed,
+                "llm_fallbacks": self.attempts - self.parsed,
+                "parsed_by_kind": dict(self.parsed_by_kind),
+                "coverage_rate": (
+                    self.parsed / self.attempts if self.attempts else 0.0
+                ),
+            }
+
+
+fast_parser_stats = FastParserStats()
+metrics.register_source("fast_parser", fast_parser_stats.snapshot)
+
+
+def try_fast_parse(text: str) -> Optional[Dict[str, Any]]:
+    """Retorna a intenção se o parser local tiver confiança suficiente"""
+    if not FAST_PARSER_ENABLED:
+        return None
+    result = parse_utterance(text)
+    intent = result.intent if result.confidence >= FAST_PARSER_MIN_CONFIDENCE else None
+    fast_parser_stats.record(intent)
+    return intent
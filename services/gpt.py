@@ -1,37 +1,271 @@
-from openai import OpenAI
-from decouple import config
+from services.intent_cache import intent_cache, build_intent_key, is_cacheable_intent
+from services.fast_parser import parse_utterance, try_fast_parse
+from services.llm_guard import (
+    LLM_DEADLINES,
+    LLMUnavailableError,
+    breaker_for,
+    call_llm_hedged,
+    call_llm_hedged_async,
+)
+from services.metrics import llm_call, metrics
 from datetime import datetime
-from utils.load_file import load_prompt
+from typing import Callable, Optional
+from utils.json_stream import JsonObjectStreamer, loads_model_json
+from utils.load_file import load_prompt, get_prompt_version
 from zoneinfo import ZoneInfo
+import asyncio
+import httpx
+import openai
+import json
+import threading
+import time
 
-API_KEY = config("API_KEY_OPENAI")
+AGENT_CONSULTING_PROMPT = "prompts/agent_consulting.txt"
 
+INTENT_MODEL_PARAMS = {
+    "model": "gpt-4o-mini",
+    "max_tokens": 512,  # Limitar tokens para acelerar resposta
+    "temperature": 0.2,  # Menor variação, respostas mais diretas
+    "top_p": 0.8,
+}
 
-def ask_gpt(prompt: str, context: str):
-    client = OpenAI(api_key=API_KEY)
 
-    agent_consulting = load_prompt("prompts/agent_consulting.txt")
+def _parse_intent(content: str):
+    try:
+        intent = loads_model_json(content)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return intent if isinstance(intent, dict) else None
 
-    today = datetime.now(ZoneInfo("America/Sao_Paulo"))
-    print(today)
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        max_tokens=512,  # Limitar tokens para acelerar resposta
-        temperature=0.2,  # Menor variação, respostas mais diretas
-        top_p=0.8,
-        messages=[
-            {"role": "system", "content": f"{agent_consulting}"},
-            {
-                "role": "system",
-                "content": f"Hoje é {today.date()}. Se o usuário disser 'ontem', use a data de hoje menos um dia.",
-            },
-            {
-                "role": "assistant",
-                "content": f"Mensagens anteriores de contexto: {context}",
-            },
-            {"role": "user", "content": prompt},
-        ],
+
+def _local_intent(prompt: str, context: str, today: datetime):
+    """Tenta responder sem o modelo. Retorna (conteúdo ou None, chave do cache)"""
+    # Frases simples são interpretadas localmente, sem chamar o modelo
+    fast_intent = try_fast_parse(prompt)
+    if fast_intent is not None:
+        return json.dumps(fast_intent, ensure_ascii=False), None
+
+    # Consultas e saudações repetidas são respondidas pelo cache de intenções
+    cache_key = build_intent_key(
+        prompt, context, today.date(), get_prompt_version(AGENT_CONSULTING_PROMPT)
     )
-    print(response.choices[0].message.content)
-    return response.choices[0].message.content
+    cached_intent = intent_cache.get(cache_key)
+    if cached_intent is not None:
+        if "prompt" in cached_intent:
+            cached_intent["prompt"] = prompt
+        return json.dumps(cached_intent, ensure_ascii=False), cache_key
+
+    return None, cache_key
+
+
+def _build_messages(prompt: str, context: str, today: datetime):
+    agent_consulting = load_prompt(AGENT_CONSULTING_PROMPT)
+
+    return [
+        {"role": "system", "content": f"{agent_consulting}"},
+        {
+            "role": "system",
+            "content": f"Hoje é {today.date()}. Se o usuário disser 'ontem', use a data de hoje menos um dia.",
+        },
+        {
+            "role": "assistant",
+            "content": f"Mensagens anteriores de contexto: {context}",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _degraded_intent(prompt: str):
+    """
+    Modelo indisponível: usa o parser local mesmo abaixo da confiança mínima.
+    Retorna None se a frase não for reconhecida.
+    """
+    intent = parse_utterance(prompt).intent
+    if intent is None:
+        return None
+    metrics.inc("llm_degraded_total", stage="intent")
+    return json.dumps(intent, ensure_ascii=False)
+
+
+def _remember(cache_key: str, content: str):
+    intent = _parse_intent(content)
+    if intent is not None and is_cacheable_intent(intent):
+        intent_cache.set(cache_key, intent)
+
+
+def _stream_failure(error: Exception) -> LLMUnavailableError:
+    # Conexão caiu ou travou no meio do stream
+    model = INTENT_MODEL_PARAMS["model"]
+    breaker_for(model).record_failure()
+    return LLMUnavailableError(f"{model} indisponível: {error}")
+
+
+def _stream_intent(messages, on_partial: Callable[[JsonObjectStreamer], None]):
+    """
+    Pede a intenção em streaming e chama on_partial(streamer) a cada pedaço,
+    para que o chamador possa agir sobre os campos que já estão completos.
+    """
+    streamer = JsonObjectStreamer()
+    chunks = []
+    # O prazo da intenção vale até o fim do stream, não só até ele abrir
+    expires = time.monotonic() + LLM_DEADLINES["intent"]
+    with llm_call("intent", INTENT_MODEL_PARAMS["model"]) as call:
+        stream = call_llm_hedged(
+            "intent",
+            INTENT_MODEL_PARAMS["model"],
+            lambda client: client.chat.completions.create(
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **INTENT_MODEL_PARAMS,
+            ),
+            discard=lambda losing_stream: losing_stream.close(),
+        )
+        timed_out = threading.Event()
+
+        def expire():
+            # Fechar a resposta interrompe a leitura bloqueada no socket
+            timed_out.set()
+            stream.close()
+
+        timer = threading.Timer(max(expires - time.monotonic(), 0.0), expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    call.record_usage(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+                    if not streamer.done:
+                        streamer.feed(chunks[-1])
+                        on_partial(streamer)
+        except Exception as e:
+            if timed_out.is_set() or isinstance(e, (httpx.HTTPError, openai.APIError)):
+                raise _stream_failure(e) from e
+            raise
+        finally:
+            timer.cancel()
+            stream.close()
+        if timed_out.is_set() and not streamer.done:
+            raise _stream_failure(TimeoutError("prazo da intenção esgotado"))
+    return "".join(chunks)
+
+
+def ask_gpt(
+    prompt: str,
+    context: str,
+    on_partial: Optional[Callable[[JsonObjectStreamer], None]] = None,
+):
+    """
+    Interpreta a frase do usuário. Com on_partial, a resposta do modelo é lida
+    em streaming e os campos de primeiro nível são repassados conforme chegam.
+    """
+    today = datetime.now(ZoneInfo("America/Sao_Paulo"))
+
+    content, cache_key = _local_intent(prompt, context, today)
+    if content is not None:
+        return content
+
+    messages = _build_messages(prompt, context, today)
+    try:
+        if on_partial is not None:
+            content = _stream_intent(messages, on_partial)
+        else:
+            with llm_call("intent", INTENT_MODEL_PARAMS["model"]) as call:
+                response = call_llm_hedged(
+                    "intent",
+                    INTENT_MODEL_PARAMS["model"],
+                    lambda client: client.chat.completions.create(
+                        messages=messages, **INTENT_MODEL_PARAMS
+                    ),
+                )
+                call.record_usage(response)
+            content = response.choices[0].message.content
+    except LLMUnavailableError:
+        content = _degraded_intent(prompt)
+        if content is None:
+            raise
+        return content
+
+    _remember(cache_key, content)
+    return content
+
+
+async def _stream_intent_async(
+    messages, on_partial: Callable[[JsonObjectStreamer], None]
+):
+    """Versão assíncrona do _stream_intent"""
+    streamer = JsonObjectStreamer()
+    chunks = []
+    expires = time.monotonic() + LLM_DEADLINES["intent"]
+    with llm_call("intent", INTENT_MODEL_PARAMS["model"]) as call:
+        stream = await call_llm_hedged_async(
+            "intent",
+            INTENT_MODEL_PARAMS["model"],
+            lambda client: client.chat.completions.create(
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **INTENT_MODEL_PARAMS,
+            ),
+            discard=lambda losing_stream: losing_stream.close(),
+        )
+        chunk_iter = stream.__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        chunk_iter.__anext__(), max(expires - time.monotonic(), 0.0)
+                    )
+                except StopAsyncIteration:
+                    break
+                if chunk.usage:
+                    call.record_usage(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+                    if not streamer.done:
+                        streamer.feed(chunks[-1])
+                        on_partial(streamer)
+        except (httpx.HTTPError, openai.APIError, asyncio.TimeoutError) as e:
+            raise _stream_failure(e) from e
+        finally:
+            await stream.close()
+    return "".join(chunks)
+
+
+async def ask_gpt_async(
+    prompt: str,
+    context: str,
+    on_partial: Optional[Callable[[JsonObjectStreamer], None]] = None,
+):
+    """Versão assíncrona do ask_gpt, usada pelo servidor ASGI (api_async.py)"""
+    today = datetime.now(ZoneInfo("America/Sao_Paulo"))
+
+    content, cache_key = _local_intent(prompt, context, today)
+    if content is not None:
+        return content
+
+    messages = _build_messages(prompt, context, today)
+    try:
+        if on_partial is not None:
+            content = await _stream_intent_async(messages, on_partial)
+        else:
+            with llm_call("intent", INTENT_MODEL_PARAMS["model"]) as call:
+                response = await call_llm_hedged_async(
+                    "intent",
+                    INTENT_MODEL_PARAMS["model"],
+                    lambda client: client.chat.completions.create(
+                        messages=messages, **INTENT_MODEL_PARAMS
+                    ),
+                )
+                call.record_usage(response)
+            content = response.choices[0].message.content
+    except LLMUnavailableError:
+        content = _degraded_intent(prompt)
+        if content is None:
+            raise
+        return content
+
+    _remember(cache_key, content)
+    return content
@@ -1,15 +1,20 @@
-from openai import OpenAI
-from decouple import config
+import httpx
+import openai
+from services.llm_guard import (
+    LLMUnavailableError,
+    breaker_for,
+    call_llm,
+    call_llm_async,
+)
+from services.metrics import llm_call
 from utils.load_file import load_prompt
 from typing import List, Dict, Any, Optional
 import json
 from utils.convert_utils import convert_object_ids
+from utils.token_budget import to_compact_json
 
-API_KEY = config("API_KEY_OPENAI")
 
-
-def analyse_result(results: Dict[str, Any], prompt: str):
-    client = OpenAI(api_key=API_KEY)
+def _build_messages(results: Dict[str, Any], prompt: str) -> List[Dict[str, str]]:
     agent_analyser = load_prompt("prompts/agent_analyser.txt")
 
     # Limpeza de ObjectIds
@@ -24,10 +29,70 @@ def analyse_result(results: Dict[str, Any], prompt: str):
 
     for key, value in results_clean.items():
         messages.append(
-            {"role": "assistant", "content": f"Dados da coleção '{key}': {value}"}
+            {
+                "role": "assistant",
+                "content": f"Dados da coleção '{key}': {to_compact_json(value)}",
+            }
         )
+    return messages
+
+
+def analyse_result(results: Dict[str, Any], prompt: str):
+    messages = _build_messages(results, prompt)
 
-    response = client.chat.completions.create(model="o4-mini", messages=messages)
+    with llm_call("analyser", "o4-mini") as call:
+        response = call_llm(
+            "analyser",
+            "o4-mini",
+            lambda client: client.chat.completions.create(
+                model="o4-mini", messages=messages
+            ),
+        )
+        call.record_usage(response)
 
-    print(response.choices[0].message.content)
     return response.choices[0].message.content
+
+
+async def analyse_result_async(results: Dict[str, Any], prompt: str):
+    messages = _build_messages(results, prompt)
+
+    with llm_call("analyser", "o4-mini") as call:
+        response = await call_llm_async(
+            "analyser",
+            "o4-mini",
+            lambda client: client.chat.completions.create(
+                model="o4-mini", messages=messages
+            ),
+        )
+        call.record_usage(response)
+    return response.choices[0].message.content
+
+
+def stream_analyse_result(results: Dict[str, Any], prompt: str):
+    """Mesma análise do analyse_result, mas devolvendo os pedaços do texto à medida que chegam"""
+    messages = _build_messages(results, prompt)
+
+    with llm_call("analyser", "o4-mini") as call:
+        stream = call_llm(
+            "analyser",
+            "o4-mini",
+            lambda client: client.chat.completions.create(
+                model="o4-mini",
+                messages=messages,
+                stream=True,
+                # O último chunk traz o usage da chamada
+                stream_options={"include_usage": True},
+            ),
+        )
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    call.record_usage(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except (httpx.HTTPError, openai.APIError) as e:
+            # Conexão caiu ou travou no meio do stream
+            breaker_for("o4-mini").record_failure()
+            raise LLMUnavailableError(f"o4-mini indisponível: {e}") from e
+        finally:
+            stream.close()
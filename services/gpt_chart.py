@@ -1,30 +1,84 @@
-from openai import OpenAI
-from decouple import config
+from services.chart_builder import try_build_chart
+from services.llm_guard import LLMUnavailableError, call_llm, call_llm_async
+from services.metrics import llm_call, timed
 from utils.convert_utils import convert_object_ids
+from utils.json_stream import loads_model_json
 from utils.load_file import load_prompt
+from utils.token_budget import to_compact_json
 from typing import List, Dict, Any
-import json
 
-API_KEY = config("API_KEY_OPENAI")
+
+def _build_messages(results: List[Dict[str, Any]], prompt: str):
+    chart_prompt = load_prompt("prompts/agent_chart-analyser.txt")
+
+    results_clean = convert_object_ids(results)
+
+    return [
+        {"role": "system", "content": chart_prompt},
+        {"role": "system", "content": f"A solicitação do usuário é: {prompt}"},
+        {"role": "user", "content": to_compact_json(results_clean)},
+    ]
 
 
 def analyse_chart_intent(results: List[Dict[str, Any]], prompt: str):
-    client = OpenAI(api_key=API_KEY)
+    messages = _build_messages(results, prompt)
 
-    chart_prompt = load_prompt("prompts/agent_chart-analyser.txt")
+    with llm_call("chart", "gpt-4o-mini") as call:
+        response = call_llm(
+            "chart",
+            "gpt-4o-mini",
+            lambda client: client.chat.completions.create(
+                model="gpt-4o-mini",
+                max_tokens=512,  # Limitar tokens para acelerar resposta
+                temperature=0.2,  # Menor variação, respostas mais diretas
+                top_p=0.8,
+                messages=messages,
+            ),
+        )
+        call.record_usage(response)
+    return response.choices[0].message.content
 
-    results_clean = convert_object_ids(results)
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        max_tokens=512,  # Limitar tokens para acelerar resposta
-        temperature=0.2,  # Menor variação, respostas mais diretas
-        top_p=0.8,
-        messages=[
-            {"role": "system", "content": chart_prompt},
-            {"role": "system", "content": f"A solicitação do usuário é: {prompt}"},
-            {"role": "user", "content": json.dumps(results_clean, indent=2)},
-        ],
-    )
-    print(response.choices[0].message.content)
+async def analyse_chart_intent_async(results: List[Dict[str, Any]], prompt: str):
+    messages = _build_messages(results, prompt)
+
+    with llm_call("chart", "gpt-4o-mini") as call:
+        response = await call_llm_async(
+            "chart",
+            "gpt-4o-mini",
+            lambda client: client.chat.completions.create(
+                model="gpt-4o-mini",
+                max_tokens=512,
+                temperature=0.2,
+                top_p=0.8,
+                messages=messages,
+            ),
+        )
+        call.record_usage(response)
     return response.choices[0].message.content
+
+
+def build_chart(results: List[Dict[str, Any]], prompt: str) -> Dict[str, Any]:
+    """Retorna o chart_data: montado localmente quando possível, senão pelo modelo"""
+    with timed("chart"):
+        chart = try_build_chart(results)
+        if chart is not None:
+            return chart
+        try:
+            return loads_model_json(analyse_chart_intent(results, prompt))
+        except LLMUnavailableError:
+            # Sem o modelo a resposta segue sem gráfico
+            return False
+
+
+async def build_chart_async(
+    results: List[Dict[str, Any]], prompt: str
+) -> Dict[str, Any]:
+    with timed("chart"):
+        chart = try_build_chart(results)
+        if chart is not None:
+            return chart
+        try:
+            return loads_model_json(await analyse_chart_intent_async(results, prompt))
+        except LLMUnavailableError:
+            return False
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Optional
+from decouple import config
+from services.metrics import metrics
+
+INTENT_CACHE_MAX_ENTRIES = config("INTENT_CACHE_MAX_ENTRIES", default=1024, cast=int)
+INTENT_CACHE_TTL_SECONDS = config("INTENT_CACHE_TTL_SECONDS", default=600, cast=int)
+
+
+def normalize_text(text: str) -> str:
+    """Remove acentos, pontuação, caixa e espaços repetidos do texto falado"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s,]", " ", text.lower())
+    text = re.sub(r"\s*,\s*", ", ", text)
+    return re.sub(r"\s+", " ", text).strip(" ,")
+
+
+def context_fingerprint(context: str) -> str:
+    return hashlib.sha256((context or "").encode("utf-8")).hexdigest()[:16]
+
+
+def build_intent_key(
+    text: str, context: str, today: date, prompt_version: str = ""
+) -> str:
+    return "|".join(
+        [
+            normalize_text(text),
+            today.isoformat(),
+            context_fingerprint(context),
+            prompt_version,
+        ]
+    )
+
+
+def is_cacheable_intent(intent: Dict[str, Any]) -> bool:
+    """Só consultas e saudações podem ser reaproveitadas, nunca registros"""
+    if intent.get("greeting") is True:
+        return True
+    return intent.get("consult") is True
+
+
+class IntentCache:
+    """Cache LRU com TTL para o JSON de intenção retornado pelo ask_gpt"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, intent = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Cópia para que quem chama possa alterar o dict livremente
+            return json.loads(intent)
+
+    def set(self, key: str, intent: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        serialized = json.dumps(intent, ensure_ascii=False)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, serialized)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+intent_cache = IntentCache(INTENT_CACHE_MAX_ENTRIES, INTENT_CACHE_TTL_SECONDS)
+metrics.register_source("intent_cache", intent_cache.stats)
@@ -0,0 +1,15 @@
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from decouple import config
+
+# Pool limitado para disparar chamadas ao LLM em paralelo dentro de uma requisição
+LLM_EXECUTOR_WORKERS = config("LLM_EXECUTOR_WORKERS", default=8, cast=int)
+
+llm_executor = ThreadPoolExecutor(
+    max_workers=LLM_EXECUTOR_WORKERS, thread_name_prefix="llm"
+)
+
+
+def submit_in_context(fn, *args) -> Future:
+    """Submete ao pool levando o contexto atual (métricas da requisição)"""
+    return llm_executor.submit(contextvars.copy_context().run, fn, *args)
@@ -0,0 +1,406 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict
+import httpx
+import openai
+from decouple import config
+from services.metrics import metrics, note_llm_attempt
+from services.openai_client import (
+    CONNECT_TIMEOUT,
+    MAX_RETRIES,
+    get_async_openai_client,
+    get_openai_client,
+)
+
+# Prazo total (segundos) de cada chamada ao modelo, incluindo retries
+LLM_DEADLINES = {
+    "intent": config("LLM_DEADLINE_INTENT", default=10.0, cast=float),
+    "analyser": config("LLM_DEADLINE_ANALYSER", default=30.0, cast=float),
+    "chart": config("LLM_DEADLINE_CHART", default=12.0, cast=float),
+    "profile_analyser": config("LLM_DEADLINE_PROFILE", default=15.0, cast=float),
+    "transcription": config("LLM_DEADLINE_TRANSCRIPTION", default=30.0, cast=float),
+}
+LLM_DEFAULT_DEADLINE = config("LLM_DEFAULT_DEADLINE", default=20.0, cast=float)
+# Não começa um retry com menos tempo que isso até o prazo
+LLM_MIN_ATTEMPT_SECONDS = config("LLM_MIN_ATTEMPT_SECONDS", default=1.0, cast=float)
+
+# Circuit breaker por modelo: abre depois de N falhas seguidas e deixa uma
+# chamada de teste passar depois do intervalo
+BREAKER_FAILURE_THRESHOLD = config("LLM_BREAKER_FAILURES", default=5, cast=int)
+BREAKER_RESET_SECONDS = config("LLM_BREAKER_RESET_SECONDS", default=30.0, cast=float)
+
+# Segunda chamada de intenção disparada quando a primeira demora
+LLM_HEDGE_ENABLED = config("LLM_HEDGE_ENABLED", default=True, cast=bool)
+LLM_HEDGE_DELAY_SECONDS = config("LLM_HEDGE_DELAY_SECONDS", default=2.5, cast=float)
+LLM_HEDGE_MAX_IN_FLIGHT = config("LLM_HEDGE_MAX_IN_FLIGHT", default=8, cast=int)
+LLM_HEDGE_WORKERS = config("LLM_HEDGE_WORKERS", default=64, cast=int)
+
+# Segundos sugeridos no Retry-After quando o modelo está indisponível
+LLM_RETRY_AFTER_SECONDS = config("LLM_RETRY_AFTER_SECONDS", default=10, cast=int)
+
+# Erros que indicam problema no provedor (contam para o circuit breaker)
+_PROVIDER_FAILURES = (
+    openai.APIConnectionError,  # inclui APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TimeoutException,
+    httpx.NetworkError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """O modelo não respondeu dentro do prazo ou o circuito está aberto"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if (
+                self.state == "open"
+                and time.monotonic() - self.opened_at >= self.reset_seconds
+            ):
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                # Apenas uma chamada de teste por vez
+                self._probe_in_flight = True
+                return True
+            self.rejected_total += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Tentativa sem veredito sobre o provedor (cancelada, erro local)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened_total += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "open": 0 if self.state == "closed" else 1,
+                "consecutive_failures": self.failures,
+                "opened_total": self.opened_total,
+                "rejected_total": self.rejected_total,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(
+                model,
+                CircuitBreaker(model, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS),
+            )
+    return breaker
+
+
+class HedgeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.started = 0
+        self.won = 0
+        self.skipped = 0
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= LLM_HEDGE_MAX_IN_FLIGHT:
+                self.skipped += 1
+                return False
+            self.in_flight += 1
+            self.started += 1
+            return True
+
+    def release(self, *_):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_win(self):
+        with self._lock:
+            self.won += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "hedges_in_flight": self.in_flight,
+                "hedges_started": self.started,
+                "hedges_won": self.won,
+                "hedges_skipped": self.skipped,
+            }
+
+
+hedge_stats = HedgeStats()
+
+
+def guard_stats() -> dict:
+    stats = hedge_stats.snapshot()
+    for model, breaker in sorted(_breakers.items()):
+        prefix = model.replace("-", "_").replace(".", "_")
+        for key, value in breaker.snapshot().items():
+            stats[f"{prefix}_{key}"] = value
+    return stats
+
+
+metrics.register_source("llm_guard", guard_stats)
+
+
+def _attempt_timeout(remaining: float) -> httpx.Timeout:
+    return httpx.Timeout(remaining, connect=min(CONNECT_TIMEOUT, remaining))
+
+
+def _next_attempt(attempt: int, expires: float, model: str, error: Exception) -> float:
+    """Espera antes do próximo retry, ou lança LLMUnavailableError se não houver tempo"""
+    backoff = min(0.5 * 2 ** (attempt - 1), 4.0)
+    remaining = expires - time.monotonic()
+    if attempt > MAX_RETRIES or remaining - backoff < LLM_MIN_ATTEMPT_SECONDS:
+        metrics.inc("llm_unavailable_total", model=model)
+        raise LLMUnavailableError(f"{model} indisponível: {error}") from error
+    return backoff
+
+
+def call_llm(
+    stage: str,
+    model: str,
+    request: Callable[[openai.OpenAI], Any],
+    deadline: float = None,
+):
+    """
+    Executa request(client) com prazo total e circuit breaker do modelo.
+
+    Os retries são feitos aqui (o SDK fica com max_retries=0) para que a soma
+    das tentativas respeite o prazo da etapa.
+    """
+    breaker = breaker_for(model)
+    expires = time.monotonic() + (
+        deadline or LLM_DEADLINES.get(stage, LLM_DEFAULT_DEADLINE)
+    )
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            metrics.inc("llm_circuit_rejected_total", model=model)
+            raise CircuitOpenError(f"{model}: circuito aberto")
+        if attempt:
+            note_llm_attempt(attempt)
+        client = get_openai_client().with_options(
+            timeout=_attempt_timeout(expires - time.monotonic()), max_retries=0
+        )
+        try:
+            result = request(client)
+        except _PROVIDER_FAILURES as e:
+            breaker.record_failure()
+            attempt += 1
+            time.sleep(_next_attempt(attempt, expires, model, e))
+            continue
+        except openai.APIStatusError:
+            # O provedor respondeu (erro da requisição, não do serviço)
+            breaker.record_success()
+            raise
+        except BaseException:
+            # Erro do nosso lado: libera a chamada de teste do half_open
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def call_llm_async(
+    stage: str,
+    model: str,
+    request: Callable[[openai.AsyncOpenAI], Awaitable[Any]],
+    deadline: float = None,
+):
+    """Versão assíncrona do call_llm"""
+    breaker = breaker_for(model)
+    expires = time.monotonic() + (
+        deadline or LLM_DEADLINES.get(stage, LLM_DEFAULT_DEADLINE)
+    )
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            metrics.inc("llm_circuit_rejected_total", model=model)
+            raise CircuitOpenError(f"{model}: circuito aberto")
+        if attempt:
+            note_llm_attempt(attempt)
+        client = get_async_openai_client().with_options(
+            timeout=_attempt_timeout(expires - time.monotonic()), max_retries=0
+        )
+        try:
+            result = await request(client)
+        except _PROVIDER_FAILURES as e:
+            breaker.record_failure()
+            attempt += 1
+            await asyncio.sleep(_next_attempt(attempt, expires, model, e))
+            continue
+        except openai.APIStatusError:
+            breaker.record_success()
+            raise
+        except BaseException:
+            # Inclui o cancelamento (hedge perdedor, cliente desconectado)
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        return result
+
+
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="llm-hedge"
+)
+
+
+def _start_primary(fn: Callable, *args) -> Future:
+    # Thread própria por chamada: o _hedge_executor só recebe os hedges, então
+    # não limita a concorrência do processo
+    future: Future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(fn, *args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="llm-primary", daemon=True).start()
+    return future
+
+
+def call_llm_hedged(
+    stage: str,
+    model: str,
+    request: Callable[[openai.OpenAI], Any],
+    discard: Callable[[Any], Any] = None,
+):
+    """
+    call_llm com hedge: se a resposta não chegar em LLM_HEDGE_DELAY_SECONDS,
+    dispara uma segunda chamada igual no _hedge_executor e usa a primeira que
+    terminar bem.
+
+    Chamadas síncronas não podem ser canceladas: a perdedora continua até o
+    fim e, se der certo, discard recebe o resultado dela (ex: fechar um
+    stream que não será lido).
+    """
+    if not LLM_HEDGE_ENABLED:
+        return call_llm(stage, model, request)
+
+    deadline = LLM_DEADLINES.get(stage, LLM_DEFAULT_DEADLINE)
+    hedge_deadline = deadline - LLM_HEDGE_DELAY_SECONDS
+    if hedge_deadline < LLM_MIN_ATTEMPT_SECONDS:
+        return call_llm(stage, model, request, deadline)
+
+    primary = _start_primary(call_llm, stage, model, request, deadline)
+    done, _ = wait({primary}, timeout=LLM_HEDGE_DELAY_SECONDS)
+    if done or not hedge_stats.acquire():
+        return primary.result()
+
+    hedge = _hedge_executor.submit(
+        contextvars.copy_context().run, call_llm, stage, model, request, hedge_deadline
+    )
+    hedge.add_done_callback(hedge_stats.release)
+
+    pending = {primary, hedge}
+    winner = error = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                winner = future
+                break
+            error = future.exception()
+    if winner is None:
+        raise error
+
+    if winner is hedge:
+        hedge_stats.record_win()
+    loser = hedge if winner is primary else primary
+    if discard is not None:
+        loser.add_done_callback(lambda f: f.exception() is None and discard(f.result()))
+    return winner.result()
+
+
+async def call_llm_hedged_async(
+    stage: str,
+    model: str,
+    request: Callable[[openai.AsyncOpenAI], Awaitable[Any]],
+    discard: Callable[[Any], Awaitable[Any]] = None,
+):
+    """Versão assíncrona do call_llm_hedged; a chamada perdedora é cancelada"""
+    if not LLM_HEDGE_ENABLED:
+        return await call_llm_async(stage, model, request)
+
+    deadline = LLM_DEADLINES.get(stage, LLM_DEFAULT_DEADLINE)
+    primary = asyncio.ensure_future(call_llm_async(stage, model, request, deadline))
+    done, _ = await asyncio.wait({primary}, timeout=LLM_HEDGE_DELAY_SECONDS)
+    hedge_deadline = deadline - LLM_HEDGE_DELAY_SECONDS
+    if done or hedge_deadline < LLM_MIN_ATTEMPT_SECONDS or not hedge_stats.acquire():
+        return await primary
+
+    hedge = asyncio.ensure_future(call_llm_async(stage, model, request, hedge_deadline))
+    winner = None
+    try:
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        hedge_stats.record_win()
+                    winner = task
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in (primary, hedge):
+            if not task.done():
+                task.cancel()
+            elif (
+                discard is not None
+                and not task.cancelled()
+                and task.exception() is None
+                and task is not winner
+            ):
+                await discard(task.result())
+        hedge_stats.release()
@@ -0,0 +1,391 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional
+from decouple import config
+from services.metrics import metrics
+from services.intent_cache import normalize_text
+from utils.date_utils import month_sort_key
+from utils.format_utils import format_brl, format_category, format_date_pt
+
+LOCAL_ANSWER_ENABLED = config("LOCAL_ANSWER_ENABLED", default=True, cast=bool)
+# Quantidade máxima de itens listados na resposta
+LOCAL_ANSWER_MAX_ITEMS = config("LOCAL_ANSWER_MAX_ITEMS", default=10, cast=int)
+
+# Perguntas que pedem opinião, explicação ou conselho continuam com o analisador
+_OPEN_ENDED_TERMS = re.compile(
+    r"\b(dica|dicas|conselho|sugest\w*|sugir\w*|recomend\w*|como posso|como faco|"
+    r"devo|deveria|vale a pena|por que|porque|analis\w*|avali\w*|economiz\w*|"
+    r"reduzir|melhorar|planej\w*|estrategia|previs\w*|tendencia|explique|explica)\b"
+)
+
+
+def _is_open_ended(text: str) -> bool:
+    return bool(_OPEN_ENDED_TERMS.search(normalize_text(text or "")))
+
+
+def _period(json_data: Dict[str, Any]) -> str:
+    date_val = json_data.get("date")
+    return f" em {format_date_pt(date_val)}" if date_val else ""
+
+
+def _subject(json_data: Dict[str, Any]) -> str:
+    category = json_data.get("category")
+    return f" com {format_category(category)}" if category else ""
+
+
+def _is_revenue(json_data: Dict[str, Any]) -> bool:
+    return json_data.get("type") == "REVENUE"
+
+
+def _percent(part: float, total: float) -> str:
+    if not total:
+        return "0%"
+    return f"{round(part / total * 100)}%"
+
+
+def _empty_answer(json_data: Dict[str, Any]) -> str:
+    what = "receitas" if _is_revenue(json_data) else "gastos"
+    return (
+        f"🔎 **Nenhum registro encontrado**\n\n"
+        f"Não encontrei {what}{_subject(json_data)}{_period(json_data)}."
+    )
+
+
+def _more_items(count: int) -> str:
+    hidden = count - LOCAL_ANSWER_MAX_ITEMS
+    return (
+        f"\n… e mais {hidden} {'item' if hidden == 1 else 'itens'}"
+        if hidden > 0
+        else ""
+    )
+
+
+def _spending_line(spending: Dict[str, Any]) -> str:
+    details = format_category(spending.get("category"))
+    if spending.get("date"):
+        details += f", {format_date_pt(spending['date'])}"
+    return (
+        f"• {spending.get('description', '')}: "
+        f"{format_brl(spending.get('value'))} ({details})"
+    )
+
+
+def _answer_sum(json_data: Dict[str, Any], spendings: List[Dict[str, Any]]) -> str:
+    total = sum(float(s.get("value") or 0) for s in spendings)
+    if _is_revenue(json_data):
+        title = "💵 **Suas receitas**"
+        body = f"Você recebeu {format_brl(total)}{_period(json_data)}"
+    else:
+        title = "💰 **Total dos seus gastos**"
+        body = (
+            f"Você gastou {format_brl(total)}{_subject(json_data)}{_period(json_data)}"
+        )
+
+    count = len(spendings)
+    answer = (
+        f"{title}\n\n{body} em {count} {'registro' if count == 1 else 'registros'}."
+    )
+
+    # Sem categoria na pergunta: mostra como o total se divide
+    if not json_data.get("category") and not _is_revenue(json_data) and count > 1:
+        by_category: Dict[str, float] = {}
+        for s in spendings:
+            key = s.get("category") or "OTHER"
+            by_category[key] = by_category.get(key, 0) + float(s.get("value") or 0)
+        ranked = sorted(by_category.items(), key=lambda item: item[1], reverse=True)
+        lines = [
+            f"• {format_category(category)}: {format_brl(value)} ({_percent(value, total)})"
+            for category, value in ranked[:LOCAL_ANSWER_MAX_ITEMS]
+        ]
+        answer += "\n\n" + "\n".join(lines)
+    return answer
+
+
+def _answer_extreme(json_data: Dict[str, Any], spendings: List[Dict[str, Any]]) -> str:
+    biggest = json_data.get("operation") == "MAX"
+    title = "🔝 **Seu maior gasto**" if biggest else "🔻 **Seu menor gasto**"
+    return (
+        f"{title}{_subject(json_data)}{_period(json_data)}\n\n"
+        f"{_spending_line(spendings[0])}"
+    )
+
+
+def _answer_category(json_data: Dict[str, Any], groups: List[Dict[str, Any]]) -> str:
+    total = sum(float(g.get("value") or 0) for g in groups)
+    lines = [
+        f"• {format_category(g.get('label'))}: {format_brl(g.get('value'))} "
+        f"({_percent(float(g.get('value') or 0), total)})"
+        for g in groups[:LOCAL_ANSWER_MAX_ITEMS]
+    ]
+    return (
+        f"📊 **Seus gastos por categoria{_period(json_data)}**\n\n"
+        f"Total: {format_brl(total)}\n\n" + "\n".join(lines)
+    )
+
+
+def _month_label(month: str) -> str:
+    # O pipeline de COMPARATIVE devolve "MM/YYYY"
+    try:
+        mm, yyyy = month.split("/")
+        return format_date_pt(f"{yyyy}-{mm}")
+    except ValueError:
+        return month
+
+
+def _answer_comparative(json_data: Dict[str, Any], months: List[Dict[str, Any]]) -> str:
+    # O $sort do pipeline compara "MM/YYYY" como texto: "01/2025" < "12/2024"
+    months = sorted(months, key=lambda m: month_sort_key(m.get("month")))
+    lines = [
+        f"• {_month_label(m.get('month', ''))}: {format_brl(m.get('total'))}"
+        for m in months
+    ]
+    answer = "📈 **Evolução dos seus gastos**\n\n" + "\n".join(lines)
+
+    if len(months) > 1:
+        first = float(months[0].get("total") or 0)
+        last = float(months[-1].get("total") or 0)
+        diff = last - first
+        if diff > 0:
+            answer += (
+                f"\n\n🔺 Aumento de {format_brl(diff)} entre o primeiro e o último mês."
+            )
+        elif diff < 0:
+            answer += f"\n\n🔻 Redução de {format_brl(-diff)} entre o primeiro e o último mês."
+        else:
+            answer += "\n\n➖ Os gastos ficaram estáveis no período."
+
+        peak = max(months, key=lambda m: float(m.get("total") or 0))
+        answer += (
+            f"\n📌 Mês com mais gastos: {_month_label(peak.get('month', ''))} "
+            f"({format_brl(peak.get('total'))})"
+        )
+    return answer
+
+
+def _answer_installments(spendings: List[Dict[str, Any]]) -> Optional[str]:
+    lines = []
+    month_total = 0.0
+    remaining_total = 0.0
+    for index, s in enumerate(spendings):
+        try:
+            current, total = [int(p) for p in s.get("installment_info", "").split("/")]
+        except ValueError:
+            return None
+        value = float(s.get("value") or 0)
+        remaining = value * (total - current)
+        month_total += value
+        remaining_total += remaining
+        if index >= LOCAL_ANSWER_MAX_ITEMS:
+            continue
+        lines.append(
+            f"• **{s.get('description', '')}**\n"
+            f"  {format_category(s.get('category'))}\n"
+            f"  📱 Parcela: {current}/{total}\n"
+            f"  💵 Valor: {format_brl(value)}\n"
+            f"  🔄 Faltam: {format_brl(remaining)} ({total - current} parcelas)"
+        )
+
+    count = len(spendings)
+    return (
+        f"💳 **Suas parcelas em aberto**\n\n"
+        f"📋 Você tem {count} {'parcela' if count == 1 else 'parcelas'} para pagar:\n\n"
+        + "\n\n".join(lines)
+        + _more_items(len(spendings))
+        + f"\n\n💰 Total do mês: {format_brl(month_total)}"
+        + f"\n🧾 Restante das compras: {format_brl(remaining_total)}"
+    )
+
+
+def _answer_fixed_bills(summary: Dict[str, Any]) -> str:
+    bills = summary.get("bills", [])
+    month = format_date_pt(summary.get("month", ""))
+    status = summary.get("requestedStatus", "ALL")
+
+    if not bills:
+        what = {"PAID": "pagas", "PENDING": "pendentes"}.get(status, "cadastradas")
+        return f"🧾 **Contas fixas**\n\nVocê não tem contas fixas {what} em {month}."
+
+    lines = []
+    for bill in bills[:LOCAL_ANSWER_MAX_ITEMS]:
+        mark = "✅" if bill.get("paid") else "⏳"
+        line = f"• {mark} {bill.get('name', '')}: {format_brl(bill.get('amount'))}"
+        line += f" (vence dia {bill.get('dueDay')})" if bill.get("dueDay") else ""
+        lines.append(line)
+
+    return (
+        f"🧾 **Suas contas fixas de {month}**\n\n"
+        + "\n".join(lines)
+        + f"\n\n✅ Pago: {format_brl(summary.get('paidAmount'))}"
+        + f"\n⏳ Pendente: {format_brl(summary.get('pendingAmount'))}"
+        + f"\n💰 Total: {format_brl(summary.get('totalAmount'))}"
+    )
+
+
+def _answer_project(
+    project: Optional[Dict[str, Any]],
+    spendings: List[Dict[str, Any]],
+    json_data: Dict[str, Any],
+) -> str:
+    if not project:
+        return (
+            f"🔎 **Projeto não encontrado**\n\n"
+            f"Não encontrei o projeto \"{json_data.get('projectName', '')}\"."
+        )
+
+    registered = float(project.get("totalValueRegistered") or 0)
+    answer = (
+        f"🏗️ **Projeto {project.get('projectName', '')}**\n\n"
+        f"💰 Total registrado: {format_brl(registered)}"
+    )
+
+    target = project.get("targetValue")
+    if target:
+        target = float(target)
+        answer += (
+            f"\n🎯 Meta: {format_brl(target)} ({_percent(registered, target)} atingido)"
+        )
+        if registered > target:
+            answer += f"\n⚠️ Acima da meta em {format_brl(registered - target)}"
+        else:
+            answer += f"\n🔄 Faltam {format_brl(target - registered)}"
+
+    if spendings:
+        lines = [_spending_line(s) for s in spendings[:LOCAL_ANSWER_MAX_ITEMS]]
+        answer += "\n\n📋 Últimos gastos:\n" + "\n".join(lines)
+        answer += _more_items(len(spendings))
+    return answer
+
+
+def _answer_for(
+    json_data: Dict[str, Any], query_result: Dict[str, Any]
+) -> Optional[str]:
+    operation = json_data.get("operation")
+    config_field = json_data.get("config_field")
+    profile_config = query_result.get("profile_config") or {}
+    spendings = query_result.get("spendings")
+
+    if operation == "CONSULT_PROJECT" or config_field == "project_consulting":
+        return _answer_project(
+            profile_config.get("project"), spendings or [], json_data
+        )
+
+    if config_field == "fixed_bills":
+        summary = profile_config.get("fixed_bills_summary")
+        return _answer_fixed_bills(summary) if summary else None
+
+    # Limite mensal, estratégia e outras configurações ficam com o analisador
+    if "profile_config" in query_result or spendings is None:
+        return None
+
+    if not spendings:
+        return _empty_answer(json_data)
+
+    if json_data.get("consult_installment") is True:
+        return _answer_installments(spendings)
+    if operation == "CATEGORY":
+        return _answer_category(json_data, spendings)
+    if operation == "COMPARATIVE":
+        return _answer_comparative(json_data, spendings)
+    if operation in ("MAX", "MIN"):
+        return _answer_extreme(json_data, spendings)
+    if operation in (None, "SUM"):
+        return _answer_sum(json_data, spendings)
+    return None
+
+
+def _kind(json_data: Dict[str, Any]) -> str:
+    if json_data.get("config_field") in ("fixed_bills", "project_consulting"):
+        return json_data["config_field"]
+    if json_data.get("operation") == "CONSULT_PROJECT":
+        return "project_consulting"
+    if json_data.get("consult_installment") is True:
+        return "installments"
+    return (json_data.get("operation") or "SUM").lower()
+
+
+class LocalAnswerStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.answered = 0
+        self.answered_by_kind: Dict[str, int] = {}
+
+    def record(self, kind: Optional[str]):
+        with self._lock:
+            self.attempts += 1
+            if kind is not None:
+                self.answered += 1
+                self.answered_by_kind[kind] = self.answered_by_kind.get(kind, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "analyser_calls_avoided": self.answered,
+                "llm_fallbacks": self.attempts - self.answered,
+                "answered_by_kind": dict(self.answered_by_kind),
+                "avoided_rate": (
+                    self.answered / self.attempts if self.attempts else 0.0
+                ),
+            }
+
+
+local_answer_stats = LocalAnswerStats()
+metrics.register_source("local_answer", local_answer_stats.snapshot)
+
+
+def build_local_answer(
+    json_data: Dict[str, Any], query_result: Dict[str, Any], text: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Gera a resposta da consulta sem chamar o analisador (o4-mini).
+
+    Retorna o mesmo formato do analisador ({"gpt_answer", "description"}) ou
+    None quando a pergunta é aberta ou os dados não têm um formato conhecido.
+    """
+    if not LOCAL_ANSWER_ENABLED:
+        return None
+
+    answer = None
+    if not _is_open_ended(text):
+        try:
+            answer = _answer_for(json_data, query_result)
+        except (TypeError, ValueError, AttributeError, KeyError):
+            answer = None
+
+    local_answer_stats.record(_kind(json_data) if answer is not None else None)
+    if answer is None:
+        return None
+    return {"gpt_answer": answer, "description": text}
+
+
+def build_degraded_answer(
+    json_data: Dict[str, Any], query_result: Dict[str, Any], text: str
+) -> Dict[str, Any]:
+    """
+    Resposta usada quando o analisador está indisponível: a formatação local
+    vale também para perguntas abertas e, sem formato conhecido, vira um
+    resumo com quantidade e total dos registros.
+    """
+    try:
+        answer = _answer_for(json_data, query_result)
+    except (TypeError, ValueError, AttributeError, KeyError):
+        answer = None
+
+    if answer is None:
+        rows = [r for r in query_result.get("spendings") or [] if isinstance(r, dict)]
+        if rows:
+            total = sum(float(r.get("value", r.get("total", 0)) or 0) for r in rows)
+            answer = (
+                f"📊 Encontrei **{len(rows)}** registro(s){_period(json_data)}, "
+                f"somando **{format_brl(total)}**."
+            )
+        else:
+            answer = "📊 Não consegui analisar seus dados agora."
+
+    metrics.inc("llm_degraded_total", stage="analyser")
+    return {
+        "gpt_answer": answer
+        + "\n\n⚠️ _Resposta simplificada: o assistente está instável no momento._",
+        "description": text,
+    }
@@ -0,0 +1,283 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from decouple import config
+
+# Limites (ms) dos buckets dos histogramas de latência
+LATENCY_BUCKETS_MS = (
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    30000,
+)
+
+METRICS_PREFIX = "voicetask"
+
+# Se definido, o /metrics exige o header "Authorization: Bearer <token>"
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Etapas da requisição atual: lista de (etapa, duração em ms)
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "request_timings", default=None
+)
+# Chamada ao LLM em andamento no contexto atual (para contar retries)
+_current_llm_call: ContextVar[Optional["LLMCall"]] = ContextVar(
+    "current_llm_call", default=None
+)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, limit in enumerate(self.buckets):
+            if value <= limit:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 2),
+            "avg_ms": round(self.sum / self.count, 2) if self.count else 0.0,
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra) -> str:
+    items = [*labels, *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Metrics:
+    """Histogramas e contadores do processo (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    def observe(self, name: str, value_ms: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value_ms)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_source(self, name: str, snapshot: Callable[[], dict]):
+        """Registra os contadores de um serviço (cache, pool, parser) para exposição"""
+        self._sources[name] = snapshot
+
+    def _source_values(self) -> Dict[str, dict]:
+        values = {}
+        for name, snapshot in list(self._sources.items()):
+            try:
+                values[name] = snapshot()
+            except Exception as e:
+                values[name] = {"error": str(e)}
+        return values
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histograms = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                label_key = ",".join(f"{k}={v}" for k, v in labels)
+                histograms.setdefault(name, {})[label_key] = histogram.snapshot()
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                label_key = ",".join(f"{k}={v}" for k, v in labels)
+                counters.setdefault(name, {})[label_key] = value
+        return {
+            "histograms": histograms,
+            "counters": counters,
+            "services": self._source_values(),
+        }
+
+    def render_prometheus(self) -> str:
+        """Exporta as métricas no formato texto do Prometheus"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+            typed = set()
+            for (name, labels), histogram in histograms:
+                metric = f"{METRICS_PREFIX}_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for limit, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"{metric}_bucket{_labels(labels, le=limit)} {cumulative}"
+                    )
+                lines.append(
+                    f"{metric}_bucket{_labels(labels, le='+Inf')} {histogram.count}"
+                )
+                lines.append(f"{metric}_sum{_labels(labels)} {histogram.sum:.3f}")
+                lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+
+            for (name, labels), value in counters:
+                metric = f"{METRICS_PREFIX}_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{_labels(labels)} {value:g}")
+
+        # Contadores dos serviços viram gauges (apenas valores numéricos)
+        for source, values in sorted(self._source_values().items()):
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f"{METRICS_PREFIX}_{source}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def metrics_authorized(authorization: Optional[str]) -> bool:
+    """Confere o header Authorization do /metrics (servidores Flask e ASGI)"""
+    return not METRICS_TOKEN or authorization == f"Bearer {METRICS_TOKEN}"
+
+
+def start_request_timing() -> float:
+    """Inicia a coleta das etapas da requisição atual (para o Server-Timing)"""
+    _request_timings.set([])
+    return time.perf_counter()
+
+
+def finish_request_timing(started: float, endpoint: str) -> Optional[str]:
+    """Registra a duração total e devolve o valor do header Server-Timing"""
+    total_ms = (time.perf_counter() - started) * 1000
+    metrics.observe("request_duration_ms", total_ms, endpoint=endpoint)
+    header = server_timing_header(total_ms)
+    _request_timings.set(None)
+    return header
+
+
+def request_timings() -> List[Tuple[str, float]]:
+    return list(_request_timings.get() or [])
+
+
+def record_stage(stage: str, duration_ms: float):
+    metrics.observe("stage_duration_ms", duration_ms, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, duration_ms))
+
+
+def note_request_value(name: str, value_ms: float):
+    """Valor da requisição atual (não é uma etapa) exposto no Server-Timing"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, value_ms))
+
+
+@contextmanager
+def timed(stage: str):
+    """Mede uma etapa do pipeline (upload, convert, transcription, intent, mongo...)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, (time.perf_counter() - started) * 1000)
+
+
+def server_timing_header(total_ms: Optional[float] = None) -> Optional[str]:
+    """Monta o header Server-Timing com as etapas da requisição atual"""
+    parts = []
+    totals: Dict[str, float] = {}
+    for stage, duration in request_timings():
+        totals[stage] = totals.get(stage, 0) + duration
+    for stage, duration in totals.items():
+        parts.append(f"{stage};dur={duration:.1f}")
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts) or None
+
+
+class LLMCall:
+    def __init__(self, stage: str, model: str):
+        self.stage = stage
+        self.model = model
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def note_attempt(self, retry_count: int):
+        self.retries = max(self.retries, retry_count)
+
+    def record_usage(self, response: Any):
+        """Lê o usage da resposta (ou do último chunk, no caso de stream)"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", None) or getattr(
+            usage, "input_tokens", 0
+        )
+        self.completion_tokens += getattr(usage, "completion_tokens", None) or getattr(
+            usage, "output_tokens", 0
+        )
+
+
+@contextmanager
+def llm_call(stage: str, model: str):
+    """Registra duração, tokens e retries de uma chamada à OpenAI"""
+    call = LLMCall(stage, model)
+    token = _current_llm_call.set(call)
+    started = time.perf_counter()
+    error = False
+    try:
+        yield call
+    except Exception:
+        error = True
+        raise
+    finally:
+        _current_llm_call.reset(token)
+        duration = (time.perf_counter() - started) * 1000
+        labels = {"stage": stage, "model": model}
+        metrics.observe("llm_duration_ms", duration, **labels)
+        metrics.inc("llm_requests_total", **labels)
+        metrics.inc("llm_prompt_tokens_total", call.prompt_tokens, **labels)
+        metrics.inc("llm_completion_tokens_total", call.completion_tokens, **labels)
+        metrics.inc("llm_retries_total", call.retries, **labels)
+        if error:
+            metrics.inc("llm_errors_total", **labels)
+
+
+def note_llm_attempt(retry_count: int):
+    """Chamado pelo transporte HTTP a cada tentativa enviada à OpenAI"""
+    call = _current_llm_call.get()
+    if call is not None:
+        call.note_attempt(retry_count)
@@ -0,0 +1,288 @@
+import threading
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from decouple import config
+from services.metrics import metrics, note_llm_attempt
+
+API_KEY = config("API_KEY_OPENAI")
+# Permite apontar para um servidor compatível (ex: servidor falso dos benchmarks)
+BASE_URL = config("OPENAI_BASE_URL", default=None)
+
+# Pool de conexões compartilhado por todas as chamadas à OpenAI
+MAX_CONNECTIONS = config("OPENAI_MAX_CONNECTIONS", default=20, cast=int)
+MAX_KEEPALIVE_CONNECTIONS = config(
+    "OPENAI_MAX_KEEPALIVE_CONNECTIONS", default=10, cast=int
+)
+KEEPALIVE_EXPIRY = config("OPENAI_KEEPALIVE_EXPIRY", default=60.0, cast=float)
+# O servidor assíncrono mantém muito mais chamadas simultâneas por processo
+ASYNC_MAX_CONNECTIONS = config("OPENAI_ASYNC_MAX_CONNECTIONS", default=200, cast=int)
+ASYNC_MAX_KEEPALIVE_CONNECTIONS = config(
+    "OPENAI_ASYNC_MAX_KEEPALIVE_CONNECTIONS", default=50, cast=int
+)
+
+# Timeouts (segundos) e política de retry
+CONNECT_TIMEOUT = config("OPENAI_CONNECT_TIMEOUT", default=5.0, cast=float)
+READ_TIMEOUT = config("OPENAI_READ_TIMEOUT", default=60.0, cast=float)
+WRITE_TIMEOUT = config("OPENAI_WRITE_TIMEOUT", default=30.0, cast=float)
+POOL_TIMEOUT = config("OPENAI_POOL_TIMEOUT", default=10.0, cast=float)
+MAX_RETRIES = config("OPENAI_MAX_RETRIES", default=2, cast=int)
+
+
+class PoolStats:
+    """Contadores de uso do pool HTTP da OpenAI (thread-safe)"""
+
+    def __init__(self, max_connections: int):
+        self._lock = threading.Lock()
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.retries_total = 0
+        self.saturated_total = 0
+        self.pool_timeouts_total = 0
+        self.errors_total = 0
+
+    def request_started(self, retry_count: int = 0):
+        with self._lock:
+            # Requisição que chega com o pool cheio vai esperar por uma conexão
+            if self.in_flight >= self.max_connections:
+                self.saturated_total += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.requests_total += 1
+            if retry_count > 0:
+                self.retries_total += 1
+
+    def request_finished(self, pool_timeout: bool = False, error: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            if pool_timeout:
+                self.pool_timeouts_total += 1
+            if error:
+                self.errors_total += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_connections": self.max_connections,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "requests_total": self.requests_total,
+                "retries_total": self.retries_total,
+                "saturated_total": self.saturated_total,
+                "pool_timeouts_total": self.pool_timeouts_total,
+                "errors_total": self.errors_total,
+            }
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Libera o contador quando o corpo da resposta é fechado (conexão volta ao pool)"""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+def _retry_count(request: httpx.Request) -> int:
+    # O SDK da OpenAI informa a tentativa atual neste header
+    try:
+        return int(request.headers.get("x-stainless-retry-count", "0"))
+    except ValueError:
+        return 0
+
+
+class _InstrumentedTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport, stats: PoolStats):
+        self._transport = transport
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        retry_count = _retry_count(request)
+        note_llm_attempt(retry_count)
+        self._stats.request_started(retry_count)
+        try:
+            response = self._transport.handle_request(request)
+        except httpx.PoolTimeout:
+            self._stats.request_finished(pool_timeout=True)
+            raise
+        except Exception:
+            self._stats.request_finished(error=True)
+            raise
+
+        response.stream = _ReleasingStream(
+            response.stream, self._stats.request_finished
+        )
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class _AsyncInstrumentedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: PoolStats):
+        self._transport = transport
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        retry_count = _retry_count(request)
+        note_llm_attempt(retry_count)
+        self._stats.request_started(retry_count)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.PoolTimeout:
+            self._stats.request_finished(pool_timeout=True)
+            raise
+        except Exception:
+            self._stats.request_finished(error=True)
+            raise
+
+        response.stream = _AsyncReleasingStream(
+            response.stream, self._stats.request_finished
+        )
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+pool_stats = PoolStats(MAX_CONNECTIONS)
+async_pool_stats = PoolStats(ASYNC_MAX_CONNECTIONS)
+metrics.register_source("openai_pool", pool_stats.snapshot)
+metrics.register_source("openai_async_pool", async_pool_stats.snapshot)
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _limits(max_connections: int, max_keepalive_connections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=CONNECT_TIMEOUT,
+        read=READ_TIMEOUT,
+        write=WRITE_TIMEOUT,
+        pool=POOL_TIMEOUT,
+    )
+
+
+def _build_client() -> OpenAI:
+    transport = _InstrumentedTransport(
+        httpx.HTTPTransport(limits=_limits(MAX_CONNECTIONS, MAX_KEEPALIVE_CONNECTIONS)),
+        pool_stats,
+    )
+    http_client = httpx.Client(transport=transport, timeout=_timeout())
+
+    return OpenAI(
+        api_key=API_KEY,
+        base_url=BASE_URL,
+        http_client=http_client,
+        timeout=_timeout(),
+        max_retries=MAX_RETRIES,
+    )
+
+
+def _build_async_client() -> AsyncOpenAI:
+    transport = _AsyncInstrumentedTransport(
+        httpx.AsyncHTTPTransport(
+            limits=_limits(ASYNC_MAX_CONNECTIONS, ASYNC_MAX_KEEPALIVE_CONNECTIONS)
+        ),
+        async_pool_stats,
+    )
+    http_client = httpx.AsyncClient(transport=transport, timeout=_timeout())
+
+    return AsyncOpenAI(
+        api_key=API_KEY,
+        base_url=BASE_URL,
+        http_client=http_client,
+        timeout=_timeout(),
+        max_retries=MAX_RETRIES,
+    )
+
+
+def get_openai_client() -> OpenAI:
+    """Retorna o cliente OpenAI compartilhado pelo processo (criado sob demanda)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Retorna o cliente AsyncOpenAI compartilhado.
+
+    O pool do httpx fica preso ao event loop em que foi usado pela primeira vez,
+    então deve ser usado apenas pelo loop do servidor assíncrono (api_async.py).
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = _build_async_client()
+    return _async_client
+
+
+async def close_async_openai_client():
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+
+def close_openai_client():
+    """Fecha o cliente compartilhado e suas conexões"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_pool_stats() -> dict:
+    """Retorna os contadores de saturação do pool de conexões"""
+    return pool_stats.snapshot()
+
+
+def get_async_pool_stats() -> dict:
+    return async_pool_stats.snapshot()
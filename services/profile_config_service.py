@@ -9,6 +9,10 @@ from dto.project_dto import (
     create_expense_history_item,
     expense_history_item_to_dto,
 )
+from services.profile_prefetch import (
+    find_profile_config,
+    invalidate_profile_prefetch,
+)
 from dto.fixed_bills_dto import (
     create_fixed_bill_dict,
     fixed_bill_to_dto,
@@ -69,7 +73,7 @@ class ProfileConfigService:
             }
 
         # Para outros campos, retorna o documento completo
-        strategy_doc = self.collection.find_one({"userId": user_id})
+        strategy_doc = find_profile_config(self.collection, user_id)
         return {"config_field": config_field, "profile-config": strategy_doc}
 
     def create_default_profile_config(
@@ -86,6 +90,7 @@ class ProfileConfigService:
             """
             logged_user = g.logged_user
             user_id = logged_user.get("id")
+            invalidate_profile_prefetch()
 
             now = datetime.now(ZoneInfo("America/Sao_Paulo"))
 
@@ -117,6 +122,7 @@ class ProfileConfigService:
         """Cria um novo projeto para o usuário logado"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
 
         # Busca ou cria o profile config
         profile_config = self.collection.find_one({"userId": user_id})
@@ -156,7 +162,7 @@ class ProfileConfigService:
         logged_user = g.logged_user
         user_id = logged_user.get("id")
 
-        profile_config = self.collection.find_one({"userId": user_id})
+        profile_config = find_profile_config(self.collection, user_id)
         if not profile_config or not profile_config.get("projects"):
             return self.create_project(project_name)
 
@@ -180,6 +186,7 @@ class ProfileConfigService:
         """Atualiza o valor total gasto em um projeto e adiciona ao histórico"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
 
         now = datetime.now(ZoneInfo("America/Sao_Paulo"))
 
@@ -215,12 +222,33 @@ class ProfileConfigService:
 
         return result.modified_count > 0
 
+    def add_project_expenses(
+        self, project_id: str, expense_items: List[Dict[str, Any]]
+    ) -> bool:
+        """Soma vários gastos ao projeto em uma única atualização (comando em lote)"""
+        logged_user = g.logged_user
+        user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
+
+        now = datetime.now(ZoneInfo("America/Sao_Paulo"))
+        total = sum(item["value"] for item in expense_items)
+
+        result = self.collection.update_one(
+            {"userId": user_id, "projects.projectId": project_id},
+            {
+                "$inc": {"projects.$.totalValueRegistered": total},
+                "$push": {"projects.$.expenseHistory": {"$each": expense_items}},
+                "$set": {"projects.$.dateHourUpdated": now, "updatedAt": now},
+            },
+        )
+        return result.modified_count > 0
+
     def list_user_projects(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
         """Lista todos os projetos do usuário"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
 
-        profile_config = self.collection.find_one({"userId": user_id})
+        profile_config = find_profile_config(self.collection, user_id)
         if not profile_config:
             return []
 
@@ -236,6 +264,7 @@ class ProfileConfigService:
         """Remove um gasto específico do histórico do projeto"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
 
         # Primeiro, busca o projeto para encontrar o gasto
         profile_config = self.collection.find_one({"userId": user_id})
@@ -285,6 +314,7 @@ class ProfileConfigService:
         """Atualiza um gasto específico no histórico do projeto"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
 
         # Primeiro, busca o projeto para encontrar o gasto
         profile_config = self.collection.find_one({"userId": user_id})
@@ -356,6 +386,7 @@ class ProfileConfigService:
         """Cria uma nova conta fixa"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
 
         # Valida o dia de vencimento
         if not 1 <= due_day <= 31:
@@ -413,6 +444,7 @@ class ProfileConfigService:
         """Marca uma conta como paga para um mês específico"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
 
         # Busca a conta
         bill = self.get_fixed_bill_by_id(bill_id)
@@ -457,6 +489,7 @@ class ProfileConfigService:
         """Remove o pagamento de uma conta para um mês específico"""
         logged_user = g.logged_user
         user_id = logged_user.get("id")
+        invalidate_profile_prefetch()
 
         # Remove o registro de pagamento
         result = self.collection.update_one(
@@ -481,7 +514,7 @@ class ProfileConfigService:
         logged_user = g.logged_user
         user_id = logged_user.get("id")
 
-        profile_config = self.collection.find_one({"userId": user_id})
+        profile_config = find_profile_config(self.collection, user_id)
         if not profile_config:
             return []
 
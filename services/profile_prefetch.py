@@ -0,0 +1,110 @@
+import asyncio
+import copy
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Union
+from decouple import config
+from services.llm_executor import submit_in_context
+from services.metrics import metrics
+
+# Lê o profile_config do usuário enquanto o áudio é transcrito
+PROFILE_PREFETCH_ENABLED = config("PROFILE_PREFETCH_ENABLED", default=True, cast=bool)
+
+
+class _Prefetch:
+    # Objeto mutável: threads com cópia do contexto enxergam a invalidação
+    def __init__(self, user_id: str, future: Union[Future, asyncio.Future]):
+        self.user_id = user_id
+        self.future = future
+        self.stale = False
+
+
+_current_prefetch: ContextVar[Optional[_Prefetch]] = ContextVar(
+    "profile_prefetch", default=None
+)
+
+
+@contextmanager
+def profile_prefetch(collection, user_id: str):
+    """
+    Lê o profile_config em segundo plano durante o bloco. A leitura vale só
+    para a requisição atual: ao sair, o contexto volta ao estado anterior
+    (servidores que reaproveitam threads não herdam o documento).
+    """
+    if not PROFILE_PREFETCH_ENABLED or not user_id:
+        yield
+        return
+    future = submit_in_context(collection.find_one, {"userId": user_id})
+    token = _current_prefetch.set(_Prefetch(user_id, future))
+    try:
+        yield
+    finally:
+        _current_prefetch.reset(token)
+        future.cancel()
+
+
+@asynccontextmanager
+async def profile_prefetch_async(collection, user_id: str):
+    """Versão assíncrona do profile_prefetch (collection do pymongo async)"""
+    if not PROFILE_PREFETCH_ENABLED or not user_id:
+        yield
+        return
+    task = asyncio.ensure_future(collection.find_one({"userId": user_id}))
+    token = _current_prefetch.set(_Prefetch(user_id, task))
+    try:
+        yield
+    finally:
+        _current_prefetch.reset(token)
+        task.cancel()
+
+
+def _usable(user_id: str) -> Optional[_Prefetch]:
+    prefetch = _current_prefetch.get()
+    if prefetch is None or prefetch.stale or prefetch.user_id != user_id:
+        return None
+    return prefetch
+
+
+def _result(doc: Optional[Dict[str, Any]]):
+    metrics.inc("profile_prefetch_total", outcome="hit")
+    # Cópia: quem lê pode alterar o documento sem afetar as próximas leituras
+    return copy.deepcopy(doc)
+
+
+def find_profile_config(collection, user_id: str) -> Optional[Dict[str, Any]]:
+    """find_one({"userId": user_id}) que reaproveita a leitura antecipada"""
+    prefetch = _usable(user_id)
+    if prefetch is not None:
+        future = prefetch.future
+        if isinstance(future, asyncio.Future) and not future.done():
+            # Task do servidor assíncrono ainda rodando: não dá para esperar
+            # por ela desta thread
+            metrics.inc("profile_prefetch_total", outcome="pending")
+        else:
+            try:
+                return _result(future.result())
+            except Exception:
+                metrics.inc("profile_prefetch_total", outcome="error")
+    return collection.find_one({"userId": user_id})
+
+
+async def find_profile_config_async(collection, user_id: str):
+    """Versão assíncrona do find_profile_config"""
+    prefetch = _usable(user_id)
+    if prefetch is not None:
+        future = prefetch.future
+        if not isinstance(future, asyncio.Future):
+            future = asyncio.wrap_future(future)
+        try:
+            return _result(await asyncio.shield(future))
+        except Exception:
+            metrics.inc("profile_prefetch_total", outcome="error")
+    return await collection.find_one({"userId": user_id})
+
+
+def invalidate_profile_prefetch():
+    """Chamado antes de qualquer escrita no profile_config"""
+    prefetch = _current_prefetch.get()
+    if prefetch is not None:
+        prefetch.stale = True
@@ -0,0 +1,187 @@
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from decouple import config
+from utils.token_budget import estimate_tokens
+
+# Orçamento (tokens estimados) dos dados enviados ao analisador
+ANALYSER_TOKEN_BUDGET = config("ANALYSER_TOKEN_BUDGET", default=3000, cast=int)
+# Limite de linhas mesmo quando o orçamento permitiria mais
+ANALYSER_MAX_ROWS = config("ANALYSER_MAX_ROWS", default=200, cast=int)
+
+# Campos internos que não ajudam o modelo a responder
+_DROPPED_FIELDS = {
+    "_id",
+    "userId",
+    "parent_id",
+    "is_parent",
+    "projectId",
+    "billId",
+    "expenseId",
+    "createdAt",
+    "updatedAt",
+    "dateHourCreated",
+    "dateHourUpdated",
+}
+# Listas aninhadas que viram apenas contagem e total
+_HISTORY_FIELDS = {"expenseHistory", "paymentHistory"}
+# Ordem preferida das colunas na codificação colunar
+_COLUMN_ORDER = [
+    "date",
+    "month",
+    "description",
+    "label",
+    "category",
+    "type",
+    "value",
+    "total",
+    "installment_info",
+    "installments",
+]
+
+
+def _strip(value: Any) -> Any:
+    if isinstance(value, dict):
+        stripped = {}
+        for key, item in value.items():
+            if key in _DROPPED_FIELDS or isinstance(item, ObjectId):
+                continue
+            if key in _HISTORY_FIELDS and isinstance(item, list):
+                stripped[key] = {
+                    "count": len(item),
+                    "total": round(sum(float(i.get("value", 0) or 0) for i in item), 2),
+                }
+                continue
+            stripped[key] = _strip(item)
+        return stripped
+    if isinstance(value, list):
+        return [_strip(item) for item in value]
+    return value
+
+
+def _amount(row: Dict[str, Any]) -> float:
+    try:
+        return float(row.get("value", row.get("total", 0)) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _summary(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {"count": len(rows), "total": round(sum(_amount(r) for r in rows), 2)}
+
+    by_category: Dict[str, float] = {}
+    by_month: Dict[str, float] = {}
+    for row in rows:
+        if row.get("category"):
+            key = row["category"]
+            by_category[key] = by_category.get(key, 0) + _amount(row)
+        if isinstance(row.get("date"), str) and len(row["date"]) >= 7:
+            key = row["date"][:7]
+            by_month[key] = by_month.get(key, 0) + _amount(row)
+
+    if len(by_category) > 1:
+        summary["by_category"] = {
+            k: round(v, 2)
+            for k, v in sorted(by_category.items(), key=lambda i: (-i[1], i[0]))
+        }
+    if len(by_month) > 1:
+        summary["by_month"] = {k: round(v, 2) for k, v in sorted(by_month.items())}
+    return summary
+
+
+def _columns(rows: List[Dict[str, Any]]) -> List[str]:
+    keys = set()
+    for row in rows:
+        keys.update(row.keys())
+    ordered = [c for c in _COLUMN_ORDER if c in keys]
+    return ordered + sorted(keys - set(ordered))
+
+
+def _rank(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Ordem determinística: maior valor primeiro, depois data e descrição
+    return sorted(
+        rows,
+        key=lambda r: (
+            -_amount(r),
+            str(r.get("date", r.get("month", ""))),
+            str(r.get("description", r.get("label", ""))),
+        ),
+    )
+
+
+def compact_rows(
+    rows: List[Dict[str, Any]], token_budget: int = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Codifica uma lista de registros em formato colunar.
+
+    Colunas com o mesmo valor em todas as linhas vão para "common". Se as
+    linhas não couberem no orçamento, ficam as N de maior valor e o restante
+    vira um resumo em "rest".
+    """
+    if token_budget is None:
+        token_budget = ANALYSER_TOKEN_BUDGET
+    rows = [_strip(r) for r in rows if isinstance(r, dict)]
+    if not rows:
+        return None
+
+    compact: Dict[str, Any] = {"summary": _summary(rows)}
+
+    columns = _columns(rows)
+    # Agregações (CATEGORY, COMPARATIVE) mantêm a ordem do banco
+    is_aggregate = "description" not in columns and "date" not in columns
+    ordered = rows if is_aggregate else _rank(rows)
+
+    common = {}
+    if len(rows) > 1:
+        for column in list(columns):
+            values = {str(r.get(column)) for r in rows}
+            if len(values) == 1 and column not in ("value", "total"):
+                common[column] = rows[0].get(column)
+                columns.remove(column)
+    if common:
+        compact["common"] = common
+    compact["columns"] = columns
+
+    budget = token_budget - estimate_tokens(compact)
+    kept = []
+    for row in ordered[:ANALYSER_MAX_ROWS]:
+        encoded = [row.get(c) for c in columns]
+        cost = estimate_tokens(encoded) + 1
+        if cost > budget:
+            break
+        budget -= cost
+        kept.append(encoded)
+
+    compact["rows"] = kept
+    rest = ordered[len(kept) :]
+    if rest:
+        compact["rest"] = {
+            "count": len(rest),
+            "total": round(sum(_amount(r) for r in rest), 2),
+        }
+    return compact
+
+
+def compact_query_result(
+    query_result: Dict[str, Any], token_budget: int = None
+) -> Dict[str, Any]:
+    """
+    Reduz o resultado do QueryOrchestrator antes de enviá-lo ao analisador:
+    remove campos internos, pré-agrega por categoria/mês e limita as linhas
+    ao orçamento de tokens.
+    """
+    if token_budget is None:
+        token_budget = ANALYSER_TOKEN_BUDGET
+
+    compacted = {
+        key: _strip(value) for key, value in query_result.items() if key != "spendings"
+    }
+
+    spendings = query_result.get("spendings")
+    if isinstance(spendings, list):
+        # Os gastos ficam com o orçamento que sobra das demais coleções
+        budget = token_budget - estimate_tokens(compacted)
+        compacted["spendings"] = compact_rows(spendings, budget) or []
+    elif spendings is not None:
+        compacted["spendings"] = _strip(spendings)
+    return compacted
@@ -0,0 +1,183 @@
+import asyncio
+import copy
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from decouple import config
+from services.intent_cache import context_fingerprint, normalize_text
+from services.metrics import timed
+
+SINGLE_FLIGHT_ENABLED = config("SINGLE_FLIGHT_ENABLED", default=True, cast=bool)
+# Por quanto tempo uma resposta bem-sucedida ainda atende cópias atrasadas
+# (toque duplo no microfone, retry do app logo depois da resposta)
+SINGLE_FLIGHT_LINGER_SECONDS = config(
+    "SINGLE_FLIGHT_LINGER_SECONDS", default=2.0, cast=float
+)
+
+
+def flight_key(user_id: Any, text: Optional[str], context: Optional[List[Any]]) -> str:
+    """Chave da requisição: usuário + texto normalizado + hash do contexto"""
+    context_json = json.dumps(context or [], sort_keys=True, default=str)
+    return "|".join(
+        [str(user_id), normalize_text(text or ""), context_fingerprint(context_json)]
+    )
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error", "finished_at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.finished_at: Optional[float] = None
+
+
+class SingleFlight:
+    """
+    Coalescência de chamadas idênticas simultâneas (threads).
+
+    A primeira chamada de uma chave executa a função; as cópias que chegam
+    enquanto ela roda (ou logo depois, se o resultado for mantido) recebem
+    uma cópia do mesmo resultado ou a mesma exceção.
+    """
+
+    def __init__(
+        self,
+        linger_seconds: float = 0.0,
+        should_linger: Callable[[Any], bool] = None,
+    ):
+        self.linger_seconds = linger_seconds
+        self.should_linger = should_linger or (lambda result: True)
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.linger_hits = 0
+
+    def _purge(self, now: float):
+        expired = [
+            key
+            for key, flight in self._flights.items()
+            if flight.finished_at is not None
+            and now - flight.finished_at > self.linger_seconds
+        ]
+        for key in expired:
+            del self._flights[key]
+
+    def do(self, key: str, fn: Callable, *args):
+        with self._lock:
+            self._purge(time.monotonic())
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            elif flight.finished_at is not None:
+                self.linger_hits += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            with timed("coalesced"):
+                flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = fn(*args)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                keep = (
+                    flight.error is None
+                    and self.linger_seconds > 0
+                    and self.should_linger(flight.result)
+                )
+                if keep:
+                    flight.finished_at = time.monotonic()
+                elif self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.event.set()
+        return flight.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": sum(
+                    1 for f in self._flights.values() if f.finished_at is None
+                ),
+                "leaders": self.leaders,
+                "coalesced": self.followers,
+                "linger_hits": self.linger_hits,
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Versão asyncio do SingleFlight. O trabalho roda em uma task própria, então
+    o cancelamento da requisição líder (cliente desconectou) não derruba as
+    que estão esperando.
+    """
+
+    def __init__(
+        self,
+        linger_seconds: float = 0.0,
+        should_linger: Callable[[Any], bool] = None,
+    ):
+        self.linger_seconds = linger_seconds
+        self.should_linger = should_linger or (lambda result: True)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._finished_at: Dict[str, float] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.linger_hits = 0
+
+    def _purge(self, now: float):
+        for key, finished_at in list(self._finished_at.items()):
+            if now - finished_at > self.linger_seconds:
+                del self._finished_at[key]
+                self._tasks.pop(key, None)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._tasks.get(key) is not task:
+            return
+        if (
+            not task.cancelled()
+            and task.exception() is None
+            and self.linger_seconds > 0
+            and self.should_linger(task.result())
+        ):
+            self._finished_at[key] = time.monotonic()
+        else:
+            del self._tasks[key]
+
+    async def do(self, key: str, fn: Callable, *args):
+        self._purge(time.monotonic())
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.leaders += 1
+            return await asyncio.shield(task)
+
+        if key in self._finished_at:
+            self.linger_hits += 1
+        else:
+            self.followers += 1
+        with timed("coalesced"):
+            result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks) - len(self._finished_at),
+            "leaders": self.leaders,
+            "coalesced": self.followers,
+            "linger_hits": self.linger_hits,
+        }
@@ -0,0 +1,151 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Optional
+from decouple import config
+from services.llm_executor import submit_in_context
+from services.metrics import metrics, timed
+from utils.json_stream import JsonObjectStreamer
+
+SPECULATIVE_QUERY_ENABLED = config("SPECULATIVE_QUERY_ENABLED", default=True, cast=bool)
+
+# Campos da intenção que mudam as consultas do QueryOrchestrator
+QUERY_FIELDS = (
+    "consult",
+    "collections_needed",
+    "type",
+    "category",
+    "date",
+    "date_range",
+    "operation",
+    "projectName",
+    "projectId",
+    "consult_installment",
+    "config_field",
+    "bills_status",
+)
+
+
+def speculation_ready(streamer: JsonObjectStreamer) -> bool:
+    """
+    A consulta pode começar quando a intenção já é uma consulta, as coleções
+    estão definidas e o modelo passou para um campo que não muda a busca
+    (gpt_answer, prompt...).
+    """
+    fields = streamer.fields
+    return (
+        fields.get("consult") is True
+        and isinstance(fields.get("collections_needed"), list)
+        and streamer.current_key is not None
+        and streamer.current_key not in QUERY_FIELDS
+    )
+
+
+def query_snapshot(intent: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: copy.deepcopy(intent[key]) for key in QUERY_FIELDS if key in intent}
+
+
+class SpeculativeQuery:
+    """
+    Consulta ao Mongo disparada com a intenção ainda parcial, enquanto o modelo
+    termina de escrever o gpt_answer. O resultado só é usado se a intenção
+    final pedir exatamente a mesma busca; caso contrário é descartado e a
+    consulta normal é feita.
+    """
+
+    def __init__(self, fetch: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self._fetch = fetch
+        self._future = None
+        self._data: Optional[Dict[str, Any]] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._consumed = False
+
+    def observe(self, streamer: JsonObjectStreamer):
+        """Callback do ask_gpt: dispara a consulta na primeira vez que ela fica pronta"""
+        if self._future is not None or not speculation_ready(streamer):
+            return
+        self._snapshot = query_snapshot(streamer.fields)
+        self._data = copy.deepcopy(self._snapshot)
+        self._future = submit_in_context(self._run, self._data)
+        metrics.inc("speculative_query_total", outcome="started")
+
+    def _run(self, data: Dict[str, Any]):
+        with timed("mongo_speculative"):
+            return self._fetch(data)
+
+    def result_for(self, json_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Resultado antecipado para a intenção final, ou None se não servir"""
+        if self._future is None or self._consumed:
+            return None
+        if query_snapshot(json_data) != self._snapshot:
+            self.discard(outcome="miss")
+            return None
+
+        self._consumed = True
+        try:
+            with timed("mongo"):
+                result = self._future.result()
+        except Exception:
+            # A consulta normal repete a busca e trata o erro
+            metrics.inc("speculative_query_total", outcome="error")
+            return None
+        metrics.inc("speculative_query_total", outcome="hit")
+        # Mesmos ajustes que a consulta faz na intenção (ex: PROFILE_CONFIG -> SPENDING)
+        json_data.update(self._data)
+        return result
+
+    def discard(self, outcome: str = "wasted"):
+        """Abandona a consulta antecipada (intenção final diferente ou sem consulta)"""
+        if self._future is None or self._consumed:
+            return
+        self._consumed = True
+        self._future.cancel()
+        metrics.inc("speculative_query_total", outcome=outcome)
+
+
+class AsyncSpeculativeQuery:
+    """Versão asyncio do SpeculativeQuery"""
+
+    def __init__(self, fetch: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        self._fetch = fetch
+        self._task: Optional[asyncio.Task] = None
+        self._data: Optional[Dict[str, Any]] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._consumed = False
+
+    def observe(self, streamer: JsonObjectStreamer):
+        if self._task is not None or not speculation_ready(streamer):
+            return
+        self._snapshot = query_snapshot(streamer.fields)
+        self._data = copy.deepcopy(self._snapshot)
+        self._task = asyncio.ensure_future(self._run(self._data))
+        metrics.inc("speculative_query_total", outcome="started")
+
+    async def _run(self, data: Dict[str, Any]):
+        with timed("mongo_speculative"):
+            return await self._fetch(data)
+
+    async def result_for(self, json_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self._task is None or self._consumed:
+            return None
+        if query_snapshot(json_data) != self._snapshot:
+            self.discard(outcome="miss")
+            return None
+
+        self._consumed = True
+        try:
+            with timed("mongo"):
+                result = await self._task
+        except Exception:
+            metrics.inc("speculative_query_total", outcome="error")
+            return None
+        metrics.inc("speculative_query_total", outcome="hit")
+        json_data.update(self._data)
+        return result
+
+    def discard(self, outcome: str = "wasted"):
+        """Abandona a consulta antecipada (intenção final diferente ou sem consulta)"""
+        if self._task is None or self._consumed:
+            return
+        self._consumed = True
+        self._task.cancel()
+        metrics.inc("speculative_query_total", outcome=outcome)
@@ -4,7 +4,9 @@ from flask import g
 from utils.date_utils import get_date_range
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
+from typing import Dict, List
 from services.profile_config_service import ProfileConfigService
+from dto.project_dto import create_expense_history_item
 from db.mongo import profile_config_collection
 
 
@@ -17,19 +19,6 @@ class SpendingService:
         logged_user = g.logged_user
         user_id = logged_user.get("id")
 
-        required_fields = ["description", "value", "type", "category", "date"]
-        missing = [field for field in required_fields if not data.get(field)]
-
-        if missing:
-            raise ValueError(f"Missing fields: {', '.join(missing)}")
-
-        installments = int(data.get("installments", 1))
-
-        try:
-            base_date = datetime.strptime(data["date"], "%Y-%m-%d")
-        except ValueError:
-            raise ValueError("Date must be in 'YYYY-MM-DD' format")
-
         # Verifica se há projectId e atualiza o projeto
         project_id = data.get("projectId")
         if project_id:
@@ -38,99 +27,60 @@ class SpendingService:
             if not project:
                 raise ValueError(f"Project with id {project_id} not found")
 
+        docs = build_spending_docs(data, user_id, project_id)
+
         # 🔥 Compra à vista
-        if installments == None or installments == 1:
-            doc = {
-                "userId": user_id,
-                "description": data["description"],
-                "value": float(data["value"]),
-                "type": data["type"],
-                "category": data["category"],
-                "date": base_date.strftime("%Y-%m-%d"),
-            }
-
-            # Adiciona projectId se existir
-            if project_id:
-                doc["projectId"] = project_id
-
-            self.collection.insert_one(doc)
-
-            # Atualiza o valor total do projeto e adiciona ao histórico
-            if project_id:
-                self.profile_service.update_project_spending(
-                    project_id=project_id,
-                    value=float(data["value"]),
-                    spending_id=str(doc["_id"]),
-                    description=data["description"],
-                    category=data["category"],
-                    date=base_date.strftime("%Y-%m-%d"),
-                    installments=1,
-                    installment_info="1/1",
-                )
-            return doc
-        # 🔥 Compra parcelada
+        if len(docs) == 1:
+            self.collection.insert_one(docs[0])
+        # 🔥 Compra parcelada: documento principal e parcelas de uma vez
         else:
-            value_per_installment = float(data["value"]) / installments
-
-            # Documento principal
-            parent_doc = {
-                "userId": user_id,
-                "description": data["description"],
-                "value": round(value_per_installment, 2),
-                "type": data["type"],
-                "category": data["category"],
-                "date": base_date.strftime("%Y-%m-%d"),
-                "installments": installments,
-                "installment_info": f"1/{installments}",
-                "is_parent": True,
-            }
-
-            # Adiciona projectId se existir
-            if project_id:
-                parent_doc["projectId"] = project_id
-
-            parent_result = self.collection.insert_one(parent_doc)
-            parent_id = parent_result.inserted_id
-
-            # Documentos das parcelas
-            docs = []
-            for i in range(installments - 1):
-                installment_date = (base_date + relativedelta(months=i + 1)).strftime(
-                    "%Y-%m-%d"
-                )
-                doc = {
-                    "userId": user_id,
-                    "description": data["description"],
-                    "value": round(value_per_installment, 2),
-                    "type": data["type"],
-                    "category": data["category"],
-                    "date": installment_date,
-                    "installments": installments,
-                    "installment_info": f"{i + 2}/{installments}",
-                    "parent_id": parent_id,
-                }
+            self.collection.insert_many(docs)
 
-                # Adiciona projectId se existir
-                if project_id:
-                    doc["projectId"] = project_id
+        # Atualiza o valor total do projeto (valor total da compra) e adiciona ao histórico
+        if project_id:
+            item = project_expense_item(data, docs)
+            self.profile_service.update_project_spending(
+                project_id=project_id,
+                value=item["value"],
+                spending_id=item["spendingId"],
+                description=item["description"],
+                category=item["category"],
+                date=item["date"],
+                installments=item["installments"],
+                installment_info=item["installmentInfo"],
+            )
+        return registered_doc(docs)
 
-                docs.append(doc)
+    def insert_spendings(self, operations: List[dict]) -> List[dict]:
+        """
+        Registra vários gastos de uma vez (comando em lote).
 
-            self.collection.insert_many(docs)
+        Todos são validados antes de qualquer escrita; os documentos vão em um
+        único insert_many e cada projeto recebe uma única atualização. O
+        projectId de cada operação já deve ter sido resolvido por quem chama.
+        Retorna, para cada operação, o mesmo documento que o insert_spending.
+        """
+        logged_user = g.logged_user
+        user_id = logged_user.get("id")
 
-            # Atualiza o valor total do projeto (valor total da compra) e adiciona ao histórico
-            if project_id:
-                self.profile_service.update_project_spending(
-                    project_id=project_id,
-                    value=float(data["value"]),
-                    spending_id=str(parent_id),
-                    description=data["description"],
-                    category=data["category"],
-                    date=base_date.strftime("%Y-%m-%d"),
-                    installments=installments,
-                    installment_info=f"1/{installments}",
+        docs_per_operation = [
+            build_spending_docs(data, user_id, data.get("projectId"))
+            for data in operations
+        ]
+        self.collection.insert_many(
+            [doc for docs in docs_per_operation for doc in docs], ordered=True
+        )
+
+        expenses: Dict[str, List[dict]] = {}
+        for data, docs in zip(operations, docs_per_operation):
+            if data.get("projectId"):
+                expenses.setdefault(data["projectId"], []).append(
+                    project_expense_item(data, docs)
                 )
-            return docs[0]
+        for project_id, items in expenses.items():
+            self.profile_service.add_project_expenses(project_id, items)
+
+        return [registered_doc(docs) for docs in docs_per_operation]
 
     def remove_spending(self, spending_id: str):
         logged_user = g.logged_user
@@ -179,15 +129,9 @@ class SpendingService:
         logged_user = g.logged_user
         user_id = logged_user.get("id")
 
-        filters = {"userId": user_id}  # 🔥 Filtro por usuário
-
-        if data.get("type") == "PROFILE_CONFIG":
-            data["type"] = "SPENDING"
-
-        operation = data.get("operation")
-
         # 🆕 Consulta de projeto específico
-        if operation == "CONSULT_PROJECT":
+        project = None
+        if data.get("operation") == "CONSULT_PROJECT":
             project_name = data.get("projectName")
             if not project_name:
                 raise ValueError(
@@ -199,139 +143,255 @@ class SpendingService:
             if not project:
                 return []  # Retorna lista vazia se projeto não existir
 
-            # Adiciona o projectId ao filtro
-            filters["projectId"] = project["projectId"]
-            filters["type"] = "SPENDING"
-
-            # Aplica filtro de data se fornecido
-            if data.get("date"):
-                date_val = data["date"]
-                if len(date_val) == 7:  # yyyy-mm
-                    filters["date"] = get_date_range(date_val)
-                elif len(date_val) == 10:  # yyyy-mm-dd
-                    filters["date"] = date_val
-
-            # Busca todos os gastos do projeto
-            results = list(self.collection.find(filters).sort("date", DESCENDING))
-            for r in results:
-                r["_id"] = str(r["_id"])
-            return results
-
-        # Para outras operações, exclui gastos com projectId se não for especificado
-        if not data.get("projectId") and operation != "CONSULT_PROJECT":
-            filters["projectId"] = {"$exists": False}
-
-        # Filtros básicos
-        for k in ["type", "category", "projectId"]:
-            if data.get(k):
-                filters[k] = data[k]
-
-        # Filtro de data (intervalo para 'YYYY-MM' ou exato para 'YYYY-MM-DD')
+        query = build_consult_query(data, user_id, project)
+
+        if "pipeline" in query:
+            return list(self.collection.aggregate(query["pipeline"]))
+
+        cursor = self.collection.find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        if query.get("limit"):
+            cursor = cursor.limit(query["limit"])
+        return stringify_ids(list(cursor))
+
+
+def validate_spending_data(data: dict):
+    """Valida os campos obrigatórios de um gasto e retorna (parcelas, data base)"""
+    required_fields = ["description", "value", "type", "category", "date"]
+    missing = [field for field in required_fields if not data.get(field)]
+
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    installments = int(data.get("installments", 1))
+
+    try:
+        base_date = datetime.strptime(data["date"], "%Y-%m-%d")
+    except ValueError:
+        raise ValueError("Date must be in 'YYYY-MM-DD' format")
+
+    return installments, base_date
+
+
+def build_spending_docs(data: dict, user_id: str, project_id: str = None) -> List[dict]:
+    """
+    Monta os documentos de um gasto sem inserir. À vista é um documento só;
+    parcelado é o principal seguido das demais parcelas (com o _id do
+    principal já definido, para irem no mesmo insert_many).
+    """
+    installments, base_date = validate_spending_data(data)
+
+    base = {
+        "userId": user_id,
+        "description": data["description"],
+        "type": data["type"],
+        "category": data["category"],
+    }
+    if installments == None or installments == 1:
+        doc = dict(
+            base, value=float(data["value"]), date=base_date.strftime("%Y-%m-%d")
+        )
+        if project_id:
+            doc["projectId"] = project_id
+        return [doc]
+
+    value_per_installment = round(float(data["value"]) / installments, 2)
+    parent_id = ObjectId()
+    docs = [
+        dict(
+            base,
+            _id=parent_id,
+            value=value_per_installment,
+            date=base_date.strftime("%Y-%m-%d"),
+            installments=installments,
+            installment_info=f"1/{installments}",
+            is_parent=True,
+        )
+    ]
+    for i in range(installments - 1):
+        installment_date = (base_date + relativedelta(months=i + 1)).strftime(
+            "%Y-%m-%d"
+        )
+        docs.append(
+            dict(
+                base,
+                value=value_per_installment,
+                date=installment_date,
+                installments=installments,
+                installment_info=f"{i + 2}/{installments}",
+                parent_id=parent_id,
+            )
+        )
+    if project_id:
+        for doc in docs:
+            doc["projectId"] = project_id
+    return docs
+
+
+def registered_doc(docs: List[dict]) -> dict:
+    """Documento devolvido ao app: o gasto à vista ou, no parcelado, a 2ª parcela"""
+    return docs[0] if len(docs) == 1 else docs[1]
+
+
+def project_expense_item(data: dict, docs: List[dict]) -> dict:
+    """Item do histórico do projeto para um gasto já montado por build_spending_docs"""
+    installments = len(docs)
+    return create_expense_history_item(
+        spending_id=str(docs[0]["_id"]),
+        value=float(data["value"]),
+        description=data["description"],
+        category=data["category"],
+        date=docs[0]["date"],
+        installments=installments,
+        installment_info=f"1/{installments}",
+    )
+
+
+def stringify_ids(results: list) -> list:
+    for r in results:
+        r["_id"] = str(r["_id"])
+    return results
+
+
+def build_consult_query(data: dict, user_id: str, project: dict = None) -> dict:
+    """
+    Monta a consulta de gastos descrita pela intenção, sem executá-la.
+
+    Retorna {"pipeline": [...]} para agregações ou {"filter", "sort", "limit"}
+    para buscas simples. É compartilhada pelo SpendingService (síncrono) e pelo
+    pipeline assíncrono (services/async_pipeline.py).
+    """
+    filters = {"userId": user_id}  # 🔥 Filtro por usuário
+
+    if data.get("type") == "PROFILE_CONFIG":
+        data["type"] = "SPENDING"
+
+    operation = data.get("operation")
+
+    # 🆕 Consulta de projeto específico
+    if operation == "CONSULT_PROJECT":
+        # Adiciona o projectId ao filtro
+        filters["projectId"] = project["projectId"]
+        filters["type"] = "SPENDING"
+
+        # Aplica filtro de data se fornecido
         if data.get("date"):
             date_val = data["date"]
             if len(date_val) == 7:  # yyyy-mm
                 filters["date"] = get_date_range(date_val)
             elif len(date_val) == 10:  # yyyy-mm-dd
                 filters["date"] = date_val
-            else:
-                raise ValueError("Date must be 'YYYY-MM' or 'YYYY-MM-DD'")
-
-        # Se for consulta só de parcelas
-        if data.get("consult_installment") is True:
-            filters["installments"] = {"$gte": 1}
-
-            if data.get("date"):
-                date_val = data["date"]
-                if len(date_val) == 7:  # yyyy-mm
-                    filters["date"] = get_date_range(date_val)
-                elif len(date_val) == 10:  # yyyy-mm-dd
-                    filters["date"] = date_val
-                else:
-                    raise ValueError("Date must be 'YYYY-MM' or 'YYYY-MM-DD'")
 
+        # Busca todos os gastos do projeto
+        return {"filter": filters, "sort": [("date", DESCENDING)]}
+
+    # Para outras operações, exclui gastos com projectId se não for especificado
+    if not data.get("projectId") and operation != "CONSULT_PROJECT":
+        filters["projectId"] = {"$exists": False}
+
+    # Filtros básicos
+    for k in ["type", "category", "projectId"]:
+        if data.get(k):
+            filters[k] = data[k]
+
+    # Filtro de data (intervalo para 'YYYY-MM' ou exato para 'YYYY-MM-DD')
+    if data.get("date"):
+        date_val = data["date"]
+        if len(date_val) == 7:  # yyyy-mm
+            filters["date"] = get_date_range(date_val)
+        elif len(date_val) == 10:  # yyyy-mm-dd
+            filters["date"] = date_val
         else:
-            filters["$or"] = [{"installments": {"$exists": False}}, {"is_parent": True}]
+            raise ValueError("Date must be 'YYYY-MM' or 'YYYY-MM-DD'")
 
-        # 🆕 Agrupamento por categoria
-        if operation == "CATEGORY":
-            pipeline = [
-                {"$match": filters},
-                {
-                    "$group": {
-                        "_id": "$category",  # Agrupar por category
-                        "total": {"$sum": "$value"},
-                    }
-                },
-                {
-                    "$project": {
-                        "label": "$_id",  # Projetar category como label
-                        "value": "$total",  # Projetar total como value
-                        "_id": 0,
-                    }
-                },
-                {"$sort": {"value": -1}},  # Ordenar por value decrescente
-            ]
-            results = list(self.collection.aggregate(pipeline))
-            return results
-
-        # 🆕 Comparativo mensal
-        if operation == "COMPARATIVE":
-            raw_range = data.get("date_range", "")
-            try:
-                from_str, to_str = [s.strip() for s in raw_range.split("a")]
-                # Manter as datas como string para comparação
-                date_from = from_str  # "2028-01-01"
-                date_to = to_str  # "2028-12-31"
-            except Exception as e:
-                raise ValueError(f"Formato inválido de date_range: {raw_range}") from e
-
-            # Filtro de data para campos string (comparação lexicográfica funciona com YYYY-MM-DD)
-            filters["date"] = {"$gte": date_from, "$lte": date_to}
-
-            pipeline = [
-                {"$match": filters},
-                {
-                    "$group": {
-                        "_id": {
-                            # Extrair ano e mês da string "2028-02-05"
-                            "year": {"$substr": ["$date", 0, 4]},  # "2028"
-                            "month": {"$substr": ["$date", 5, 2]},  # "02"
-                        },
-                        "total": {"$sum": "$value"},
-                    }
-                },
-                {
-                    "$project": {
-                        "month": {
-                            "$concat": [
-                                "$_id.month",  # Já está formatado como "02"
-                                "/",
-                                "$_id.year",  # "2028"
-                            ]
-                        },
-                        "total": 1,
-                        "_id": 0,
-                    }
-                },
-                {"$sort": {"month": 1}},
-            ]
-
-            results = list(self.collection.aggregate(pipeline))
-            return results
-
-        # Ordenação simples
-        sort_order = None
-        if operation == "MAX":
-            sort_order = ("value", DESCENDING)
-        elif operation == "MIN":
-            sort_order = ("value", ASCENDING)
-
-        if sort_order:
-            results = list(self.collection.find(filters).sort([sort_order]).limit(1))
-        else:
-            results = list(self.collection.find(filters))
+    # Se for consulta só de parcelas
+    if data.get("consult_installment") is True:
+        filters["installments"] = {"$gte": 1}
 
-        for r in results:
-            r["_id"] = str(r["_id"])
+        if data.get("date"):
+            date_val = data["date"]
+            if len(date_val) == 7:  # yyyy-mm
+                filters["date"] = get_date_range(date_val)
+            elif len(date_val) == 10:  # yyyy-mm-dd
+                filters["date"] = date_val
+            else:
+                raise ValueError("Date must be 'YYYY-MM' or 'YYYY-MM-DD'")
 
-        return results
+    else:
+        filters["$or"] = [{"installments": {"$exists": False}}, {"is_parent": True}]
+
+    # 🆕 Agrupamento por categoria
+    if operation == "CATEGORY":
+        pipeline = [
+            {"$match": filters},
+            {
+                "$group": {
+                    "_id": "$category",  # Agrupar por category
+                    "total": {"$sum": "$value"},
+                }
+            },
+            {
+                "$project": {
+                    "label": "$_id",  # Projetar category como label
+                    "value": "$total",  # Projetar total como value
+                    "_id": 0,
+                }
+            },
+            {"$sort": {"value": -1}},  # Ordenar por value decrescente
+        ]
+        return {"pipeline": pipeline}
+
+    # 🆕 Comparativo mensal
+    if operation == "COMPARATIVE":
+        raw_range = data.get("date_range", "")
+        try:
+            from_str, to_str = [s.strip() for s in raw_range.split("a")]
+            # Manter as datas como string para comparação
+            date_from = from_str  # "2028-01-01"
+            date_to = to_str  # "2028-12-31"
+        except Exception as e:
+            raise ValueError(f"Formato inválido de date_range: {raw_range}") from e
+
+        # Filtro de data para campos string (comparação lexicográfica funciona com YYYY-MM-DD)
+        filters["date"] = {"$gte": date_from, "$lte": date_to}
+
+        pipeline = [
+            {"$match": filters},
+            {
+                "$group": {
+                    "_id": {
+                        # Extrair ano e mês da string "2028-02-05"
+                        "year": {"$substr": ["$date", 0, 4]},  # "2028"
+                        "month": {"$substr": ["$date", 5, 2]},  # "02"
+                    },
+                    "total": {"$sum": "$value"},
+                }
+            },
+            {
+                "$project": {
+                    "month": {
+                        "$concat": [
+                            "$_id.month",  # Já está formatado como "02"
+                            "/",
+                            "$_id.year",  # "2028"
+                        ]
+                    },
+                    "total": 1,
+                    "_id": 0,
+                }
+            },
+            {"$sort": {"month": 1}},
+        ]
+        return {"pipeline": pipeline}
+
+    # Ordenação simples
+    sort_order = None
+    if operation == "MAX":
+        sort_order = ("value", DESCENDING)
+    elif operation == "MIN":
+        sort_order = ("value", ASCENDING)
+
+    if sort_order:
+        return {"filter": filters, "sort": [sort_order], "limit": 1}
+    return {"filter": filters}
@@ -0,0 +1,110 @@
+import re
+import time
+from concurrent.futures import Future, wait
+from typing import Callable, List, NamedTuple, Optional
+from decouple import config
+from services.llm_executor import submit_in_context
+from services.llm_guard import LLMUnavailableError
+from services.metrics import metrics
+from services.transcribe import transcribe_pcm
+from services.vad import BYTES_PER_SAMPLE, SilenceSegmenter
+
+# Áudio enviado em pedaços pelo app: PCM 16 bits mono
+STREAM_SAMPLE_RATE = config("STREAM_SAMPLE_RATE", default=16000, cast=int)
+STREAM_SAMPLE_RATES = (8000, 16000, 24000, 48000)
+# Duração máxima de uma gravação em streaming
+STREAM_MAX_SECONDS = config("STREAM_MAX_SECONDS", default=180, cast=int)
+
+
+def stitch_segments(texts: List[str]) -> str:
+    """Junta os textos dos segmentos na ordem da fala"""
+    text = " ".join(t.strip() for t in texts if t and t.strip())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class StreamResult(NamedTuple):
+    text: str
+    # Índices dos trechos que não foram transcritos (ficam fora do texto)
+    failed_segments: List[int]
+
+
+class StreamingTranscription:
+    """
+    Transcrição de uma gravação que chega em pedaços.
+
+    Cada trecho de fala fechado por uma pausa é transcrito em paralelo
+    enquanto o resto do áudio ainda está chegando; finish() espera os
+    trechos pendentes e devolve o texto completo.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = STREAM_SAMPLE_RATE,
+        on_segment: Optional[Callable[[int, Optional[str]], None]] = None,
+    ):
+        if sample_rate not in STREAM_SAMPLE_RATES:
+            raise ValueError(f"Taxa de amostragem não suportada: {sample_rate}")
+        self.sample_rate = sample_rate
+        self.on_segment = on_segment
+        self.max_bytes = STREAM_MAX_SECONDS * sample_rate * BYTES_PER_SAMPLE
+        self.received_bytes = 0
+        self._segmenter = SilenceSegmenter(sample_rate)
+        self._futures: List[Future] = []
+
+    def feed(self, chunk: bytes):
+        self.received_bytes += len(chunk)
+        if self.received_bytes > self.max_bytes:
+            raise ValueError(
+                f"Gravação maior que o limite de {STREAM_MAX_SECONDS} segundos"
+            )
+        for segment in self._segmenter.feed(chunk):
+            self._submit(segment)
+
+    def _submit(self, pcm: bytes):
+        index = len(self._futures)
+        # O trecho já é PCM mono: vai direto para a API, sem o pool do ffmpeg
+        future = submit_in_context(transcribe_pcm, pcm, self.sample_rate)
+        if self.on_segment is not None:
+            future.add_done_callback(lambda f: self._notify(index, f))
+        self._futures.append(future)
+        metrics.inc("stream_segments_total")
+
+    def _notify(self, index: int, future: Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.on_segment(index, future.result())
+
+    def finish(self) -> StreamResult:
+        """
+        Fecha a gravação e devolve o texto dos trechos transcritos, com os
+        índices dos que falharam. Se nenhum trecho deu certo e o modelo estava
+        indisponível, o LLMUnavailableError chega a quem chama.
+        """
+        started = time.perf_counter()
+        last = self._segmenter.flush()
+        if last is not None:
+            self._submit(last)
+
+        wait(self._futures)
+        texts, failed, unavailable = [], [], None
+        for index, future in enumerate(self._futures):
+            error = None if future.cancelled() else future.exception()
+            if not future.cancelled() and error is None:
+                texts.append(future.result())
+                continue
+            failed.append(index)
+            if isinstance(error, LLMUnavailableError):
+                unavailable = error
+        # Tempo entre o fim da gravação e o texto pronto
+        metrics.observe(
+            "stream_transcription_tail_ms", (time.perf_counter() - started) * 1000
+        )
+        if failed:
+            metrics.inc("stream_segments_failed_total", len(failed))
+        if unavailable is not None and not texts:
+            raise unavailable
+        return StreamResult(stitch_segments(texts), failed)
+
+    def cancel(self):
+        for future in self._futures:
+            future.cancel()
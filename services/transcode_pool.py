@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from decouple import config
+from services.metrics import metrics, record_stage
+
+# Conversões simultâneas (um ffmpeg por worker) e quantas podem esperar na fila
+TRANSCODE_WORKERS = config("TRANSCODE_WORKERS", default=os.cpu_count() or 2, cast=int)
+TRANSCODE_QUEUE_SIZE = config("TRANSCODE_QUEUE_SIZE", default=16, cast=int)
+# Retry-After sugerido quando a fila está cheia
+TRANSCODE_RETRY_AFTER_SECONDS = config(
+    "TRANSCODE_RETRY_AFTER_SECONDS", default=2, cast=int
+)
+
+
+class TranscodeBusyError(Exception):
+    """Fila de conversão cheia: a requisição deve ser recusada com 503"""
+
+
+class TranscodePool:
+    """
+    Pool fixo de workers para o ffmpeg com fila limitada.
+
+    Quando workers + fila estão ocupados, submit() falha na hora com
+    TranscodeBusyError em vez de empilhar processos. Os servidores síncrono e
+    assíncrono usam o mesmo pool, então o limite vale por processo.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="transcode"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _admit(self):
+        with self._lock:
+            if self.queued + self.running >= self.workers + self.queue_size:
+                self.rejected += 1
+                metrics.inc("transcode_rejected_total")
+                raise TranscodeBusyError("Fila de conversão de áudio cheia")
+            self.queued += 1
+
+    def _run(self, submitted_at: float, fn, *args):
+        wait_ms = (time.perf_counter() - submitted_at) * 1000
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        metrics.observe("transcode_wait_ms", wait_ms)
+        record_stage("convert_queue", wait_ms)
+
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            metrics.observe(
+                "transcode_duration_ms", (time.perf_counter() - started) * 1000
+            )
+            with self._lock:
+                self.running -= 1
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def submit(self, fn, *args) -> Future:
+        """Agenda fn(*args) levando o contexto atual; TranscodeBusyError se lotado"""
+        self._admit()
+        return self._executor.submit(
+            contextvars.copy_context().run, self._run, time.perf_counter(), fn, *args
+        )
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+
+transcode_pool = TranscodePool(TRANSCODE_WORKERS, TRANSCODE_QUEUE_SIZE)
+metrics.register_source("transcode", transcode_pool.stats)
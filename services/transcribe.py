@@ -1,38 +1,114 @@
-import subprocess
-import tempfile
-import os
-from openai import OpenAI
-from decouple import config
-from services.gpt import ask_gpt
+from services.audio_convert import (
+    pcm16_to_wav,
+    transcode_audio,
+    transcode_audio_async,
+)
+from services.chunked_transcription import transcribe_chunks, transcribe_chunks_async
+from services.llm_guard import LLMUnavailableError, call_llm, call_llm_async
+from services.metrics import llm_call, timed
+from services.transcode_pool import TranscodeBusyError
+from services.transcription_cache import transcription_cache, transcription_key
 
-API_KEY = config("API_KEY_OPENAI")
+TRANSCRIPTION_MODEL = "gpt-4o-transcribe"
+TRANSCRIPTION_LANGUAGE = "pt"
 
 
-def convert_caf_to_wav(input_path):
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpfile:
-        output_path = tmpfile.name
+def _create_transcription(audio):
+    return lambda client: client.audio.transcriptions.create(
+        model=TRANSCRIPTION_MODEL,
+        file=audio,
+        language=TRANSCRIPTION_LANGUAGE,
+    )
 
-    cmd = ["ffmpeg", "-i", input_path, output_path, "-y"]  # -y sobrescreve se existir
-    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
 
-    return output_path
+def _transcribe_file(audio) -> str:
+    with llm_call("transcription", TRANSCRIPTION_MODEL) as call:
+        transcription = call_llm(
+            "transcription", TRANSCRIPTION_MODEL, _create_transcription(audio)
+        )
+        call.record_usage(transcription)
+    return transcription.text
 
 
-def transcribe(audio_path):
+async def _transcribe_file_async(audio) -> str:
+    with llm_call("transcription", TRANSCRIPTION_MODEL) as call:
+        transcription = await call_llm_async(
+            "transcription", TRANSCRIPTION_MODEL, _create_transcription(audio)
+        )
+        call.record_usage(transcription)
+    return transcription.text
+
+
+def transcribe_pcm(pcm: bytes, sample_rate: int) -> str:
+    """
+    Transcreve um trecho que já é PCM 16 bits mono (segmentos da transcrição
+    em streaming). Vai como WAV direto para a API, sem conversão nem corte de
+    silêncio; os erros chegam a quem chama.
+    """
+    with timed("transcription"):
+        return _transcribe_file(("segment.wav", pcm16_to_wav(pcm, sample_rate)))
+
+
+def transcribe(audio_data: bytes):
+    """Transcreve o áudio enviado (bytes do arquivo, em qualquer formato do ffmpeg)"""
+    # Reenvio do mesmo arquivo (retry do app depois de falha de rede)
+    cache_key = transcription_key(
+        audio_data, TRANSCRIPTION_MODEL, TRANSCRIPTION_LANGUAGE
+    )
+    cached_text = transcription_cache.get(cache_key)
+    if cached_text is not None:
+        return cached_text
+
     try:
-        client = OpenAI(api_key=API_KEY)
+        # Converte (se preciso) para Opus mono 16 kHz, tudo em memória
+        with timed("convert"):
+            files = transcode_audio(audio_data)
+
+        # Gravações longas chegam em trechos, transcritos em paralelo
+        with timed("transcription"):
+            if len(files) == 1:
+                text = _transcribe_file(files[0])
+            else:
+                text = transcribe_chunks(files, _transcribe_file)
+
+        if text:
+            transcription_cache.set(cache_key, text)
+        return text
+
+    except (LLMUnavailableError, TranscodeBusyError):
+        # Quem chama responde 503 em vez de "erro ao transcrever"
+        raise
 
-        # Converte para wav
-        wav_path = convert_caf_to_wav(audio_path)
+    except Exception as e:
+        print("Erro na transcrição:", e)
+        return None
+
+
+async def transcribe_async(audio_data: bytes):
+    """Versão assíncrona do transcribe, usada pelo servidor ASGI (api_async.py)"""
+    cache_key = transcription_key(
+        audio_data, TRANSCRIPTION_MODEL, TRANSCRIPTION_LANGUAGE
+    )
+    cached_text = await transcription_cache.get_async(cache_key)
+    if cached_text is not None:
+        return cached_text
+
+    try:
+        with timed("convert"):
+            files = await transcode_audio_async(audio_data)
 
-        with open(wav_path, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="gpt-4o-transcribe", file=audio_file, language="pt"
-            )
+        with timed("transcription"):
+            if len(files) == 1:
+                text = await _transcribe_file_async(files[0])
+            else:
+                text = await transcribe_chunks_async(files, _transcribe_file_async)
 
-        os.remove(wav_path)
+        if text:
+            await transcription_cache.set_async(cache_key, text)
+        return text
 
-        return transcription.text
+    except (LLMUnavailableError, TranscodeBusyError):
+        raise
 
     except Exception as e:
         print("Erro na transcrição:", e)
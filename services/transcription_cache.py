@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+from decouple import config
+from services.metrics import metrics
+from db.mongo import transcription_cache_collection
+
+TRANSCRIPTION_CACHE_MAX_ENTRIES = config(
+    "TRANSCRIPTION_CACHE_MAX_ENTRIES", default=512, cast=int
+)
+# Soma do tamanho (UTF-8) dos textos guardados em memória
+TRANSCRIPTION_CACHE_MAX_BYTES = config(
+    "TRANSCRIPTION_CACHE_MAX_BYTES", default=2_000_000, cast=int
+)
+# Camada persistente opcional, compartilhada entre processos e deploys
+TRANSCRIPTION_CACHE_MONGO_ENABLED = config(
+    "TRANSCRIPTION_CACHE_MONGO_ENABLED", default=False, cast=bool
+)
+TRANSCRIPTION_CACHE_MONGO_TTL_SECONDS = config(
+    "TRANSCRIPTION_CACHE_MONGO_TTL_SECONDS", default=7 * 24 * 3600, cast=int
+)
+
+
+def transcription_key(audio_data: bytes, model: str, language: str) -> str:
+    """Hash dos bytes enviados pelo app + modelo + idioma"""
+    digest = hashlib.sha256(audio_data).hexdigest()
+    return f"{model}|{language}|{digest}"
+
+
+class MongoTranscriptionStore:
+    """
+    Camada persistente do cache. Falhas do Mongo são ignoradas: o cache nunca
+    pode impedir uma transcrição.
+    """
+
+    def __init__(self, collection, ttl_seconds: int):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._index_ready = False
+        self.errors = 0
+
+    def _ensure_index(self):
+        if self._index_ready:
+            return
+        self.collection.create_index("createdAt", expireAfterSeconds=self.ttl_seconds)
+        self._index_ready = True
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            doc = self.collection.find_one({"_id": key}, {"text": 1})
+        except Exception as e:
+            self.errors += 1
+            print("Erro no cache de transcrição (Mongo):", e)
+            return None
+        return doc["text"] if doc else None
+
+    def set(self, key: str, text: str):
+        try:
+            self._ensure_index()
+            self.collection.update_one(
+                {"_id": key},
+                {"$set": {"text": text, "createdAt": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        except Exception as e:
+            self.errors += 1
+            print("Erro no cache de transcrição (Mongo):", e)
+
+
+class TranscriptionCache:
+    """
+    Cache LRU dos textos transcritos, limitado por número de entradas e por
+    bytes. Com um store, os misses da memória consultam a camada persistente
+    e os acertos dela voltam para a memória.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        store: Optional[MongoTranscriptionStore] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store = store
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return text
+
+    def _set_memory(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.encode("utf-8"))
+            self._entries[key] = text
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.encode("utf-8"))
+                self.evictions += 1
+
+    def _store_result(self, key: str, text: Optional[str]) -> Optional[str]:
+        if text is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.store_hits += 1
+        self._set_memory(key, text)
+        return text
+
+    def get(self, key: str) -> Optional[str]:
+        text = self._get_memory(key)
+        if text is not None:
+            return text
+        stored = self.store.get(key) if self.store is not None else None
+        return self._store_result(key, stored)
+
+    def set(self, key: str, text: str):
+        self._set_memory(key, text)
+        if self.store is not None:
+            self.store.set(key, text)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        text = self._get_memory(key)
+        if text is not None:
+            return text
+        stored = None
+        if self.store is not None:
+            stored = await asyncio.to_thread(self.store.get, key)
+        return self._store_result(key, stored)
+
+    async def set_async(self, key: str, text: str):
+        self._set_memory(key, text)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, key, text)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "store_errors": self.store.errors if self.store else 0,
+                "hit_rate": (
+                    (self.hits + self.store_hits) / lookups if lookups else 0.0
+                ),
+            }
+
+
+def _build_store() -> Optional[MongoTranscriptionStore]:
+    if not TRANSCRIPTION_CACHE_MONGO_ENABLED:
+        return None
+    return MongoTranscriptionStore(
+        transcription_cache_collection, TRANSCRIPTION_CACHE_MONGO_TTL_SECONDS
+    )
+
+
+transcription_cache = TranscriptionCache(
+    TRANSCRIPTION_CACHE_MAX_ENTRIES, TRANSCRIPTION_CACHE_MAX_BYTES, _build_store()
+)
+metrics.register_source("transcription_cache", transcription_cache.stats)
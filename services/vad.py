@@ -0,0 +1,299 @@
+from collections import deque
+from typing import List, Optional, Tuple
+import numpy as np
+from decouple import config
+
+# Detecção de voz por energia (PCM 16 bits, mono)
+VAD_FRAME_MS = config("VAD_FRAME_MS", default=30, cast=int)
+# Quanto acima do ruído de fundo (dB) um quadro precisa estar para ser fala
+VAD_SPEECH_MARGIN_DB = config("VAD_SPEECH_MARGIN_DB", default=10.0, cast=float)
+# Quadros abaixo disso (dBFS) nunca são fala, mesmo em ambiente silencioso
+VAD_MIN_SPEECH_DBFS = config("VAD_MIN_SPEECH_DBFS", default=-50.0, cast=float)
+# Pausa que fecha um segmento
+VAD_SILENCE_MS = config("VAD_SILENCE_MS", default=600, cast=int)
+# Silêncio mantido antes e depois da fala de cada segmento
+VAD_PADDING_MS = config("VAD_PADDING_MS", default=200, cast=int)
+# Segmentos com menos fala que isso (cliques, respiração) são descartados
+VAD_MIN_SPEECH_MS = config("VAD_MIN_SPEECH_MS", default=150, cast=int)
+# Fala contínua é cortada nesse tamanho para não atrasar a transcrição
+VAD_MAX_SEGMENT_SECONDS = config("VAD_MAX_SEGMENT_SECONDS", default=15.0, cast=float)
+# Pausas internas maiores que isso são encurtadas por compress_pauses
+VAD_MAX_PAUSE_MS = config("VAD_MAX_PAUSE_MS", default=700, cast=int)
+
+BYTES_PER_SAMPLE = 2
+# Pausa mínima para chunk_bounds preferir cortar perto do tamanho alvo
+_MIN_CUT_PAUSE_MS = 300
+
+
+def frame_dbfs(frame: bytes) -> float:
+    """Energia RMS de um quadro PCM 16 bits em dBFS"""
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+    if samples.size == 0:
+        return -120.0
+    rms = float(np.sqrt(np.mean(samples * samples)))
+    return 20 * np.log10(rms / 32768 + 1e-6)
+
+
+class EnergyVAD:
+    """
+    Classifica quadros como fala ou silêncio comparando a energia com um piso
+    de ruído adaptativo: o piso desce na hora com quadros mais baixos e sobe
+    devagar, mais devagar ainda durante a fala.
+    """
+
+    def __init__(
+        self,
+        margin_db: float = VAD_SPEECH_MARGIN_DB,
+        min_speech_dbfs: float = VAD_MIN_SPEECH_DBFS,
+    ):
+        self.margin_db = margin_db
+        self.min_speech_dbfs = min_speech_dbfs
+        self.noise_floor = min_speech_dbfs - margin_db
+
+    def is_speech(self, dbfs: float) -> bool:
+        speech = dbfs > max(self.min_speech_dbfs, self.noise_floor + self.margin_db)
+        if dbfs < self.noise_floor:
+            self.noise_floor = dbfs
+        else:
+            rate = 0.005 if speech else 0.05
+            self.noise_floor += rate * (dbfs - self.noise_floor)
+        return speech
+
+
+def speech_frames(pcm: bytes, sample_rate: int) -> np.ndarray:
+    """
+    Máscara de fala por quadro de VAD_FRAME_MS. Trechos de fala menores que
+    VAD_MIN_SPEECH_MS (cliques, batidas no microfone) contam como silêncio.
+    """
+    frame_len = sample_rate * VAD_FRAME_MS // 1000
+    samples = np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype="<i2")
+    count = samples.size // frame_len
+    if count == 0:
+        return np.zeros(0, dtype=bool)
+    frames = samples[: count * frame_len].reshape(count, frame_len).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    levels = 20 * np.log10(rms / 32768 + 1e-6)
+
+    vad = EnergyVAD()
+    mask = np.array([vad.is_speech(float(level)) for level in levels], dtype=bool)
+
+    min_frames = max(1, VAD_MIN_SPEECH_MS // VAD_FRAME_MS)
+    start = None
+    for index, speech in enumerate([*mask, False]):
+        if speech and start is None:
+            start = index
+        elif not speech and start is not None:
+            if index - start < min_frames:
+                mask[start:index] = False
+            start = None
+    return mask
+
+
+def trim_silence(
+    pcm: bytes,
+    sample_rate: int,
+    compress_pauses: bool = False,
+    padding_ms: int = VAD_PADDING_MS,
+    max_pause_ms: int = VAD_MAX_PAUSE_MS,
+) -> Tuple[bytes, float]:
+    """
+    Remove o silêncio do começo e do fim (mantendo padding_ms) e, com
+    compress_pauses, encurta as pausas internas para max_pause_ms.
+
+    Retorna (PCM, segundos removidos). Sem fala detectada, devolve o áudio
+    intacto: é melhor deixar o modelo decidir do que descartar uma voz baixa.
+    """
+    mask = speech_frames(pcm, sample_rate)
+    spoken = np.flatnonzero(mask)
+    if spoken.size == 0:
+        return pcm, 0.0
+
+    frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * BYTES_PER_SAMPLE
+    padding = padding_ms // VAD_FRAME_MS
+    first = max(0, spoken[0] - padding)
+    last = min(len(mask), spoken[-1] + 1 + padding)
+
+    # Trechos (início, fim) em quadros que ficam no áudio final
+    keep = [(first, last)]
+    if compress_pauses:
+        max_pause = max(1, max_pause_ms // VAD_FRAME_MS)
+        keep = []
+        start = first
+        gaps = np.flatnonzero(np.diff(spoken) > max_pause)
+        for gap in gaps:
+            # Mantém metade da pausa máxima depois da fala e metade antes da próxima
+            pause_start = spoken[gap] + 1
+            pause_end = spoken[gap + 1]
+            keep.append((start, pause_start + max_pause // 2))
+            start = pause_end - (max_pause - max_pause // 2)
+        keep.append((start, last))
+
+    if last == len(mask):
+        # Inclui o resto que não completou um quadro
+        keep[-1] = (keep[-1][0], None)
+    trimmed = b"".join(
+        pcm[begin * frame_bytes : end * frame_bytes if end is not None else None]
+        for begin, end in keep
+    )
+    removed = (len(pcm) - len(trimmed)) / BYTES_PER_SAMPLE / sample_rate
+    return trimmed, removed
+
+
+def chunk_bounds(
+    pcm: bytes,
+    sample_rate: int,
+    chunk_seconds: float,
+    max_chunk_seconds: float,
+    overlap_ms: int,
+) -> List[Tuple[int, int]]:
+    """
+    Divide o PCM em trechos de ~chunk_seconds (nunca mais que
+    max_chunk_seconds) cortando no meio de uma pausa, de preferência a mais
+    perto do tamanho alvo, para os trechos terem durações parecidas. Cada trecho
+    começa overlap_ms antes do corte anterior, para não perder uma palavra
+    cortada. Retorna (início, fim) em bytes.
+    """
+    mask = speech_frames(pcm, sample_rate)
+    frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * BYTES_PER_SAMPLE
+    target = max(1, int(chunk_seconds * 1000 // VAD_FRAME_MS))
+    longest = max(target, int(max_chunk_seconds * 1000 // VAD_FRAME_MS))
+    overlap = overlap_ms // VAD_FRAME_MS
+    min_pause = max(1, _MIN_CUT_PAUSE_MS // VAD_FRAME_MS)
+
+    # Só procura a pausa depois de metade do tamanho alvo
+    earliest = max(1, target // 2)
+    cuts = []
+    position = 0
+    while len(mask) - position > longest:
+        window = mask[position + earliest : position + longest]
+        best = None
+        run_start = None
+        # Pausa real mais perto do alvo; sem nenhuma, a maior da janela
+        for index, speech in enumerate([*window, True]):
+            if not speech and run_start is None:
+                run_start = index
+            elif speech and run_start is not None:
+                middle = (run_start + index) // 2
+                length = index - run_start
+                score = (
+                    length >= min_pause,
+                    -abs(middle - (target - earliest)) if length >= min_pause else 0,
+                    length,
+                )
+                if best is None or score > best[0]:
+                    best = (score, middle)
+                run_start = None
+        if best is None:
+            # Fala sem pausa: corta no limite e conta com a sobreposição
+            position += longest
+        else:
+            position += earliest + best[1]
+        cuts.append(position)
+
+    bounds = []
+    start = 0
+    for cut in cuts:
+        bounds.append((start * frame_bytes, cut * frame_bytes))
+        start = max(0, cut - overlap)
+    bounds.append((start * frame_bytes, len(pcm)))
+    return bounds
+
+
+class SilenceSegmenter:
+    """
+    Divide um stream de PCM em segmentos de fala separados por pausas.
+
+    feed() recebe pedaços de qualquer tamanho e devolve os segmentos que
+    terminaram (PCM, com VAD_PADDING_MS de silêncio nas pontas); flush()
+    devolve o que sobrou quando a gravação acaba.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        silence_ms: int = VAD_SILENCE_MS,
+        padding_ms: int = VAD_PADDING_MS,
+        min_speech_ms: int = VAD_MIN_SPEECH_MS,
+        max_segment_seconds: float = VAD_MAX_SEGMENT_SECONDS,
+        vad: Optional[EnergyVAD] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * BYTES_PER_SAMPLE
+        self.silence_frames = max(1, silence_ms // VAD_FRAME_MS)
+        self.padding_frames = padding_ms // VAD_FRAME_MS
+        self.min_speech_frames = max(1, min_speech_ms // VAD_FRAME_MS)
+        self.max_frames = int(max_segment_seconds * 1000 // VAD_FRAME_MS)
+        self.vad = vad or EnergyVAD()
+
+        self._pending = b""
+        self._preroll = deque(maxlen=self.padding_frames or None)
+        self._frames: List[bytes] = []
+        self._speech_frames = 0
+        self._silence_run = 0
+        self._in_speech = False
+
+    def _close(self, segments: List[bytes], keep_silence: int):
+        """Fecha o segmento atual, mantendo keep_silence quadros do silêncio final"""
+        trailing = self._silence_run - keep_silence
+        frames = (
+            self._frames[: len(self._frames) - trailing]
+            if trailing > 0
+            else self._frames
+        )
+        if self._speech_frames >= self.min_speech_frames:
+            segments.append(b"".join(frames))
+        # O silêncio cortado vira o início do próximo segmento
+        self._preroll.clear()
+        if trailing > 0 and self.padding_frames:
+            self._preroll.extend(self._frames[-trailing:][-self.padding_frames :])
+        self._frames = []
+        self._speech_frames = 0
+        self._silence_run = 0
+
+    def _feed_frame(self, frame: bytes, segments: List[bytes]):
+        speech = self.vad.is_speech(frame_dbfs(frame))
+
+        if not self._in_speech:
+            if not speech:
+                if self.padding_frames:
+                    self._preroll.append(frame)
+                return
+            self._in_speech = True
+            self._frames = [*self._preroll, frame]
+            self._preroll.clear()
+            self._speech_frames = 1
+            self._silence_run = 0
+            return
+
+        self._frames.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+
+        if self._silence_run >= self.silence_frames:
+            self._close(segments, self.padding_frames)
+            self._in_speech = False
+        elif len(self._frames) >= self.max_frames:
+            # Fala longa sem pausa: corta e continua no próximo segmento
+            self._close(segments, self._silence_run)
+
+    def feed(self, pcm: bytes) -> List[bytes]:
+        segments: List[bytes] = []
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        for start in range(0, usable, self.frame_bytes):
+            self._feed_frame(data[start : start + self.frame_bytes], segments)
+        self._pending = data[usable:]
+        return segments
+
+    def flush(self) -> Optional[bytes]:
+        segments: List[bytes] = []
+        if self._in_speech:
+            if self._pending:
+                self._frames.append(self._pending)
+            self._close(segments, self.padding_frames)
+            self._in_speech = False
+        self._pending = b""
+        return segments[0] if segments else None
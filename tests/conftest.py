@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Os módulos leem a configuração no import; os testes não acessam Mongo nem a API
+os.environ.setdefault("MONGO", "mongodb://localhost:1")
+os.environ.setdefault("API_KEY_OPENAI", "sk-test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+import subprocess
+import pytest
+import services.audio_convert as audio_convert
+from services.audio_convert import transcode_audio
+
+M4A_HEADER = b"\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00"
+WEBM_HEADER = b"\x1a\x45\xdf\xa3" + b"\x00" * 12
+CAF_HEADER = b"caff\x00\x01\x00\x00" + b"\x00" * 8
+
+
+@pytest.fixture
+def ffmpeg_calls(monkeypatch):
+    calls = []
+
+    def fake_run(command, **kwargs):
+        calls.append(command)
+        return subprocess.CompletedProcess(command, 0, stdout=b"OggS-opus", stderr=b"")
+
+    monkeypatch.setattr(audio_convert.subprocess, "run", fake_run)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "header,name", [(M4A_HEADER, "audio.m4a"), (WEBM_HEADER, "audio.webm")]
+)
+def test_short_accepted_upload_does_not_spawn_ffmpeg(ffmpeg_calls, header, name):
+    data = header + b"\x00" * 50_000
+    assert transcode_audio(data) == [(name, data)]
+    assert ffmpeg_calls == []
+
+
+def test_short_unaccepted_upload_runs_ffmpeg_once(ffmpeg_calls):
+    data = CAF_HEADER + b"\x00" * 50_000
+    assert transcode_audio(data) == [("audio.ogg", b"OggS-opus")]
+    assert len(ffmpeg_calls) == 1
+    assert "libopus" in ffmpeg_calls[0]
+
+
+def test_long_upload_is_decoded_for_trimming(ffmpeg_calls):
+    data = WEBM_HEADER + b"\x00" * audio_convert.AUDIO_DECODE_MIN_BYTES
+    transcode_audio(data)
+    assert ffmpeg_calls
+    assert "s16le" in ffmpeg_calls[0]
@@ -0,0 +1,150 @@
+import pytest
+from bson import ObjectId
+from flask import Flask, g
+from services.batch_registration import prepare_batch_operations
+from services.profile_config_service import ProfileConfigService
+from services.spending_service import SpendingService
+
+
+class FakeCollection:
+    def __init__(self):
+        self.inserted = []
+        self.updates = []
+
+    def insert_one(self, doc):
+        self.insert_many([doc])
+
+    def insert_many(self, docs, ordered=True):
+        # Como o pymongo, preenche o _id nos próprios documentos
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        self.inserted.extend(docs)
+
+    def update_one(self, query, update):
+        self.updates.append((query, update))
+
+        class Result:
+            modified_count = 1
+
+        return Result()
+
+
+@pytest.fixture
+def app_context():
+    with Flask(__name__).app_context():
+        g.logged_user = {"id": "u1"}
+        yield
+
+
+def batch(*operations, **fields):
+    return {"batch": True, "operations": list(operations), **fields}
+
+
+def test_prepare_inherits_fields_and_keeps_installments():
+    operations = prepare_batch_operations(
+        batch(
+            {"description": "café", "value": 20, "category": "FOOD"},
+            {
+                "description": "tênis",
+                "value": 300,
+                "category": "CLOTHING",
+                "installments": 3,
+                "date": "2025-06-01",
+            },
+            date="2025-06-23",
+            projectName="Casa",
+        )
+    )
+    assert [op["date"] for op in operations] == ["2025-06-23", "2025-06-01"]
+    assert [op["type"] for op in operations] == ["SPENDING", "SPENDING"]
+    assert operations[0]["projectName"] == "Casa"
+    assert operations[1]["installments"] == 3
+
+
+def test_prepare_rejects_the_whole_batch_on_an_invalid_item():
+    with pytest.raises(ValueError, match="Item 2"):
+        prepare_batch_operations(
+            batch(
+                {"description": "café", "value": 20, "category": "FOOD"},
+                {"description": "uber", "category": "TRANSPORT"},
+                date="2025-06-23",
+            )
+        )
+
+
+def registered(app_context, single):
+    operations = prepare_batch_operations(
+        batch(
+            {"description": "café", "value": 20, "category": "FOOD"},
+            {
+                "description": "tênis",
+                "value": 300,
+                "category": "CLOTHING",
+                "installments": 3,
+            },
+            date="2025-06-23",
+        )
+    )
+    service = SpendingService(FakeCollection())
+    if single:
+        return [service.insert_spending(dict(op)) for op in operations]
+    return service.insert_spendings(operations)
+
+
+def test_batch_returns_the_same_documents_as_single_inserts(app_context):
+    single = registered(app_context, single=True)
+    batched = registered(app_context, single=False)
+
+    def shape(doc):
+        return {k: v for k, v in doc.items() if k not in ("_id", "parent_id")}
+
+    assert [shape(d) for d in batched] == [shape(d) for d in single]
+    assert batched[1]["installment_info"] == "2/3"
+
+
+def test_project_receives_one_update_for_all_items(app_context):
+    collection = FakeCollection()
+    items = [{"value": 20.0, "spendingId": "a"}, {"value": 300.0, "spendingId": "b"}]
+    assert ProfileConfigService(collection).add_project_expenses("p1", items)
+
+    ((query, update),) = collection.updates
+    assert query == {"userId": "u1", "projects.projectId": "p1"}
+    assert update["$inc"] == {"projects.$.totalValueRegistered": 320.0}
+    assert update["$push"] == {"projects.$.expenseHistory": {"$each": items}}
+
+
+def test_insert_spendings_groups_project_expenses(app_context, monkeypatch):
+    service = SpendingService(FakeCollection())
+    calls = []
+    monkeypatch.setattr(
+        service.profile_service,
+        "add_project_expenses",
+        lambda project_id, items: calls.append((project_id, items)),
+    )
+    operations = [
+        {
+            "description": "tinta",
+            "value": 100,
+            "type": "SPENDING",
+            "category": "OTHER",
+            "date": "2025-06-23",
+            "projectId": "p1",
+        },
+        {
+            "description": "piso",
+            "value": 900,
+            "type": "SPENDING",
+            "category": "OTHER",
+            "date": "2025-06-23",
+            "installments": 3,
+            "projectId": "p1",
+        },
+    ]
+    service.insert_spendings(operations)
+
+    ((project_id, items),) = calls
+    assert project_id == "p1"
+    assert [(i["value"], i["installmentInfo"]) for i in items] == [
+        (100.0, "1/1"),
+        (900.0, "1/3"),
+    ]
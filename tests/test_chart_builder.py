@@ -0,0 +1,24 @@
+from services.chart_builder import build_chart_data
+
+
+def test_month_chart_orders_months_across_years():
+    # Ordem devolvida pelo $sort do pipeline (texto): janeiro antes de dezembro
+    rows = [
+        {"month": "01/2025", "total": 200.0},
+        {"month": "02/2025", "total": 300.0},
+        {"month": "12/2024", "total": 100.0},
+    ]
+    chart = build_chart_data(rows)
+    assert chart["chartType"] == "bar"
+    assert [point["label"] for point in chart["data"]] == [
+        "dez/2024",
+        "jan/2025",
+        "fev/2025",
+    ]
+    assert [point["value"] for point in chart["data"]] == [100.0, 200.0, 300.0]
+
+
+def test_category_rows_become_pie():
+    chart = build_chart_data([{"label": "FOOD", "value": 10.123}])
+    assert chart["chartType"] == "pie"
+    assert chart["data"][0]["value"] == 10.12
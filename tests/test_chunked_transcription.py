@@ -0,0 +1,46 @@
+from services.chunked_transcription import merge_chunk_texts, transcribe_chunks
+
+
+def test_overlapping_words_are_kept_once():
+    texts = [
+        "gastei cinquenta reais no mercado ontem à noite",
+        "ontem à noite e depois paguei a conta de luz",
+        "conta de luz de cento e vinte reais",
+    ]
+    assert merge_chunk_texts(texts) == (
+        "gastei cinquenta reais no mercado ontem à noite e depois paguei a "
+        "conta de luz de cento e vinte reais"
+    )
+
+
+def test_overlap_ignores_case_and_punctuation():
+    texts = ["Paguei o aluguel, Ontem.", "ontem, e a internet"]
+    assert merge_chunk_texts(texts) == "Paguei o aluguel, Ontem. e a internet"
+
+
+def test_overlap_tolerates_a_word_cut_at_each_edge():
+    # O corte pegou uma palavra no meio no fim do trecho da esquerda...
+    texts = ["comprei pão no mercado ho", "no mercado hoje cedo"]
+    assert merge_chunk_texts(texts) == "comprei pão no mercado hoje cedo"
+    # ...ou no começo do trecho da direita
+    texts = ["comprei pão no mercado", "cado no mercado hoje"]
+    assert merge_chunk_texts(texts) == "comprei pão no mercado hoje"
+
+
+def test_single_short_word_is_not_treated_as_overlap():
+    assert merge_chunk_texts(["paguei a conta e", "e o cartão"]) == (
+        "paguei a conta e e o cartão"
+    )
+
+
+def test_chunks_without_overlap_are_concatenated():
+    assert merge_chunk_texts(["primeiro trecho", "", "segundo trecho"]) == (
+        "primeiro trecho segundo trecho"
+    )
+
+
+def test_transcribe_chunks_keeps_chunk_order():
+    files = [("a.wav", b"1"), ("b.wav", b"2")]
+    texts = {"a.wav": "uma frase longa", "b.wav": "frase longa termina aqui"}
+    merged = transcribe_chunks(files, lambda audio: texts[audio[0]])
+    assert merged == "uma frase longa termina aqui"
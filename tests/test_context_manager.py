@@ -0,0 +1,51 @@
+import json
+from services.context_manager import compact_context
+from utils.token_budget import estimate_tokens
+
+
+def turn(index, **fields):
+    # Sem números no texto: viram valor_mencionado no resumo
+    return {"prompt": f"frase {chr(ord('a') + index)} " + "bla " * 40, **fields}
+
+
+def test_older_turns_are_folded_into_the_summary():
+    context = [
+        turn(0, category="FOOD", operation="SUM"),
+        turn(1, projectName="Reforma", targetValue=5000),
+        turn(2),
+        turn(3, consult_results=[{"value": 10}] * 50),
+    ]
+    compacted = json.loads(compact_context(context, recent_turns=2, token_budget=2000))
+
+    summary = compacted[0]["resumo_da_conversa"]
+    assert summary["turnos_resumidos"] == 2
+    assert summary["entidades"] == {
+        "categoria": "FOOD",
+        "operacao": "SUM",
+        "projeto": "Reforma",
+        "meta": 5000,
+    }
+    assert [t["prompt"][:7] for t in compacted[1:]] == ["frase c", "frase d"]
+    # Resultados de consultas não vão para o modelo
+    assert "consult_results" not in compacted[2]
+
+
+def test_token_budget_is_respected():
+    context = [turn(i, category="FOOD") for i in range(20)]
+    result = compact_context(context, recent_turns=10, token_budget=150)
+    assert estimate_tokens(json.loads(result)) <= 150
+    assert json.loads(result)[-1]["prompt"].startswith("frase t")
+
+
+def test_latest_turn_is_always_kept():
+    context = [turn(0), {"prompt": "último pedido " + "x" * 5000}]
+    compacted = json.loads(compact_context(context, recent_turns=6, token_budget=20))
+
+    assert compacted[0]["resumo_da_conversa"]["turnos_resumidos"] == 1
+    assert compacted[-1]["prompt"].startswith("último")
+
+
+def test_short_context_is_left_untouched():
+    context = [{"prompt": "gastei 50 no mercado"}, {"prompt": "e ontem?"}]
+    assert json.loads(compact_context(context)) == context
+    assert compact_context([]) == ""
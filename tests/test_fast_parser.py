@@ -0,0 +1,89 @@
+from datetime import date
+import pytest
+from services.fast_parser import FAST_PARSER_MIN_CONFIDENCE, parse_utterance
+
+TODAY = date(2025, 6, 23)
+
+
+def parse(text):
+    return parse_utterance(text, today=TODAY)
+
+
+def test_registration_without_date_assumes_today():
+    result = parse("gastei 50 no mercado")
+    assert result.intent["date"] == "2025-06-23"
+    assert result.intent["category"] == "FOOD"
+    assert result.intent["value"] == 50
+    assert result.confidence == pytest.approx(0.9)
+
+
+def test_registration_with_known_days():
+    assert parse("gastei 50 no mercado ontem").intent["date"] == "2025-06-22"
+    assert parse("gastei 50 no mercado dia 20").intent["date"] == "2025-06-20"
+
+
+def test_revenue_with_thousands_separator():
+    result = parse("recebi 3.500 reais")
+    assert result.intent["type"] == "REVENUE"
+    assert result.intent["value"] == 3500
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "gastei 35 com mercado semana passada",
+        "gastei 50 no mercado dia 31",
+        "gastei 40 na farmacia sexta",
+        "gastei 20 no mercado dia 10/05",
+    ],
+)
+def test_unknown_or_invalid_dates_go_to_the_llm(text):
+    assert parse(text).confidence < FAST_PARSER_MIN_CONFIDENCE
+
+
+def test_consult_with_month_name_after_no_mes():
+    result = parse("quanto gastei no mês de maio")
+    assert result.intent["date"] == "2025-05"
+    assert result.confidence >= FAST_PARSER_MIN_CONFIDENCE
+
+
+def test_consult_current_and_previous_month():
+    assert parse("quanto gastei no mês").intent["date"] == "2025-06"
+    assert parse("quanto gastei mês passado").intent["date"] == "2025-05"
+    assert parse("quanto gastei em março de 2024").intent["date"] == "2024-03"
+
+
+def test_consult_with_unknown_period_goes_to_the_llm():
+    assert parse("quanto gastei semana passada").confidence < 0.8
+    assert parse("quanto gastei no mês retrasado").confidence < 0.8
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "quanto gastei de uber hoje",
+        "quanto gastei com o João hoje",
+        "quanto gastei no cartão de crédito esse mês",
+        "quanto gastei com mercado e farmácia hoje",
+    ],
+)
+def test_consult_with_unrecognised_filter_goes_to_the_llm(text):
+    assert parse(text).confidence < FAST_PARSER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize(
+    "text,operation,category",
+    [
+        ("quanto gastei hoje", "SUM", None),
+        ("quanto eu gastei no mercado esse mês", "SUM", "FOOD"),
+        ("qual foi meu maior gasto em maio", "MAX", None),
+        ("quais foram meus gastos por categoria mês passado", "CATEGORY", None),
+        ("quanto gastei com farmácia dia 20", "SUM", "PHARMACY"),
+        ("quanto recebi em março de 2024", "SUM", None),
+    ],
+)
+def test_simple_consults_stay_local(text, operation, category):
+    result = parse(text)
+    assert result.confidence >= FAST_PARSER_MIN_CONFIDENCE
+    assert result.intent["operation"] == operation
+    assert result.intent.get("category") == category
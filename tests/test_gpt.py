@@ -0,0 +1,16 @@
+from services.gpt import _remember
+from services.intent_cache import intent_cache
+
+
+def test_fenced_reply_is_cached():
+    content = '```json\n{"consult": true, "operation": "SUM"}\n```'
+    _remember("test-fenced-reply", content)
+    assert intent_cache.get("test-fenced-reply") == {
+        "consult": True,
+        "operation": "SUM",
+    }
+
+
+def test_unparseable_reply_is_not_cached():
+    _remember("test-empty-reply", None)
+    assert intent_cache.get("test-empty-reply") is None
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import httpx
+import pytest
+import services.gpt as gpt
+import services.llm_guard as llm_guard
+from services.llm_guard import CircuitBreaker, LLMUnavailableError
+
+
+class HangingStream:
+    """Stream que abre e não manda nada até ser fechado"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        self.closed.wait(5)
+        raise httpx.ReadError("conexão fechada")
+        yield
+
+    def close(self):
+        self.closed.set()
+
+
+class HangingAsyncStream:
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        await asyncio.sleep(5)
+        yield None
+
+    async def close(self):
+        pass
+
+
+def isolate_breaker(monkeypatch):
+    model = gpt.INTENT_MODEL_PARAMS["model"]
+    monkeypatch.setitem(llm_guard._breakers, model, CircuitBreaker(model, 5, 30.0))
+    monkeypatch.setitem(gpt.LLM_DEADLINES, "intent", 0.1)
+
+
+def test_stream_deadline_covers_the_reads(monkeypatch):
+    isolate_breaker(monkeypatch)
+    stream = HangingStream()
+    monkeypatch.setattr(gpt, "call_llm_hedged", lambda *args, **kwargs: stream)
+    with pytest.raises(LLMUnavailableError):
+        gpt._stream_intent([], lambda streamer: None)
+    assert stream.closed.is_set()
+
+
+def test_async_stream_deadline_covers_the_reads(monkeypatch):
+    isolate_breaker(monkeypatch)
+
+    async def open_stream(*args, **kwargs):
+        return HangingAsyncStream()
+
+    monkeypatch.setattr(gpt, "call_llm_hedged_async", open_stream)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(gpt._stream_intent_async([], lambda streamer: None))
@@ -0,0 +1,62 @@
+import json
+from utils.json_stream import (
+    JsonObjectStreamer,
+    JsonStringFieldStreamer,
+    loads_model_json,
+)
+
+
+def _split_everywhere(text):
+    # Todas as formas de cortar o texto em dois pedaços
+    return [(text[:i], text[i:]) for i in range(1, len(text))]
+
+
+def test_string_field_streamer_decodes_escapes_split_across_chunks():
+    answer = 'Gastou "R$ 10"\nno mês\\ 🎉 café'
+    payload = json.dumps({"gpt_answer": answer, "description": "x"})
+    assert "\\ud83c\\udf89" in payload
+    for left, right in _split_everywhere(payload):
+        streamer = JsonStringFieldStreamer("gpt_answer")
+        text = streamer.feed(left) + streamer.feed(right)
+        assert text == answer
+        assert streamer.value == answer
+        assert streamer.done
+
+
+def test_string_field_streamer_waits_for_the_key():
+    streamer = JsonStringFieldStreamer("gpt_answer")
+    assert streamer.feed('{"gpt_ans') == ""
+    assert streamer.feed('wer": "ol') == "ol"
+    assert streamer.feed('á"}') == "á"
+    assert streamer.feed("ignorado") == ""
+
+
+def test_object_streamer_completes_fields_split_across_chunks():
+    intent = {
+        "consult": True,
+        "operation": "SUM",
+        "prompt": 'quanto "gastei"\\ em\nmaio',
+        "filters": {"category": ["FOOD", "}"]},
+        "value": 12.5,
+        "installment": None,
+    }
+    payload = "```json\n" + json.dumps(intent, ensure_ascii=False) + "\n```"
+    for left, right in _split_everywhere(payload):
+        streamer = JsonObjectStreamer()
+        completed = streamer.feed(left) + streamer.feed(right)
+        assert streamer.fields == intent
+        assert completed == list(intent)
+        assert streamer.done
+
+
+def test_object_streamer_exposes_field_before_the_object_ends():
+    streamer = JsonObjectStreamer()
+    assert streamer.feed('{"consult": true, "operation": "SU') == ["consult"]
+    assert streamer.current_key == "operation"
+    assert streamer.feed('M", ') == ["operation"]
+    assert streamer.fields == {"consult": True, "operation": "SUM"}
+    assert not streamer.done
+
+
+def test_loads_model_json_strips_code_fences():
+    assert loads_model_json('```json\n{"a": 1}\n```') == {"a": 1}
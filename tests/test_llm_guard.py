@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+import pytest
+import services.llm_guard as llm_guard
+from services.llm_guard import CircuitBreaker, CircuitOpenError
+
+
+class FakeClient:
+    def with_options(self, **kwargs):
+        return self
+
+
+def open_breaker(monkeypatch, model: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(model, failure_threshold=2, reset_seconds=0.0)
+    monkeypatch.setitem(llm_guard._breakers, model, breaker)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker("m", failure_threshold=3, reset_seconds=60.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.rejected_total == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("m", failure_threshold=2, reset_seconds=60.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_probe_success_closes_and_failure_reopens():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opened_total == 3
+
+
+def test_released_probe_lets_the_next_call_through():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_local_error_in_probe_releases_it(monkeypatch):
+    breaker = open_breaker(monkeypatch, "sync-model")
+    monkeypatch.setattr(llm_guard, "get_openai_client", FakeClient)
+
+    def broken(client):
+        raise KeyError("bug local")
+
+    with pytest.raises(KeyError):
+        llm_guard.call_llm("intent", "sync-model", broken)
+    assert llm_guard.call_llm("intent", "sync-model", lambda client: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_releases_it(monkeypatch):
+    breaker = open_breaker(monkeypatch, "async-model")
+    monkeypatch.setattr(llm_guard, "get_async_openai_client", FakeClient)
+
+    async def slow(client):
+        await asyncio.sleep(10)
+
+    async def fast(client):
+        return "ok"
+
+    async def scenario():
+        probe = asyncio.ensure_future(
+            llm_guard.call_llm_async("intent", "async-model", slow)
+        )
+        await asyncio.sleep(0)
+        # Com o teste em andamento, outra chamada é recusada
+        with pytest.raises(CircuitOpenError):
+            await llm_guard.call_llm_async("intent", "async-model", fast)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await llm_guard.call_llm_async("intent", "async-model", fast)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == "closed"
+
+
+def hedge_model(monkeypatch, name):
+    monkeypatch.setattr(llm_guard, "get_openai_client", FakeClient)
+    monkeypatch.setattr(llm_guard, "LLM_HEDGE_DELAY_SECONDS", 0.05)
+    monkeypatch.setitem(llm_guard._breakers, name, CircuitBreaker(name, 5, 30.0))
+
+
+def test_sync_hedge_keeps_primary_out_of_the_hedge_pool(monkeypatch):
+    hedge_model(monkeypatch, "hedge-model")
+    threads = []
+
+    def request(client):
+        threads.append(threading.current_thread().name)
+        return "ok"
+
+    assert llm_guard.call_llm_hedged("intent", "hedge-model", request) == "ok"
+    assert threads == ["llm-primary"]
+
+
+def test_sync_hedge_returns_first_success_and_discards_the_slow_primary(
+    monkeypatch,
+):
+    hedge_model(monkeypatch, "slow-model")
+    calls = []
+    discarded = threading.Event()
+    released = threading.Event()
+
+    def request(client):
+        calls.append(threading.current_thread().name)
+        if len(calls) == 1:
+            released.wait(5)
+            return "primary"
+        return "hedge"
+
+    started = time.monotonic()
+    result = llm_guard.call_llm_hedged(
+        "intent",
+        "slow-model",
+        request,
+        discard=lambda value: value == "primary" and discarded.set(),
+    )
+    assert result == "hedge"
+    assert time.monotonic() - started < 1
+    released.set()
+    assert discarded.wait(5)
+
+
+def test_sync_hedge_uses_the_other_call_when_one_fails(monkeypatch):
+    hedge_model(monkeypatch, "failing-model")
+    calls = []
+
+    def request(client):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            raise KeyError("primeira falhou")
+        time.sleep(0.2)
+        return "hedge"
+
+    assert llm_guard.call_llm_hedged("intent", "failing-model", request) == "hedge"
@@ -0,0 +1,22 @@
+from services.local_answer import build_local_answer
+
+
+def test_comparative_orders_months_across_years():
+    json_data = {"operation": "COMPARATIVE", "date_range": "2024-12-01 a 2025-01-31"}
+    query_result = {
+        "spendings": [
+            {"month": "01/2025", "total": 300.0},
+            {"month": "12/2024", "total": 100.0},
+        ]
+    }
+    result = build_local_answer(json_data, query_result, "evolução dos meus gastos")
+    answer = result["gpt_answer"]
+    assert answer.index("dezembro de 2024") < answer.index("janeiro de 2025")
+    # Primeiro mês é dezembro: de 100 para 300 é aumento
+    assert "Aumento de" in answer
+
+
+def test_open_ended_question_is_left_to_the_analyser():
+    json_data = {"operation": "SUM"}
+    query_result = {"spendings": [{"value": 10.0, "category": "FOOD"}]}
+    assert build_local_answer(json_data, query_result, "como posso economizar?") is None
@@ -0,0 +1,54 @@
+import asyncio
+from services.profile_prefetch import (
+    find_profile_config,
+    find_profile_config_async,
+    invalidate_profile_prefetch,
+    profile_prefetch,
+    profile_prefetch_async,
+)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.calls = 0
+
+    def find_one(self, query):
+        self.calls += 1
+        return {"userId": query["userId"], "version": self.calls}
+
+
+class FakeAsyncCollection(FakeCollection):
+    async def find_one(self, query):
+        return FakeCollection.find_one(self, query)
+
+
+def test_prefetch_is_reused_only_inside_the_block():
+    collection = FakeCollection()
+    with profile_prefetch(collection, "u1"):
+        assert find_profile_config(collection, "u1")["version"] == 1
+        assert find_profile_config(collection, "u1")["version"] == 1
+        assert collection.calls == 1
+    # Mesma thread, requisição seguinte: nada da leitura anterior
+    assert find_profile_config(collection, "u1")["version"] == 2
+
+
+def test_other_user_and_writes_skip_the_prefetch():
+    collection = FakeCollection()
+    with profile_prefetch(collection, "u1"):
+        assert find_profile_config(collection, "u2")["userId"] == "u2"
+        find_profile_config(collection, "u1")
+        invalidate_profile_prefetch()
+        assert find_profile_config(collection, "u1")["version"] == 3
+
+
+def test_async_prefetch_uses_a_task():
+    collection = FakeAsyncCollection()
+
+    async def scenario():
+        async with profile_prefetch_async(collection, "u1"):
+            first = await find_profile_config_async(collection, "u1")
+            second = await find_profile_config_async(collection, "u1")
+        after = await find_profile_config_async(collection, "u1")
+        return first["version"], second["version"], after["version"]
+
+    assert asyncio.run(scenario()) == (1, 1, 2)
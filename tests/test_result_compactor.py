@@ -0,0 +1,53 @@
+from bson import ObjectId
+from services.result_compactor import compact_query_result
+from utils.token_budget import estimate_tokens
+
+
+def _spendings(count):
+    return [
+        {
+            "_id": ObjectId(),
+            "userId": "u1",
+            "date": f"2025-05-{i % 28 + 1:02d}",
+            "description": f"compra {i}",
+            "category": "FOOD",
+            "value": float(i),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def test_rows_are_trimmed_to_the_budget_keeping_the_largest():
+    spendings = _spendings(100)
+    result = compact_query_result({"spendings": spendings}, token_budget=300)
+    compact = result["spendings"]
+
+    assert estimate_tokens(result) <= 300
+    assert compact["common"] == {"category": "FOOD"}
+    assert compact["columns"] == ["date", "description", "value"]
+    kept = [row[2] for row in compact["rows"]]
+    assert 0 < len(kept) < 100
+    assert kept == sorted(kept, reverse=True)
+    assert kept[0] == 100.0
+    # O que não coube vira contagem e total
+    assert compact["rest"]["count"] == 100 - len(kept)
+    assert compact["rest"]["total"] == round(sum(range(1, 101)) - sum(kept), 2)
+    assert compact["summary"] == {"count": 100, "total": 5050.0}
+
+
+def test_everything_fits_without_rest():
+    result = compact_query_result({"spendings": _spendings(3)}, token_budget=3000)
+    compact = result["spendings"]
+    assert len(compact["rows"]) == 3
+    assert "rest" not in compact
+
+
+def test_other_collections_use_the_budget_first():
+    profile_config = {"_id": ObjectId(), "userId": "u1", "notes": "x" * 2000}
+    result = compact_query_result(
+        {"profile_config": profile_config, "spendings": _spendings(20)},
+        token_budget=300,
+    )
+    assert result["profile_config"] == {"notes": "x" * 2000}
+    assert result["spendings"]["rows"] == []
+    assert result["spendings"]["rest"]["count"] == 20
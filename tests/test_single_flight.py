@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+import pytest
+from services.single_flight import AsyncSingleFlight, SingleFlight, flight_key
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def run_concurrently(flight, fn, callers):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do("k", fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return {"gpt_answer": "ok"}
+
+    threads, results, errors = run_concurrently(flight, fn, 4)
+    wait_until(lambda: flight.stats()["coalesced"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert errors == []
+    assert results == [{"gpt_answer": "ok"}] * 4
+    # Cada seguidor recebe a sua cópia
+    assert len({id(result) for result in results}) == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight(linger_seconds=10)
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise RuntimeError("falhou")
+
+    threads, results, errors = run_concurrently(flight, fn, 3)
+    wait_until(lambda: flight.stats()["coalesced"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == []
+    assert [str(e) for e in errors] == ["falhou"] * 3
+    # Erros não ficam guardados para as próximas chamadas
+    assert flight.do("k", lambda: "de novo") == "de novo"
+
+
+def test_linger_window_expires():
+    flight = SingleFlight(linger_seconds=0.05)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("k", fn) == 1
+    assert flight.do("k", fn) == 1
+    assert flight.stats()["linger_hits"] == 1
+    time.sleep(0.1)
+    assert flight.do("k", fn) == 2
+
+
+def test_results_rejected_by_should_linger_are_not_kept():
+    flight = SingleFlight(linger_seconds=10, should_linger=lambda r: r != "erro")
+    assert flight.do("k", lambda: "erro") == "erro"
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+def test_async_concurrent_callers_share_one_execution():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"gpt_answer": "ok"}
+
+    async def scenario():
+        flight = AsyncSingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(4)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert calls == [1]
+    assert results == [{"gpt_answer": "ok"}] * 4
+    assert flight.stats() == {
+        "in_flight": 0,
+        "leaders": 1,
+        "coalesced": 3,
+        "linger_hits": 0,
+    }
+
+
+def test_async_exception_reaches_every_waiter():
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("falhou")
+
+    async def scenario():
+        flight = AsyncSingleFlight(linger_seconds=10)
+        outcomes = await asyncio.gather(
+            *(flight.do("k", fn) for _ in range(3)), return_exceptions=True
+        )
+        return flight, outcomes
+
+    flight, outcomes = asyncio.run(scenario())
+    assert [str(e) for e in outcomes] == ["falhou"] * 3
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_leader_cancellation_does_not_cancel_followers():
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        flight = AsyncSingleFlight()
+        leader = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_async_linger_window_expires():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        flight = AsyncSingleFlight(linger_seconds=0.05)
+        first = await flight.do("k", fn)
+        lingered = await flight.do("k", fn)
+        await asyncio.sleep(0.1)
+        return first, lingered, await flight.do("k", fn), flight.stats()
+
+    first, lingered, after, stats = asyncio.run(scenario())
+    assert (first, lingered, after) == (1, 1, 2)
+    assert stats["linger_hits"] == 1
+
+
+@pytest.mark.parametrize(
+    "other",
+    [
+        ("u2", "Quanto gastei hoje?", []),
+        ("u1", "quanto gastei ontem", []),
+        ("u1", "quanto gastei hoje", [{"prompt": "oi"}]),
+    ],
+)
+def test_flight_key_separates_users_texts_and_contexts(other):
+    key = flight_key("u1", "quanto gastei hoje", [])
+    assert flight_key("u1", "Quanto gastei hoje?", []) == key
+    assert flight_key(*other) != key
@@ -0,0 +1,69 @@
+import pytest
+import services.streaming_transcription as streaming
+import services.transcribe as transcribe
+from services.llm_guard import LLMUnavailableError
+from services.streaming_transcription import StreamingTranscription
+
+PCM = b"\x01\x00" * 1600
+
+
+def segment(index):
+    return bytes([index, 0]) * 1600
+
+
+def fake_transcriber(monkeypatch, outcomes):
+    # Resultado escolhido pelo conteúdo: os trechos rodam em paralelo
+    calls = []
+
+    def transcribe_pcm(pcm, sample_rate):
+        calls.append((pcm, sample_rate))
+        outcome = outcomes[pcm[0]]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(streaming, "transcribe_pcm", transcribe_pcm)
+    return calls
+
+
+def test_segments_skip_the_conversion(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        transcribe, "transcode_audio", lambda data: pytest.fail("transcode_audio")
+    )
+    monkeypatch.setattr(
+        transcribe, "_transcribe_file", lambda audio: sent.append(audio)
+    )
+    transcribe.transcribe_pcm(PCM, 16000)
+    name, wav = sent[0]
+    assert name == "segment.wav"
+    assert wav[:4] == b"RIFF" and wav.endswith(PCM)
+
+
+def test_finish_joins_the_segments_in_order(monkeypatch):
+    calls = fake_transcriber(monkeypatch, ["gastei cinquenta", "no mercado"])
+    session = StreamingTranscription(16000)
+    session._submit(segment(0))
+    session._submit(segment(1))
+    assert session.finish() == ("gastei cinquenta no mercado", [])
+    assert sorted(calls) == [(segment(0), 16000), (segment(1), 16000)]
+
+
+def test_failed_segment_does_not_discard_the_others(monkeypatch):
+    fake_transcriber(
+        monkeypatch, ["gastei cinquenta", LLMUnavailableError("caiu"), "ontem"]
+    )
+    session = StreamingTranscription(16000)
+    for index in range(3):
+        session._submit(segment(index))
+    result = session.finish()
+    assert result.text == "gastei cinquenta ontem"
+    assert result.failed_segments == [1]
+
+
+def test_unavailable_model_without_any_text_raises(monkeypatch):
+    fake_transcriber(monkeypatch, [LLMUnavailableError("caiu")])
+    session = StreamingTranscription(16000)
+    session._submit(segment(0))
+    with pytest.raises(LLMUnavailableError):
+        session.finish()
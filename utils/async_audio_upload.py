@@ -0,0 +1,16 @@
+from quart.formparser import FormDataParser
+from quart.wrappers import Request
+from utils.audio_upload import audio_stream_factory
+
+
+class AsyncAudioUploadRequest(Request):
+    """Equivalente ao AudioUploadRequest para o servidor ASGI (Quart)"""
+
+    def make_form_data_parser(self) -> FormDataParser:
+        return self.form_data_parser_class(
+            max_content_length=self.max_content_length,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.parameter_storage_class,
+            stream_factory=audio_stream_factory,
+        )
@@ -0,0 +1,31 @@
+from functools import wraps
+from quart import request, jsonify, g
+from services.token_service import TokenService
+
+
+def async_token_required(f):
+    """Equivalente ao token_required para as rotas do servidor ASGI (Quart)"""
+
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = None
+        auth_header = request.headers.get("Authorization")
+        if auth_header:
+            parts = auth_header.split()
+            if len(parts) == 2 and parts[0].lower() == "bearer":
+                token = parts[1]
+
+        if not token:
+            return jsonify({"error": "Token is missing!"}), 401
+
+        try:
+            decoded_payload = TokenService.verify_token(token)
+            g.logged_user = decoded_payload.get("user")
+            if g.logged_user is None:
+                return jsonify({"error": "User ID not found in token"}), 401
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 401
+
+        return await f(*args, **kwargs)
+
+    return decorated
@@ -0,0 +1,61 @@
+from tempfile import SpooledTemporaryFile
+from typing import IO, Optional
+from decouple import config
+from flask import Request
+from werkzeug.exceptions import UnsupportedMediaType
+from services.audio_convert import sniff_container
+
+# Maior upload de áudio aceito (a API de transcrição recusa acima de 25 MB)
+AUDIO_MAX_UPLOAD_BYTES = config(
+    "AUDIO_MAX_UPLOAD_BYTES", default=25 * 1024 * 1024, cast=int
+)
+# Uploads até esse tamanho ficam só em memória; acima disso vão para disco
+AUDIO_SPOOL_MAX_MEMORY_BYTES = config(
+    "AUDIO_SPOOL_MAX_MEMORY_BYTES", default=4 * 1024 * 1024, cast=int
+)
+# Bytes olhados por sniff_container
+_SNIFF_BYTES = 16
+
+
+class AudioSpool(SpooledTemporaryFile):
+    """
+    Buffer de um arquivo do multipart. Confere o formato pelos primeiros bytes
+    assim que eles chegam, antes de qualquer escrita em disco ou ffmpeg.
+    """
+
+    def __init__(self, max_size: int = AUDIO_SPOOL_MAX_MEMORY_BYTES):
+        super().__init__(max_size=max_size, mode="w+b")
+        self._head: Optional[bytes] = b""
+
+    def write(self, data) -> int:
+        if self._head is not None:
+            self._head += bytes(data[: _SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= _SNIFF_BYTES:
+                head, self._head = self._head, None
+                if sniff_container(head) is None:
+                    raise UnsupportedMediaType("Formato de áudio não reconhecido")
+        return super().write(data)
+
+
+def audio_stream_factory(
+    total_content_length: Optional[int],
+    content_type: Optional[str],
+    filename: Optional[str],
+    content_length: Optional[int] = None,
+) -> IO[bytes]:
+    return AudioSpool()
+
+
+class AudioUploadRequest(Request):
+    """Request do Flask com os arquivos do multipart em AudioSpool"""
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ) -> IO[bytes]:
+        return audio_stream_factory(
+            total_content_length, content_type, filename, content_length
+        )
@@ -21,3 +21,13 @@ def get_date_range(date_str):
         raise ValueError("Formato de data inválido")
 
     return {"$gte": start.strftime("%Y-%m-%d"), "$lt": end.strftime("%Y-%m-%d")}
+
+
+def month_sort_key(month):
+    # "MM/YYYY" do pipeline de COMPARATIVE ordenado por (ano, mês); rótulos
+    # fora desse formato vão para o fim, na ordem original
+    try:
+        mm, yyyy = str(month).split("/")
+        return (0, int(yyyy), int(mm))
+    except ValueError:
+        return (1, 0, 0)
@@ -0,0 +1,72 @@
+def format_brl(value) -> str:
+    """Formata um valor no padrão brasileiro (ex: R$ 2.450,00)"""
+    try:
+        value = float(value or 0)
+    except (TypeError, ValueError):
+        value = 0.0
+    formatted = f"{abs(value):,.2f}".replace(",", "X").replace(".", ",")
+    formatted = formatted.replace("X", ".")
+    return f"-R$ {formatted}" if value < 0 else f"R$ {formatted}"
+
+
+MONTH_NAMES_PT = [
+    "janeiro",
+    "fevereiro",
+    "março",
+    "abril",
+    "maio",
+    "junho",
+    "julho",
+    "agosto",
+    "setembro",
+    "outubro",
+    "novembro",
+    "dezembro",
+]
+
+
+def format_date_pt(date_str: str) -> str:
+    """Converte 'YYYY-MM-DD' para 'DD/MM/YYYY' e 'YYYY-MM' para 'junho de 2025'"""
+    if not date_str:
+        return ""
+    parts = date_str.split("-")
+    try:
+        if len(parts) == 3:
+            return f"{parts[2]}/{parts[1]}/{parts[0]}"
+        if len(parts) == 2:
+            return f"{MONTH_NAMES_PT[int(parts[1]) - 1]} de {parts[0]}"
+    except (ValueError, IndexError):
+        pass
+    return date_str
+
+
+CATEGORY_LABELS_PT = {
+    "FOOD": "Alimentação",
+    "FUEL": "Combustível",
+    "LEISURE": "Lazer",
+    "PHARMACY": "Farmácia",
+    "HOSPITAL": "Saúde",
+    "TRAVEL": "Viagem",
+    "CLOTHING": "Vestuário",
+    "PERSONAL_CARE": "Cuidados pessoais",
+    "OTHER": "Outros",
+}
+
+CATEGORY_EMOJIS = {
+    "FOOD": "🍽️",
+    "FUEL": "⛽",
+    "LEISURE": "🎉",
+    "PHARMACY": "💊",
+    "HOSPITAL": "🏥",
+    "TRAVEL": "✈️",
+    "CLOTHING": "👕",
+    "PERSONAL_CARE": "💇",
+    "OTHER": "📦",
+}
+
+
+def format_category(category: str) -> str:
+    """Retorna o nome da categoria em português com emoji (ex: 🍽️ Alimentação)"""
+    key = (category or "OTHER").upper()
+    label = CATEGORY_LABELS_PT.get(key, category or "Outros")
+    return f"{CATEGORY_EMOJIS.get(key, '📦')} {label}"
@@ -0,0 +1,202 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JsonStringFieldStreamer:
+    """
+    Extrai incrementalmente o valor de um campo string de um JSON que chega em
+    pedaços (ex: o "gpt_answer" de uma resposta em streaming do modelo).
+
+    Cada chamada a feed() retorna apenas o texto novo já decodificado do campo.
+    """
+
+    def __init__(self, field: str):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self.done = False
+        self.value = ""
+
+    def feed(self, chunk: str) -> str:
+        if self.done or not chunk:
+            return ""
+        self._buffer += chunk
+
+        if not self._started:
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._started = True
+            self._pos = match.end()
+
+        out = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != "\\":
+                out.append(char)
+                pos += 1
+                continue
+
+            # Sequência de escape: espera chegar completa antes de decodificar
+            if pos + 1 >= len(buffer):
+                break
+            escape = buffer[pos + 1]
+            if escape != "u":
+                out.append(_ESCAPES.get(escape, escape))
+                pos += 2
+                continue
+            if pos + 6 > len(buffer):
+                break
+            code = int(buffer[pos + 2 : pos + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # Par substituto (emoji escapado): precisa das duas metades
+                if pos + 12 > len(buffer):
+                    break
+                low = int(buffer[pos + 8 : pos + 12], 16)
+                out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                pos += 12
+            else:
+                out.append(chr(code))
+                pos += 6
+
+        self._pos = pos
+        text = "".join(out)
+        self.value += text
+        return text
+
+
+class JsonObjectStreamer:
+    """
+    Lê incrementalmente um objeto JSON que chega em pedaços (ex: a intenção
+    devolvida pelo modelo em streaming) e expõe cada campo de primeiro nível
+    assim que o valor dele termina.
+
+    feed() retorna os nomes dos campos que ficaram completos com o pedaço;
+    current_key é o campo cujo valor está sendo lido no momento. Texto fora do
+    objeto (cercas ```json) é ignorado.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key_start = 0
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.fields: Dict[str, Any] = {}
+        self.current_key: Optional[str] = None
+        self.done = False
+
+    def _finish_value(self, end: int, completed: List[str]):
+        try:
+            self.fields[self.current_key] = json.loads(
+                self._buffer[self._value_start : end]
+            )
+            completed.append(self.current_key)
+        except ValueError:
+            pass
+        self.current_key = None
+        self._state = "after_value"
+
+    def feed(self, chunk: str) -> List[str]:
+        completed: List[str] = []
+        if self.done or not chunk:
+            return completed
+        self._buffer += chunk
+        buffer = self._buffer
+        pos = self._pos
+
+        while pos < len(buffer) and not self.done:
+            char = buffer[pos]
+            state = self._state
+
+            if state == "start":
+                if char == "{":
+                    self._state = "expect_key"
+            elif state == "expect_key":
+                if char == '"':
+                    self._state = "key"
+                    self._key_start = pos + 1
+                    self._escape = False
+                elif char == "}":
+                    self.done = True
+            elif state == "key":
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self.current_key = json.loads(buffer[self._key_start - 1 : pos + 1])
+                    self._state = "colon"
+            elif state == "colon":
+                if char == ":":
+                    self._state = "value_start"
+            elif state == "value_start":
+                if not char.isspace():
+                    self._value_start = pos
+                    self._depth = 1 if char in "{[" else 0
+                    self._in_string = char == '"'
+                    self._escape = False
+                    self._state = "value"
+            elif state == "value":
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif char == "\\":
+                        self._escape = True
+                    elif char == '"':
+                        self._in_string = False
+                        if self._depth == 0:
+                            self._finish_value(pos + 1, completed)
+                elif char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]" and self._depth > 0:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._finish_value(pos + 1, completed)
+                elif self._depth == 0 and (char in ",}" or char.isspace()):
+                    # Fim de número/true/false/null: o caractere é lido de novo
+                    # no estado seguinte
+                    self._finish_value(pos, completed)
+                    continue
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "expect_key"
+                elif char == "}":
+                    self.done = True
+            pos += 1
+
+        self._pos = pos
+        return completed
+
+
+def strip_code_fences(content: str) -> str:
+    """Remove as cercas ```json ... ``` que o modelo às vezes devolve"""
+    return re.sub(r"^```(?:json)?\s*|```$", "", content.strip(), flags=re.MULTILINE)
+
+
+def loads_model_json(content: str):
+    return json.loads(strip_code_fences(content))
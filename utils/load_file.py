@@ -1,3 +1,67 @@
+import hashlib
+import os
+import threading
+from typing import Dict, NamedTuple
+
+
+class Prompt(NamedTuple):
+    text: str
+    version: str  # hash do conteúdo, identifica a revisão exata do prompt
+    size: int
+    mtime_ns: int
+
+
+class PromptRegistry:
+    """Mantém os prompts em memória e só relê o arquivo quando o mtime muda"""
+
+    def __init__(self):
+        self._prompts: Dict[str, Prompt] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, filepath: str, stat: os.stat_result) -> Prompt:
+        with open(filepath, "r", encoding="utf-8") as file:
+            text = file.read()
+        version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        return Prompt(text, version, len(text.encode("utf-8")), stat.st_mtime_ns)
+
+    def get(self, filepath: str) -> Prompt:
+        key = os.path.normpath(filepath)
+        stat = os.stat(key)
+
+        prompt = self._prompts.get(key)
+        if prompt is not None and prompt.mtime_ns == stat.st_mtime_ns:
+            return prompt
+
+        with self._lock:
+            prompt = self._prompts.get(key)
+            if prompt is None or prompt.mtime_ns != stat.st_mtime_ns:
+                prompt = self._read(key, stat)
+                self._prompts[key] = prompt
+            return prompt
+
+    def preload(self, directory: str = "prompts"):
+        """Carrega todos os prompts do diretório (chamado na inicialização)"""
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".txt"):
+                self.get(os.path.join(directory, filename))
+
+    def info(self, filepath: str) -> dict:
+        prompt = self.get(filepath)
+        return {"version": prompt.version, "size": prompt.size}
+
+    def all_info(self) -> Dict[str, dict]:
+        return {
+            path: {"version": prompt.version, "size": prompt.size}
+            for path, prompt in self._prompts.items()
+        }
+
+
+prompt_registry = PromptRegistry()
+
+
 def load_prompt(filepath):
-    with open(filepath, "r", encoding="utf-8") as file:
-        return file.read()
+    return prompt_registry.get(filepath).text
+
+
+def get_prompt_version(filepath) -> str:
+    return prompt_registry.get(filepath).version
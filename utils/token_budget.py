@@ -0,0 +1,17 @@
+import json
+import math
+from typing import Any
+
+# Média aproximada de caracteres por token para JSON em português
+CHARS_PER_TOKEN = 3.5
+
+
+def to_compact_json(obj: Any) -> str:
+    """JSON sem espaços extras; datas, ObjectIds e afins viram string"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def estimate_tokens(obj: Any) -> int:
+    """Estimativa do número de tokens de um texto ou objeto serializado"""
+    text = obj if isinstance(obj, str) else to_compact_json(obj)
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
@@ -1,6 +1,6 @@
 # websocket_server.py
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from flask import request
+from flask import current_app, g, request
 from functools import wraps
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -9,6 +9,10 @@ from db.mongo import profile_config_collection
 from services.profile_config_service import ProfileConfigService
 from services.token_service import TokenService
 from dto.fixed_bills_dto import get_bill_status_for_month
+from services.execute_pipeline import execute_command
+from services.llm_guard import LLM_RETRY_AFTER_SECONDS, LLMUnavailableError
+from services.streaming_transcription import STREAM_SAMPLE_RATE, StreamingTranscription
+import json
 import logging
 
 # Configurar logging
@@ -21,6 +25,9 @@ socketio = None
 # Dicionário para armazenar conexões ativas
 active_connections = {}
 
+# Gravações em andamento por conexão (transcrição em streaming)
+transcription_sessions = {}
+
 # Scheduler para tarefas agendadas
 scheduler = BackgroundScheduler()
 scheduler.start()
@@ -37,6 +44,9 @@ def init_socketio(app):
     socketio.on_event("authenticate", handle_authenticate)
     socketio.on_event("subscribe_notifications", handle_subscribe)
     socketio.on_event("unsubscribe_notifications", handle_unsubscribe)
+    socketio.on_event("transcription_start", handle_transcription_start)
+    socketio.on_event("audio_chunk", handle_audio_chunk)
+    socketio.on_event("transcription_stop", handle_transcription_stop)
 
     tz = timezone("America/Sao_Paulo")
 
@@ -74,6 +84,10 @@ def handle_connect():
 
 def handle_disconnect():
     """Manipula desconexão WebSocket"""
+    session = transcription_sessions.pop(request.sid, None)
+    if session:
+        session["transcription"].cancel()
+
     if request.sid in active_connections:
         user_id = active_connections[request.sid]["user_id"]
         leave_room(f"user_{user_id}")
@@ -101,6 +115,7 @@ def handle_authenticate(data):
         # Armazenar conexão
         active_connections[request.sid] = {
             "user_id": user_id,
+            "user": user_data,
             "connected_at": datetime.utcnow(),
         }
 
@@ -139,6 +154,124 @@ def handle_unsubscribe(data):
         emit("unsubscribed", {"type": notification_type})
 
 
+@require_auth
+def handle_transcription_start(data=None):
+    """
+    Inicia uma gravação em streaming: o app envia PCM 16 bits mono em eventos
+    audio_chunk e finaliza com transcription_stop.
+
+    Opções: sampleRate (padrão 16000), execute (envia o texto final direto
+    para o /execute-query) e context (histórico usado pelo execute).
+    """
+    data = data or {}
+    sid = request.sid
+    previous = transcription_sessions.pop(sid, None)
+    if previous:
+        previous["transcription"].cancel()
+
+    def on_segment(index, text):
+        socketio.emit("transcription_partial", {"segment": index, "text": text}, to=sid)
+
+    try:
+        transcription = StreamingTranscription(
+            int(data.get("sampleRate", STREAM_SAMPLE_RATE)), on_segment
+        )
+    except (TypeError, ValueError) as e:
+        emit("transcription_error", {"status": 400, "message": str(e)})
+        return
+
+    transcription_sessions[sid] = {
+        "transcription": transcription,
+        "execute": data.get("execute") is True,
+        "context": data.get("context") or [],
+    }
+    emit("transcription_started", {"sampleRate": transcription.sample_rate})
+
+
+@require_auth
+def handle_audio_chunk(data):
+    """Recebe um pedaço do áudio (bytes ou {"audio": bytes})"""
+    session = transcription_sessions.get(request.sid)
+    if not session:
+        emit("transcription_error", {"status": 400, "message": "Gravação não iniciada"})
+        return
+
+    chunk = data.get("audio") if isinstance(data, dict) else data
+    if not isinstance(chunk, (bytes, bytearray)):
+        emit("transcription_error", {"status": 400, "message": "Áudio inválido"})
+        return
+
+    try:
+        session["transcription"].feed(bytes(chunk))
+    except ValueError as e:
+        transcription_sessions.pop(request.sid, None)
+        session["transcription"].cancel()
+        emit("transcription_error", {"status": 400, "message": str(e)})
+
+
+@require_auth
+def handle_transcription_stop(data=None):
+    """
+    Finaliza a gravação. A espera pelos trechos pendentes e o execute rodam em
+    segundo plano, sem prender a thread do handler do Socket.IO.
+    """
+    session = transcription_sessions.pop(request.sid, None)
+    if not session:
+        emit("transcription_error", {"status": 400, "message": "Gravação não iniciada"})
+        return
+
+    socketio.start_background_task(
+        finish_transcription,
+        current_app._get_current_object(),
+        request.sid,
+        active_connections[request.sid]["user"],
+        session,
+    )
+
+
+def finish_transcription(app, sid, user, session):
+    """
+    Devolve o texto completo (transcription_final) e, se pedido, executa o
+    comando. Trechos que falharam ficam fora do texto e vão em failedSegments;
+    nesse caso o comando não é executado, porque a frase pode estar incompleta.
+    """
+    try:
+        result = session["transcription"].finish()
+    except LLMUnavailableError:
+        socketio.emit(
+            "transcription_error",
+            {
+                "status": 503,
+                "message": "Serviço de transcrição indisponível no momento",
+                "retryAfter": LLM_RETRY_AFTER_SECONDS,
+            },
+            to=sid,
+        )
+        return
+
+    if result.failed_segments and not result.text:
+        socketio.emit(
+            "transcription_error",
+            {"status": 400, "message": "Erro ao transcrever o áudio"},
+            to=sid,
+        )
+        return
+
+    socketio.emit(
+        "transcription_final",
+        {"transcribed_text": result.text, "failedSegments": result.failed_segments},
+        to=sid,
+    )
+
+    if session["execute"] and not result.failed_segments:
+        with app.app_context():
+            g.logged_user = user
+            payload, status = execute_command(result.text, session["context"])
+        # Mesmo corpo do /execute-query (datas e ObjectIds viram texto)
+        payload = json.loads(json.dumps(payload, default=str))
+        socketio.emit("execute_result", {"status": status, **payload}, to=sid)
+
+
 def send_notification_to_user(user_id, notification):
     """Envia notificação para um usuário específico"""
     if socketio: